@@ -16,6 +16,7 @@ ssh root@37.120.186.189 << EOF
   cd Spotify-server
   source venv/bin/activate
   pip install --upgrade --force-reinstall /home/root/deploy/*.whl
+  flask --app spotify_server.run db-upgrade
   systemctl restart spotify-server.service
 EOF
 
@@ -1,6 +1,7 @@
 """Factory für die Flask-Anwendung."""
 
-from flask import Flask, send_from_directory
+import atexit
+from flask import Flask, jsonify, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from spotify_server.config import Config
 from spotify_server.extensions import db
@@ -19,48 +20,151 @@ def create_app(config_class=Config):
     # 2. Erweiterungen initialisieren
     db.init_app(app)
 
+    # Strukturiertes Logging; geschrieben wird in einem eigenen Thread
+    from .logging_setup import configure_logging
+
+    configure_logging(app)
+
+    # Metriken für /metrics (Spotify-Aufrufe, Datenbank, Bewertung, Caches)
+    from . import metrics
+
+    metrics.REGISTRY.enabled = app.config["METRICS_ENABLED"]
+    metrics.REGISTRY.clear_collectors()
+    if app.config["METRICS_ENABLED"]:
+        metrics.init_app(app)
+
+    # Zählt SQL-Abfragen und Datenbankzeit pro Request und Route
+    query_stats = None
+    if app.config["QUERY_STATS_ENABLED"]:
+        from .services.query_stats import QueryStats
+
+        query_stats = QueryStats(
+            slow_query_ms=app.config["SLOW_QUERY_THRESHOLD_MS"],
+            headers=app.debug or app.config["QUERY_STATS_HEADERS"],
+        )
+        query_stats.init_app(app)
+
     with app.app_context():
 
         # Importiere alle Services und die Blueprint-Factory
+        from .services.spotify_gateway import (
+            InstrumentedGateway,
+            create_spotify_gateway,
+        )
         from .services.spotify_service import SpotifyService
         from .services.playback_service import PlaybackService
+        from .services.spotify_client_cache import SpotifyClientCache
+        from .services.token_refresher import TokenRefresher
         from .services.song_repository import SongRepository
+        from .services.artist_resolver import ArtistResolver
+        from .services.track_cache import TrackCache
         from .services.training_repository import TrainingRepository
         from .services.user_repository import UserRepository
         from .services.training_service import TrainingService
+        from .services.card_prefetcher import CardPrefetcher
+        from .services.playback_dispatcher import PlaybackDispatcher
         from .routes.training_routes import create_training_blueprint
         from .routes.auth_routes import create_auth_blueprint
+        from .commands import register_commands
+        from .migrations import init_schema_check
 
         # --- 3. Dependency Injection: Erstelle alle Service-Instanzen EINMAL ---
 
         user_repository = UserRepository()
 
+        # Spotify-Backend laut Konfiguration (echte API, Stand-in oder Simulation)
+        spotify_gateway = create_spotify_gateway(app.config)
+        if app.config["METRICS_ENABLED"]:
+            spotify_gateway = InstrumentedGateway(spotify_gateway)
+
         # Services, die direkt von der Konfiguration abhängen
         spotify_service = SpotifyService(
-            client_id=app.config["SPOTIFY_CLIENT_ID"],
-            client_secret=app.config["SPOTIFY_CLIENT_SECRET"],
+            gateway=spotify_gateway,
+            page_concurrency=app.config["SPOTIFY_PAGE_CONCURRENCY"],
         )
         playback_service = PlaybackService(
-            client_id=app.config["SPOTIFY_CLIENT_ID"],
-            client_secret=app.config["SPOTIFY_CLIENT_SECRET"],
-            redirect_uri=app.config[
-                "SPOTIFY_REDIRECT_URI"
-            ],  # Annahme: URI ist in config
+            gateway=spotify_gateway,
             user_repository=user_repository,
+            client_cache=SpotifyClientCache(
+                spotify_gateway,
+                max_size=app.config["SPOTIFY_CLIENT_CACHE_SIZE"],
+                idle_timeout=app.config["SPOTIFY_CLIENT_IDLE_TIMEOUT"],
+            ),
+            state_max_age=app.config["PLAYBACK_STATE_MAX_AGE"],
         )
 
+        # Führt Wiedergabe-Befehle aus, ohne den Request-Thread zu blockieren
+        playback_dispatcher = PlaybackDispatcher(
+            app,
+            playback_service=playback_service,
+            max_workers=app.config["PLAYBACK_WORKERS"],
+            asynchronous=app.config["PLAYBACK_ASYNC"],
+        )
+        # Wartende Befehle beim Beenden des Prozesses noch abarbeiten
+        atexit.register(playback_dispatcher.shutdown)
+
+        # Erneuert die Tokens aktiver User, bevor sie im Request-Pfad ablaufen.
+        # Der Thread startet erst mit dem ersten Request, nicht bei CLI-Befehlen.
+        if app.config["TOKEN_REFRESH_ENABLED"] and not app.testing:
+            TokenRefresher(
+                app,
+                auth_manager=playback_service.auth_manager,
+                client_cache=playback_service.client_cache,
+                refresh_window=app.config["TOKEN_REFRESH_WINDOW"],
+                interval=app.config["TOKEN_REFRESH_INTERVAL"],
+                max_workers=app.config["TOKEN_REFRESH_CONCURRENCY"],
+            ).init_app(app)
+
         # Repositories, die von anderen Services abhängen können
-        song_repository = SongRepository(spotify_service=spotify_service)
+        song_repository = SongRepository(
+            spotify_service=spotify_service,
+            artist_resolver=ArtistResolver(max_size=app.config["ARTIST_CACHE_SIZE"]),
+            track_cache=TrackCache(max_bytes=app.config["TRACK_CACHE_MAX_BYTES"]),
+        )
         training_repository = TrainingRepository()  # Dieser hat keine Abhängigkeiten
 
+        # Berechnet nach jeder Antwort die nächsten Karten im Hintergrund vor
+        card_prefetcher = None
+        if app.config["LOOKAHEAD_DEPTH"] > 0:
+            card_prefetcher = CardPrefetcher(
+                app,
+                training_repository=training_repository,
+                depth=app.config["LOOKAHEAD_DEPTH"],
+                max_workers=app.config["LOOKAHEAD_WORKERS"],
+                weighting=app.config["TRAINING_SELECTION_WEIGHTING"],
+            )
+
         # Haupt-Service, der die Repositories als "Werkzeuge" bekommt
         training_service = TrainingService(
             song_repository=song_repository,
             training_repository=training_repository,
             playback_service=playback_service,
             user_repository=user_repository,
+            selection_weighting=app.config["TRAINING_SELECTION_WEIGHTING"],
+            verify_playback=app.config["VERIFY_PLAYBACK_ON_GUESS"],
+            card_prefetcher=card_prefetcher,
         )
 
+        # Zähler der Caches und Warteschlangen erst beim Abruf von /metrics lesen
+        if app.config["METRICS_ENABLED"]:
+            for name, stats in (
+                ("track_cache", song_repository.track_cache.stats),
+                ("artist_cache", song_repository.artist_resolver.stats),
+                ("spotify_client_cache", playback_service.client_cache.stats),
+                ("card_prefetcher", card_prefetcher and card_prefetcher.stats),
+            ):
+                if stats:
+                    metrics.REGISTRY.register_collector(
+                        metrics.stats_collector("cache", stats, {"cache": name})
+                    )
+            metrics.REGISTRY.register_collector(
+                metrics.stats_collector("playback_queue", playback_dispatcher.stats)
+            )
+            if query_stats:
+                metrics.REGISTRY.register_collector(
+                    metrics.query_stats_collector(query_stats)
+                )
+
         # --- 4. Blueprints registrieren ---
 
         # Erstelle das Blueprint, indem du der Factory die benötigten Services übergibst
@@ -68,6 +172,7 @@ def create_app(config_class=Config):
             training_service=training_service,
             playback_service=playback_service,
             user_repository=user_repository,
+            playback_dispatcher=playback_dispatcher,
         )
 
         # Registriere das fertige Blueprint bei der App
@@ -77,8 +182,21 @@ def create_app(config_class=Config):
         auth_bp = create_auth_blueprint(playback_service)
         app.register_blueprint(auth_bp)
 
+        # --- 5. CLI-Befehle registrieren ---
+        register_commands(app, training_repository, song_repository)
+
+        # Requests erst bedienen, wenn `flask db-upgrade` das Schema aktualisiert hat
+        if not app.testing:
+            init_schema_check(app)
+
         @app.route("/favicon.ico")
         def favicon():
             return send_from_directory(app.static_folder, "favicon.png")
 
+        if query_stats and app.debug:
+
+            @app.route("/debug/query_stats")
+            def query_stats_overview():
+                return jsonify(query_stats.stats())
+
     return app
@@ -0,0 +1,47 @@
+"""Modul für die CLI-Befehle der Spotify-Server-App (`flask <befehl>`)."""
+
+import click
+from spotify_server.app.migrations import (
+    check_index_usage,
+    get_schema_version,
+    upgrade_schema,
+)
+from spotify_server.app.services.song_repository import SongRepository
+from spotify_server.app.services.training_repository import TrainingRepository
+
+
+def register_commands(
+    app, training_repository: TrainingRepository, song_repository: SongRepository
+):
+    """Registriert alle Wartungsbefehle an der App."""
+
+    @app.cli.command("reconcile-training-stats")
+    def reconcile_training_stats():
+        """Berechnet die materialisierten Trainingszähler aus den Lernkarten neu."""
+        reconciled = training_repository.reconcile_progress()
+        click.echo(f"{reconciled} User/Playlist-Kombinationen abgeglichen.")
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Spielt alle ausstehenden Schema-Migrationen ein."""
+        applied = upgrade_schema()
+        if applied:
+            click.echo(f"Migrationen eingespielt: {', '.join(map(str, applied))}")
+        else:
+            click.echo("Schema ist bereits aktuell.")
+        click.echo(f"Schema-Version: {get_schema_version()}")
+
+    @app.cli.command("check-indexes")
+    @click.argument("user_id")
+    @click.argument("playlist_id")
+    def check_indexes(user_id, playlist_id):
+        """Prüft per EXPLAIN, ob die Repository-Abfragen ihre Indizes nutzen."""
+        results = check_index_usage(
+            training_repository, song_repository, user_id, playlist_id
+        )
+        for name, uses_index, used_indexes in results:
+            status = "OK    " if uses_index else "FEHLER"
+            click.echo(f"{status} {name}: {', '.join(sorted(used_indexes)) or '-'}")
+
+        if not all(uses_index for _, uses_index, _ in results):
+            raise SystemExit(1)
@@ -1,15 +1,174 @@
 """Module for Data Transfer Objects (DTOs) used in the application."""
 
+from array import array
+from datetime import datetime
+from spotify_server.app.matching import artist_keys, split_artist_keys, title_key
+
 
 class SongDTO:
     """DTO for transferring song data"""
 
+    # Ohne __dict__ pro Instanz, damit auch große Caches kompakt bleiben
+    __slots__ = (
+        "track_id",
+        "title",
+        "artists",
+        "year",
+        "popularity",
+        "match_title",
+        "match_artists",
+    )
+
     def __init__(
-        self, track_id: int, title: str, artists: list[str], year: int, popularity=0
+        self,
+        track_id: str,
+        title: str,
+        artists: list[str],
+        year: int,
+        popularity=0,
+        match_title: str | None = None,
+        match_artists: tuple[str, ...] | None = None,
     ):
         self.track_id = track_id
         self.title = title
-        self.name = title  # Alias for compatibility
-        self.artists = artists
+        self.artists = tuple(artists)
         self.year = year
         self.popularity = popularity
+        # Normalized match keys; computed here if the track has none stored yet
+        self.match_title = match_title if match_title is not None else title_key(title)
+        self.match_artists = (
+            tuple(match_artists)
+            if match_artists is not None
+            else artist_keys(self.artists)
+        )
+
+    @property
+    def name(self) -> str:
+        """Alias for compatibility"""
+        return self.title
+
+
+class PlaylistTrackTable:
+    """
+    Column-oriented representation of all tracks of a playlist.
+
+    Years and popularity are stored in typed arrays, artist names only once in
+    an interned table that the tracks reference by index. This needs far less
+    memory than one object per track. The stored match keys are kept as well,
+    so SongDTOs built from the table do not recompute them.
+    """
+
+    __slots__ = (
+        "playlist_id",
+        "track_ids",
+        "titles",
+        "years",
+        "popularity",
+        "match_titles",
+        "match_artists",
+        "artist_names",
+        "track_artists",
+        "_positions",
+    )
+
+    def __init__(self, playlist_id: str):
+        self.playlist_id = playlist_id
+        self.track_ids: list[str] = []
+        self.titles: list[str] = []
+        self.years = array("h")
+        self.popularity = array("h")
+        self.match_titles: list[str | None] = []
+        self.match_artists: list[str | None] = []  # as stored in track.match_artists
+        self.artist_names: list[str] = []
+        self.track_artists: list[tuple[int, ...]] = []
+        self._positions: dict[str, int] = {}
+
+    def append(
+        self,
+        track_id: str,
+        title: str,
+        year: int,
+        popularity: int,
+        match_title: str | None = None,
+        match_artists: str | None = None,
+    ):
+        """Appends a track without artists (see set_artists)."""
+        self._positions[track_id] = len(self.track_ids)
+        self.track_ids.append(track_id)
+        self.titles.append(title)
+        self.years.append(year if year is not None else -1)
+        self.popularity.append(popularity or 0)
+        self.match_titles.append(match_title)
+        self.match_artists.append(match_artists)
+        self.track_artists.append(())
+
+    def set_artists(self, artist_names: list[str], track_artists: dict[str, list[int]]):
+        """Sets the interned artist table and the artist indexes per track_id."""
+        self.artist_names = artist_names
+        for track_id, artist_indexes in track_artists.items():
+            position = self._positions.get(track_id)
+            if position is not None:
+                self.track_artists[position] = tuple(artist_indexes)
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._positions
+
+    def get(self, track_id: str) -> SongDTO | None:
+        """Returns a single track as SongDTO or None."""
+        position = self._positions.get(track_id)
+        return None if position is None else self.row(position)
+
+    def row(self, position: int) -> SongDTO:
+        """Returns the track at the given position as SongDTO."""
+        return SongDTO(
+            track_id=self.track_ids[position],
+            title=self.titles[position],
+            artists=[self.artist_names[i] for i in self.track_artists[position]],
+            year=self.years[position],
+            popularity=self.popularity[position],
+            match_title=self.match_titles[position],
+            match_artists=split_artist_keys(self.match_artists[position]),
+        )
+
+
+class PlaybackState:
+    """
+    Last known Spotify playback state of a user.
+
+    Updated from the commands the server sends itself and refreshed from
+    Spotify's current_playback when it is older than the configured TTL.
+    `is_playing` is None while nothing is known about the user's player.
+    """
+
+    __slots__ = ("is_playing", "track_id", "device_id", "confirmed_at")
+
+    def __init__(
+        self,
+        is_playing: bool | None = None,
+        track_id: str | None = None,
+        device_id: str | None = None,
+        confirmed_at: datetime | None = None,
+    ):
+        self.is_playing = is_playing
+        self.track_id = track_id
+        self.device_id = device_id
+        self.confirmed_at = confirmed_at
+
+    def is_stale(self, max_age: float) -> bool:
+        """True if the state was never confirmed or is older than max_age seconds."""
+        if self.is_playing is None or self.confirmed_at is None:
+            return True
+        return (datetime.utcnow() - self.confirmed_at).total_seconds() > max_age
+
+    def to_dict(self) -> dict:
+        return {
+            "is_playing": self.is_playing,
+            "track_id": self.track_id,
+            "device_id": self.device_id,
+            "confirmed_at": (
+                self.confirmed_at.isoformat() if self.confirmed_at else None
+            ),
+        }
@@ -0,0 +1,139 @@
+"""
+Module for structured, non-blocking logging.
+
+Die Services loggen wie üblich über `logging.getLogger(__name__)`. Die
+Datensätze werden im aufrufenden Thread nur um den Kontext (Request, User,
+Playlist) ergänzt und in eine Queue gelegt; Formatieren als JSON und Schreiben
+übernimmt ein QueueListener in einem eigenen Thread.
+"""
+
+import atexit
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import sys
+import uuid
+from flask import request
+
+# Logger, unter dem alle Module der App loggen
+ROOT_LOGGER = "spotify_server"
+
+# Attribute eines LogRecord, die nicht als zusätzliche Felder ausgegeben werden
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_log_context = ContextVar("log_context", default={})
+_listener = None
+
+
+def bind_log_context(**fields):
+    """
+    Ergänzt den Log-Kontext des aktuellen Requests bzw. Threads, z.B. um
+    user_id und playlist_id in Hintergrund-Jobs.
+    """
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def clear_log_context():
+    _log_context.set({})
+
+
+class ContextFilter(logging.Filter):
+    """Hängt den aktuellen Log-Kontext an jeden Datensatz an."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatiert Datensätze als eine JSON-Zeile."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler, der im aufrufenden Thread nur die Nachricht auflöst.
+    Anders als der Standard hängt er einen Traceback nicht an die Nachricht,
+    sondern legt ihn in exc_text ab, damit der Formatter ihn als eigenes Feld
+    ausgeben kann.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Argumente jetzt auflösen, sie könnten sich bis zur Ausgabe ändern
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(app):
+    """
+    Richtet das Logging für die App ein (Level und Format aus LOG_LEVEL und
+    LOG_FORMAT) und registriert die Request-Hooks für den Log-Kontext.
+    """
+    global _listener
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(app.config["LOG_LEVEL"].upper())
+    logger.propagate = False
+
+    if _listener is None:
+        output = logging.StreamHandler(sys.stdout)
+        if app.config["LOG_FORMAT"] == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(
+                logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+            )
+
+        log_queue = queue.SimpleQueue()
+        handler = ContextQueueHandler(log_queue)
+        handler.addFilter(ContextFilter())
+        logger.addHandler(handler)
+
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    app.before_request(_start_request_context)
+    app.teardown_request(_end_request_context)
+
+
+def _start_request_context():
+    fields = {
+        "request_id": request.headers.get("X-Request-ID") or uuid.uuid4().hex,
+        "route": request.url_rule.rule if request.url_rule else None,
+    }
+    # user_id und playlist_id stehen bei den API-Routen im JSON-Body
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict):
+        for key in ("user_id", "playlist_id"):
+            if data.get(key):
+                fields[key] = data[key]
+    _log_context.set(fields)
+
+
+def _end_request_context(exception=None):
+    clear_log_context()
@@ -0,0 +1,62 @@
+"""Modul für die normalisierten Suchschlüssel, mit denen Antworten bewertet werden."""
+
+import re
+import unicodedata
+
+# Trennzeichen der Künstler-Schlüssel in Track.match_artists
+ARTIST_KEY_SEPARATOR = "|"
+
+_BRACKETS = re.compile(r"\(.*?\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def clean_title(title: str) -> str:
+    """Bereinigt den Titel eines Songs von unnötigen Informationen."""
+
+    # Alles in Klammern entfernen
+    title = _BRACKETS.sub("", title)
+    # Alles hinter einem Bindestrich entfernen
+    title = title.split("-")[0]
+    # Whitespace bereinigen
+    return title.strip()
+
+
+def normalize(text: str) -> str:
+    """
+    Vereinheitlicht einen Text für den Vergleich: ohne Akzente, casefold und
+    mit einfachen Leerzeichen ("Beyoncé  Knowles" -> "beyonce knowles").
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _WHITESPACE.sub(" ", without_accents.casefold()).strip()
+
+
+def title_key(title: str) -> str:
+    """Suchschlüssel für einen Songtitel."""
+    return normalize(clean_title(title or ""))
+
+
+def artist_keys(artists) -> tuple[str, ...]:
+    """
+    Suchschlüssel für alle Künstler eines Songs, inklusive Aliassen
+    (z.B. "the beatles" zusätzlich als "beatles").
+    """
+    keys = {}
+    for artist in artists:
+        key = normalize(artist)
+        keys[key] = None
+        if key.startswith("the "):
+            keys[key[4:]] = None
+    return tuple(key for key in keys if key)
+
+
+def join_artist_keys(keys) -> str:
+    """Serialisiert Künstler-Schlüssel für die Spalte Track.match_artists."""
+    return ARTIST_KEY_SEPARATOR.join(keys)
+
+
+def split_artist_keys(value: str | None) -> tuple[str, ...] | None:
+    """Gegenstück zu join_artist_keys; None, wenn noch nichts gespeichert ist."""
+    if value is None:
+        return None
+    return tuple(key for key in value.split(ARTIST_KEY_SEPARATOR) if key)
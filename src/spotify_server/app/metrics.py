@@ -0,0 +1,372 @@
+"""
+Module for in-process metrics in the Prometheus text format.
+
+Counter und Histogramme werden beim Import definiert und von den Services
+direkt fortgeschrieben; Werte, die ohnehin als `stats()` vorliegen (Caches,
+Warteschlangen), werden erst beim Abruf von /metrics über Collector gelesen.
+"""
+
+from bisect import bisect_left
+import functools
+import threading
+import time
+import types
+from flask import Response, g, request
+from spotify_server.app.services import query_stats
+
+# Standard-Buckets für Latenzen in Sekunden
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    """Gemeinsame Basis für Counter und Histogramme mit festen Label-Namen."""
+
+    kind = "untyped"
+
+    def __init__(self, registry, name: str, documentation: str, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}  # Label-Werte (Tupel) -> Wert
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(value)}"]
+
+
+class Counter(Metric):
+    """Monoton steigender Zähler."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Verteilung von Messwerten in festen Buckets, samt Summe und Anzahl."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=None):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(sorted(buckets or LATENCY_BUCKETS))
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Zähler pro Bucket (+Inf am Ende), Summe
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        """Kontextmanager, der die Laufzeit des Blocks in Sekunden misst."""
+        return _Timer(self, time.perf_counter, labels)
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = self._label_text(key, f'le="{_number(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, clock, labels: dict):
+        self.histogram = histogram
+        self.clock = clock
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = self.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(self.clock() - self.started, **self.labels)
+
+
+class MetricsRegistry:
+    """Sammelt alle Metriken und erzeugt daraus die Ausgabe für /metrics."""
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics = []
+        self._collectors = []  # Funktionen, die beim Abruf Zeilen liefern
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self._add(Counter(self, name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels=(), buckets=None
+    ) -> Histogram:
+        return self._add(Histogram(self, name, documentation, labels, buckets))
+
+    def register_collector(self, collector):
+        """
+        Registriert eine Funktion, die beim Abruf eine Liste von Tupeln
+        (Name, Typ, Beschreibung, [(Labels als dict, Wert), ...]) liefert.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def clear_collectors(self):
+        with self._lock:
+            self._collectors.clear()
+
+    def render(self) -> str:
+        """Erzeugt die Ausgabe im Textformat von Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        # Gleichnamige Werte mehrerer Collector gemeinsam ausgeben
+        families = {}
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                label_text = "{" + pairs + "}" if pairs else ""
+                lines.append(f"{name}{label_text} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Dauer der HTTP-Requests pro Route und Statuscode.",
+    ("method", "route", "status"),
+)
+SPOTIFY_REQUEST_SECONDS = REGISTRY.histogram(
+    "spotify_request_duration_seconds",
+    "Dauer der Aufrufe an Spotify pro Operation und Status.",
+    ("operation", "status"),
+)
+SPOTIFY_TOKEN_REFRESHES = REGISTRY.counter(
+    "spotify_token_refreshes_total",
+    "Erneuerte Spotify Access Tokens.",
+    ("status",),
+)
+REPOSITORY_DB_SECONDS = REGISTRY.histogram(
+    "repository_db_duration_seconds",
+    "Datenbankzeit pro Aufruf einer Repository-Methode.",
+    ("repository", "method"),
+)
+REPOSITORY_QUERIES = REGISTRY.counter(
+    "repository_queries_total",
+    "SQL-Abfragen pro Repository-Methode.",
+    ("repository", "method"),
+)
+SCORE_CPU_SECONDS = REGISTRY.histogram(
+    "training_score_cpu_seconds",
+    "CPU-Zeit für das Bewerten einer Antwort (calculate_score).",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+PLAYBACK_COMMAND_SECONDS = REGISTRY.histogram(
+    "playback_command_duration_seconds",
+    "Ausführungsdauer der Wiedergabe-Befehle pro Befehl und Ergebnis.",
+    ("action", "status"),
+)
+
+
+def instrument_repository(cls):
+    """
+    Klassen-Decorator, der für jede öffentliche Methode eines Repositories die
+    Datenbankzeit und Anzahl der SQL-Abfragen festhält. Die Werte stammen aus
+    QueryStats (siehe query_stats.thread_totals) und fehlen, wenn diese
+    deaktiviert sind.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(method, types.FunctionType):
+            continue
+        setattr(cls, name, _observe_db_time(method, cls.__name__, name))
+    return cls
+
+
+def _observe_db_time(method, repository: str, name: str):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        before = query_stats.thread_totals() if REGISTRY.enabled else None
+        if before is None:
+            return method(*args, **kwargs)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            queries, seconds = query_stats.thread_totals()
+            REPOSITORY_DB_SECONDS.observe(
+                seconds - before[1], repository=repository, method=name
+            )
+            REPOSITORY_QUERIES.inc(
+                queries - before[0], repository=repository, method=name
+            )
+
+    return wrapper
+
+
+def observe_cpu_time(histogram: Histogram):
+    """Decorator, der die CPU-Zeit des aufrufenden Threads misst."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram, time.thread_time, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def stats_collector(
+    prefix: str, stats, labels=None, counters=("hits", "misses", "evictions")
+):
+    """
+    Collector für Komponenten mit `stats()`: die Werte aus `counters` werden
+    als Counter `<prefix>_<wert>_total`, alle übrigen als Gauge
+    `<prefix>_<wert>` ausgegeben.
+    """
+    labels = labels or {}
+
+    def collect():
+        families = []
+        for key, value in stats().items():
+            if key in counters:
+                name, kind = f"{prefix}_{key}_total", "counter"
+            else:
+                name, kind = f"{prefix}_{key}", "gauge"
+            families.append((name, kind, f"Wert {key} aus stats().", [(labels, value)]))
+        return families
+
+    return collect
+
+
+def query_stats_collector(query_stats):
+    """Collector für die pro Route aufsummierten SQL-Abfragen (siehe QueryStats)."""
+
+    def collect():
+        requests, queries, seconds = [], [], []
+        for route, entry in query_stats.stats().items():
+            labels = {"route": route}
+            requests.append((labels, entry["requests"]))
+            queries.append((labels, entry["queries"]))
+            seconds.append((labels, entry["db_time_ms"] / 1000))
+        return [
+            ("db_route_requests_total", "counter", "Requests pro Route.", requests),
+            ("db_route_queries_total", "counter", "SQL-Abfragen pro Route.", queries),
+            (
+                "db_route_seconds_total",
+                "counter",
+                "Datenbankzeit pro Route in Sekunden.",
+                seconds,
+            ),
+        ]
+
+    return collect
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def init_app(app):
+    """Misst die Requests der App und stellt /metrics bereit."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", _metrics_view)
+
+
+def _start_request():
+    g.metrics_started_at = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop("metrics_started_at", None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else "<unmatched>",
+            status=response.status_code,
+        )
+    return response
+
+
+def _metrics_view():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,380 @@
+"""Modul für versionierte Schema-Migrationen und die Prüfung der Index-Nutzung."""
+
+from datetime import datetime
+import logging
+import re
+import threading
+from flask import jsonify
+from sqlalchemy import event, func, inspect, select, text
+from spotify_server.extensions import db
+from spotify_server.app.matching import artist_keys, join_artist_keys, title_key
+from spotify_server.app.models import (
+    Artist,
+    Playlist,
+    Track,
+    TrainingData,
+    TrainingProgress,
+    track_artists,
+)
+
+logger = logging.getLogger(__name__)
+
+# Anzahl der Tracks, die beim Befüllen neuer Spalten pro Abfrage gelesen werden
+BACKFILL_BATCH_SIZE = 1000
+
+# Buchführung, welche Migrationen bereits eingespielt wurden
+schema_version = db.Table(
+    "schema_version",
+    db.metadata,
+    db.Column("version", db.Integer, primary_key=True, autoincrement=False),
+    db.Column("description", db.String(255)),
+    db.Column("applied_at", db.DateTime),
+)
+
+
+def _add_column(connection, table_name: str, column_name: str, column_type: str):
+    """Fügt eine Spalte hinzu, falls sie noch nicht existiert."""
+    existing = {
+        column["name"] for column in inspect(connection).get_columns(table_name)
+    }
+    if column_name in existing:
+        return
+    quote = connection.dialect.identifier_preparer.quote
+    connection.execute(
+        text(
+            f"ALTER TABLE {quote(table_name)} "
+            f"ADD COLUMN {quote(column_name)} {column_type}"
+        )
+    )
+
+
+def _create_indexes(connection, table: db.Table):
+    """Legt alle im Model deklarierten Indizes an, die noch nicht existieren."""
+    existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(connection)
+
+
+def _migrate_training_progress(connection):
+    TrainingProgress.__table__.create(connection, checkfirst=True)
+    _add_column(connection, "training_data", "due_step", "INTEGER NULL")
+
+
+def _migrate_training_counters(connection):
+    for column_name in (
+        "card_count",
+        "finished_count",
+        "learning_count",
+        "revision_count",
+    ):
+        _add_column(connection, "training_progress", column_name, "INTEGER NULL")
+
+
+def _migrate_hot_query_indexes(connection):
+    _create_indexes(connection, TrainingData.__table__)
+    _create_indexes(connection, Track.__table__)
+
+
+def _migrate_unique_artist_names(connection):
+    """Führt doppelte Künstler zusammen und legt den eindeutigen Index auf artist.name an."""
+    artist = Artist.__table__
+    duplicates = connection.execute(
+        select(artist.c.name, func.min(artist.c.artist_id))
+        .group_by(artist.c.name)
+        .having(func.count() > 1)
+    ).all()
+
+    for name, kept_id in duplicates:
+        duplicate_ids = connection.scalars(
+            select(artist.c.artist_id).where(
+                artist.c.name == name, artist.c.artist_id != kept_id
+            )
+        ).all()
+        linked_track_ids = set(
+            connection.scalars(
+                select(track_artists.c.track_id).where(
+                    track_artists.c.artist_id == kept_id
+                )
+            )
+        )
+        relinked_track_ids = (
+            set(
+                connection.scalars(
+                    select(track_artists.c.track_id).where(
+                        track_artists.c.artist_id.in_(duplicate_ids)
+                    )
+                )
+            )
+            - linked_track_ids
+        )
+
+        # Verknüpfungen der Duplikate auf den verbleibenden Künstler umhängen
+        connection.execute(
+            track_artists.delete().where(track_artists.c.artist_id.in_(duplicate_ids))
+        )
+        if relinked_track_ids:
+            connection.execute(
+                track_artists.insert(),
+                [
+                    {"track_id": track_id, "artist_id": kept_id}
+                    for track_id in relinked_track_ids
+                ],
+            )
+        connection.execute(artist.delete().where(artist.c.artist_id.in_(duplicate_ids)))
+
+    _create_indexes(connection, artist)
+
+
+def _migrate_match_keys(connection):
+    """Legt die Suchschlüssel-Spalten an und befüllt sie für bestehende Tracks."""
+    _add_column(connection, "track", "match_title", "VARCHAR(100) NULL")
+    _add_column(connection, "track", "match_artists", "TEXT NULL")
+
+    track = Track.__table__
+    last_track_id = ""
+    while True:
+        rows = connection.execute(
+            select(track.c.track_id, track.c.name)
+            .where(track.c.track_id > last_track_id)
+            .order_by(track.c.track_id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_track_id = rows[-1][0]
+
+        artists_per_track = {}
+        for track_id, artist_name in connection.execute(
+            select(track_artists.c.track_id, Artist.__table__.c.name)
+            .join(
+                Artist.__table__,
+                Artist.__table__.c.artist_id == track_artists.c.artist_id,
+            )
+            .where(track_artists.c.track_id.in_([row[0] for row in rows]))
+        ):
+            artists_per_track.setdefault(track_id, []).append(artist_name)
+
+        for track_id, name in rows:
+            connection.execute(
+                track.update()
+                .where(track.c.track_id == track_id)
+                .values(
+                    match_title=title_key(name),
+                    match_artists=join_artist_keys(
+                        artist_keys(artists_per_track.get(track_id, []))
+                    ),
+                )
+            )
+
+
+def _migrate_current_round(connection):
+    _add_column(
+        connection, "training_progress", "current_track_id", "VARCHAR(100) NULL"
+    )
+
+
+def _migrate_playlist_imported_at(connection):
+    # Bestehende Playlists bekommen keinen Zeitstempel: Ob ihr Import vollständig
+    # war, ist nicht bekannt, daher werden sie beim nächsten Zugriff einmal
+    # nachgeladen (fehlende Tracks und Verknüpfungen werden ergänzt).
+    _add_column(connection, Playlist.__tablename__, "imported_at", "DATETIME NULL")
+
+
+# Reihenfolge ist verbindlich; neue Migrationen werden nur hinten angehängt.
+MIGRATIONS = [
+    (1, "training_progress und training_data.due_step", _migrate_training_progress),
+    (2, "Materialisierte Zähler in training_progress", _migrate_training_counters),
+    (3, "Indizes für die Trainings-Abfragen", _migrate_hot_query_indexes),
+    (4, "Eindeutige Künstlernamen", _migrate_unique_artist_names),
+    (5, "Normalisierte Suchschlüssel für Tracks", _migrate_match_keys),
+    (6, "Aktuelle Runde in training_progress", _migrate_current_round),
+    (7, "Abgeschlossene Playlist-Importe", _migrate_playlist_imported_at),
+]
+
+
+def get_schema_version() -> int:
+    """Liefert die Version des Schemas (0, wenn noch keine Migration lief)."""
+    schema_version.create(db.engine, checkfirst=True)
+    return (
+        db.session.execute(db.select(db.func.max(schema_version.c.version))).scalar()
+        or 0
+    )
+
+
+def get_pending_migrations() -> list[int]:
+    """
+    Liefert die Versionen der noch nicht eingespielten Migrationen.
+    Anders als get_schema_version wird dabei nichts angelegt.
+    """
+    if not inspect(db.engine).has_table(schema_version.name):
+        return [version for version, _, _ in MIGRATIONS]
+    current_version = (
+        db.session.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    )
+    return [version for version, _, _ in MIGRATIONS if version > current_version]
+
+
+def init_schema_check(app):
+    """
+    Prüft vor den Requests, ob alle Migrationen eingespielt sind.
+
+    Laufen die Models einem älteren Schema voraus, würde jede Abfrage auf die
+    neuen Spalten und Tabellen mit einem SQL-Fehler abbrechen. Stattdessen wird
+    mit 503 und einem Hinweis auf `flask db-upgrade` geantwortet. Ist das Schema
+    einmal aktuell, entfällt die Prüfung. CLI-Befehle sind nicht betroffen.
+    """
+    state = {"current": False}
+    lock = threading.Lock()
+
+    def check_schema():
+        if state["current"]:
+            return None
+        with lock:
+            if not state["current"]:
+                pending = get_pending_migrations()
+                if pending:
+                    logger.error(
+                        "Datenbankschema ist veraltet, ausstehende Migrationen: %s. "
+                        "Bitte `flask db-upgrade` ausführen.",
+                        ", ".join(map(str, pending)),
+                    )
+                    return (
+                        jsonify({"error": "Datenbankschema ist nicht aktuell."}),
+                        503,
+                    )
+                state["current"] = True
+        return None
+
+    app.before_request(check_schema)
+
+
+def upgrade_schema() -> list[int]:
+    """
+    Spielt alle ausstehenden Migrationen in der richtigen Reihenfolge ein.
+
+    Eine leere Datenbank wird direkt aus den Models angelegt und auf die
+    neueste Version gesetzt. Jede Migration läuft in einer eigenen Transaktion.
+
+    Returns:
+        Die Versionen der eingespielten Migrationen.
+    """
+    if not inspect(db.engine).has_table("training_data"):
+        db.create_all()
+        with db.engine.begin() as connection:
+            for version, description, _ in MIGRATIONS:
+                _record_version(connection, version, description)
+        return [version for version, _, _ in MIGRATIONS]
+
+    current_version = get_schema_version()
+    db.session.remove()
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        with db.engine.begin() as connection:
+            migrate(connection)
+            _record_version(connection, version, description)
+        applied.append(version)
+    return applied
+
+
+def _record_version(connection, version: int, description: str):
+    connection.execute(
+        schema_version.insert().values(
+            version=version, description=description, applied_at=datetime.utcnow()
+        )
+    )
+
+
+# Abfragen im Hot Path und die Indizes, von denen mindestens einer genutzt werden muss.
+# Jede Methode wird mit (user_id, playlist_id, *weitere Argumente) aufgerufen.
+# "PRIMARY" steht für den Primärschlüssel der jeweiligen Tabelle; er allein
+# genügt nicht, da ihn fast jede Abfrage nutzt.
+INDEX_CHECKS = [
+    ("training", "get_next_due_step", (), {"ix_training_data_due"}),
+    ("training", "pick_due_card", (), {"ix_training_data_due"}),
+    ("training", "get_training_stats", (), {"ix_training_data_due"}),
+    ("training", "count_tracks_below_threshold", (3,), {"ix_training_data_learning"}),
+    ("training", "get_finished_track_count", (), {"ix_training_data_done"}),
+    (
+        "song",
+        "find_most_popular_untrained_track",
+        (),
+        {"ix_track_popularity"},
+    ),
+]
+
+
+def check_index_usage(
+    training_repository, song_repository, user_id: str, playlist_id: str
+) -> list[tuple[str, bool, set[str]]]:
+    """
+    Führt die Repository-Abfragen aus und prüft per EXPLAIN, welche Indizes sie nutzen.
+
+    Die Ergebnisse hängen vom Optimizer und damit von den Daten ab; die Prüfung
+    sollte daher gegen eine Datenbank mit realistischen Daten laufen.
+
+    Returns:
+        Pro Abfrage ein Tupel (Name, Index genutzt?, genutzte Indizes).
+    """
+    repositories = {"training": training_repository, "song": song_repository}
+    results = []
+    for repository_name, method_name, extra_args, expected_indexes in INDEX_CHECKS:
+        repository = repositories[repository_name]
+        method = getattr(repository, method_name)
+        statements = _capture_statements(
+            lambda: method(user_id, playlist_id, *extra_args)
+        )
+
+        used_indexes = set()
+        for statement, parameters in statements:
+            used_indexes |= _explain_indexes(statement, parameters)
+
+        name = f"{type(repository).__name__}.{method_name}"
+        results.append((name, bool(used_indexes & expected_indexes), used_indexes))
+
+    db.session.rollback()
+    return results
+
+
+def _capture_statements(run_query) -> list[tuple[str, object]]:
+    """Zeichnet alle SELECT-Statements auf, die während `run_query` ausgeführt werden."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        run_query()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def _explain_indexes(statement: str, parameters) -> set[str]:
+    """Führt EXPLAIN für ein Statement aus und liefert die Namen der genutzten Indizes."""
+    connection = db.session.connection()
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).all()
+        indexes = set()
+        for row in rows:
+            detail = row[-1]
+            if "PRIMARY KEY" in detail:
+                indexes.add("PRIMARY")
+            for index_name in re.findall(r"INDEX (\w+)", detail):
+                # SQLite legt zusammengesetzte Primärschlüssel als Autoindex an
+                indexes.add(
+                    "PRIMARY"
+                    if index_name.startswith("sqlite_autoindex")
+                    else index_name
+                )
+        return indexes
+
+    rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings()
+    return {row["key"] for row in rows if row.get("key")}
@@ -45,6 +45,10 @@ class User(db.Model):
 
 class Artist(db.Model):
     __tablename__ = "artist"
+    __table_args__ = (
+        # Schnelle Suche nach Namen und keine doppelten Künstler bei parallelen Importen
+        db.Index("ux_artist_name", "name", unique=True),
+    )
 
     artist_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100))
@@ -54,11 +58,18 @@ class Artist(db.Model):
 
 class Track(db.Model):
     __tablename__ = "track"
+    __table_args__ = (
+        # find_most_popular_untrained_track sortiert nach Popularität
+        db.Index("ix_track_popularity", "popularity"),
+    )
 
     track_id = db.Column(db.String(100), primary_key=True)
     name = db.Column(db.String(100))
     year = db.Column(db.Integer, default=-1)
     popularity = db.Column(db.Integer, default=0)
+    # Normalisierte Suchschlüssel für die Bewertung (siehe matching.py)
+    match_title = db.Column(db.String(100), nullable=True)
+    match_artists = db.Column(db.Text, nullable=True)
 
     artists = db.relationship(
         "Artist", secondary=track_artists, back_populates="tracks"
@@ -75,6 +86,8 @@ class Playlist(db.Model):
 
     playlist_id = db.Column(db.String(100), primary_key=True)
     name = db.Column(db.String(100))
+    # Zeitpunkt, zu dem der Import aller Tracks abgeschlossen wurde
+    imported_at = db.Column(db.DateTime, nullable=True)
 
     tracks = db.relationship("PlaylistTrack", back_populates="playlist")
     training_data = db.relationship("TrainingData", back_populates="playlist")
@@ -100,6 +113,15 @@ class PlaylistTrack(db.Model):
 
 class TrainingData(db.Model):
     __tablename__ = "training_data"
+    __table_args__ = (
+        # Abgestimmt auf die Abfragen im TrainingRepository, die immer nach
+        # (user_id, playlist_id) filtern; angelegt über migrations.py
+        db.Index("ix_training_data_due", "user_id", "playlist_id", "due_step"),
+        db.Index("ix_training_data_done", "user_id", "playlist_id", "is_done"),
+        db.Index(
+            "ix_training_data_learning", "user_id", "playlist_id", "correct_in_row"
+        ),
+    )
 
     user_id = db.Column(
         db.String(100),
@@ -119,7 +141,10 @@ class TrainingData(db.Model):
 
     correct_guesses = db.Column(db.Integer, default=0)
     correct_in_row = db.Column(db.Integer, default=0)
+    # Veraltet: wird nur noch zur Übernahme bestehender Karten in due_step gelesen
     repeat_in_n = db.Column(db.Integer, default=1)
+    # Schritt des TrainingProgress-Zählers, ab dem die Karte fällig ist
+    due_step = db.Column(db.Integer, nullable=True)
     revisions = db.Column(db.Integer, default=0)
     is_done = db.Column(db.Boolean, default=False)
 
@@ -128,4 +153,40 @@ class TrainingData(db.Model):
     track = db.relationship("Track", back_populates="training_data")
 
     def __repr__(self):
-        return f"<TrainingData Track: {self.track_id}, repeat_in_n: {self.repeat_in_n}"
+        return f"<TrainingData Track: {self.track_id}, due_step: {self.due_step}>"
+
+
+class TrainingProgress(db.Model):
+    """
+    Trainingsstand pro User/Playlist: monoton steigender Schrittzähler für die
+    Wiederholungsplanung und materialisierte Zähler für die Statistiken.
+    """
+
+    __tablename__ = "training_progress"
+
+    user_id = db.Column(
+        db.String(100),
+        db.ForeignKey("user.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    playlist_id = db.Column(
+        db.String(100),
+        db.ForeignKey("playlist.playlist_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    step = db.Column(db.Integer, default=0, nullable=False)
+
+    # Zusammenfassung der Karten, wird bei jeder Änderung inkrementell gepflegt
+    card_count = db.Column(db.Integer, nullable=True)
+    finished_count = db.Column(db.Integer, nullable=True)
+    learning_count = db.Column(db.Integer, nullable=True)
+    revision_count = db.Column(db.Integer, nullable=True)
+
+    # Aktuelle Runde: der Track, der zuletzt für diese Playlist gestartet wurde
+    current_track_id = db.Column(db.String(100), nullable=True)
+
+    def __repr__(self):
+        return (
+            f"<TrainingProgress {self.user_id}/{self.playlist_id}, step: {self.step}>"
+        )
@@ -10,7 +10,6 @@ from flask import (
     send_from_directory,
 )
 from datetime import datetime
-import spotipy
 
 
 # Annahme: Deine User- und DB-Objekte sind hier importierbar
@@ -59,7 +58,7 @@ def create_auth_blueprint(playback_service):
         session["token_info"] = token_info
 
         # Identifiziere den User bei Spotify, um ihn in unserer DB zu finden oder anzulegen
-        sp = spotipy.Spotify(auth=token_info["access_token"])
+        sp = playback_service.gateway.user_client(token_info["access_token"])
         spotify_user_info = sp.current_user()
         user_id = spotify_user_info["id"]
 
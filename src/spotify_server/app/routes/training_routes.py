@@ -1,10 +1,17 @@
 """Modul für die Trainings-Routen der Spotify-Server-App."""
 
+import math
 from flask import Blueprint, request, jsonify
 from spotify_server.app.services.training_service import TrainingService
 from spotify_server.app.services.playback_service import PlaybackService
+from spotify_server.app.services.playback_dispatcher import PlaybackDispatcher
 from spotify_server.app.services.user_repository import UserRepository
 
+# Maximale Wartezeit (Sekunden) beim Abfragen eines Wiedergabe-Befehls. Der
+# Request belegt solange einen Worker; länger laufende Befehle fragt der Client
+# erneut ab.
+COMMAND_WAIT_MAX_SECONDS = 1.0
+
 # Annahme: Du hast eine Möglichkeit, den eingeloggten User zu bekommen, z.B. über flask-login
 # from flask_login import current_user, login_required
 
@@ -14,6 +21,7 @@ def create_training_blueprint(
     training_service: TrainingService,
     playback_service: PlaybackService,
     user_repository: UserRepository,
+    playback_dispatcher: PlaybackDispatcher,
 ):
 
     training_bp = Blueprint("training_api", __name__, url_prefix="/api")
@@ -38,7 +46,7 @@ def create_training_blueprint(
 
         # Initialisiere das Training und hole den ersten Song
         user = user_repository.get_user_by_id(user_id)
-        next_track = training_service.choose_next_song(user, playlist_id)
+        next_track = training_service.start_training(user, playlist_id)
 
         if not next_track:
             return (
@@ -65,9 +73,10 @@ def create_training_blueprint(
         score_result = training_service.calculate_score(
             data, data["user_id"]
         )  # Annahme: calculate_score verarbeitet das dict
+        # Bewertet wurde der serverseitig bekannte Song, nicht die ID des Clients
         training_service.update_training(
             data["playlist_id"],
-            data["track_id"],
+            score_result["track_id"],
             score_result.get("score"),
             data["user_id"],
         )
@@ -83,6 +92,42 @@ def create_training_blueprint(
             }
         )
 
+    @training_bp.route("/answer", methods=["POST"])
+    def answer():
+        """
+        Kombiniert check_guess und skip: bewertet die Antwort, aktualisiert die
+        Karte und startet direkt den nächsten Song (eine Transaktion, ein Client).
+        """
+        data = request.get_json()
+        if not data or "user_id" not in data or "playlist_id" not in data:
+            return (
+                jsonify({"error": "Benötigte Daten fehlen: user_id, playlist_id"}),
+                400,
+            )
+
+        user = user_repository.get_user_by_id(data["user_id"])
+        score_result, next_track = training_service.answer_and_advance(user, data)
+
+        response = {
+            "score": score_result.get("score"),
+            "correct_answer": {
+                "year": score_result.get("correct_year"),
+                "artist": score_result.get("correct_artist"),
+                "title": score_result.get("correct_title"),
+            },
+            "track_id": next_track.track_id if next_track else None,
+        }
+        if next_track:
+            # Die Wiedergabe läuft im Hintergrund, der Status ist über die ID abrufbar
+            command = playback_dispatcher.submit(
+                user.user_id, "play", next_track.track_id
+            )
+            response["command_id"] = command.command_id
+        else:
+            response["error"] = "Kein weiterer Song verfügbar."
+
+        return jsonify(response)
+
     @training_bp.route("/skip", methods=["POST"])
     def skip():
         data = request.get_json()
@@ -95,19 +140,50 @@ def create_training_blueprint(
         if not next_track:
             return jsonify({"error": "Kein weiterer Song verfügbar."}), 404
 
-        playback_service.play_song(user_id, next_track.track_id)
+        command = playback_dispatcher.submit(user_id, "play", next_track.track_id)
 
-        # Gib die neue Track-ID zurück
-        return jsonify({"track_id": next_track.track_id})
+        # Gib die neue Track-ID und die ID des Wiedergabe-Befehls zurück
+        return jsonify(
+            {"track_id": next_track.track_id, "command_id": command.command_id}
+        )
 
     @training_bp.route("/play_pause", methods=["POST"])
     def play_pause():
         data = request.get_json()
         user_id = data.get("user_id")
-        user = user_repository.get_user_by_id(user_id)
-        playback_service.toggle_play_pause(user)
+        command = playback_dispatcher.submit(user_id, "toggle")
 
-        return jsonify({"status": "ok"}), 200  # Einfache Bestätigung
+        # Einfache Bestätigung, der Befehl selbst läuft im Hintergrund
+        return jsonify({"status": "ok", "command_id": command.command_id}), 200
+
+    @training_bp.route("/playback/state", methods=["POST"])
+    def playback_state():
+        """
+        Liefert den zuletzt bekannten Wiedergabe-Zustand des Users. Spotify wird
+        nur gefragt, wenn der Zustand veraltet ist oder "refresh" gesetzt ist.
+        """
+        data = request.get_json()
+        user_id = data.get("user_id")
+        state = playback_service.get_playback_state(
+            user_id, refresh=bool(data.get("refresh"))
+        )
+        return jsonify(state.to_dict())
+
+    @training_bp.route("/playback/commands/<command_id>", methods=["GET"])
+    def playback_command_status(command_id):
+        """
+        Liefert den Zustand eines Wiedergabe-Befehls. Mit ?wait=<Sekunden> wird
+        kurz (höchstens COMMAND_WAIT_MAX_SECONDS) auf den Abschluss gewartet;
+        ist der Befehl dann noch nicht fertig, fragt der Client erneut ab.
+        """
+        wait = request.args.get("wait", 0, type=float)
+        if not math.isfinite(wait):
+            return jsonify({"error": "Ungültige Wartezeit."}), 400
+        wait = min(max(wait, 0), COMMAND_WAIT_MAX_SECONDS)
+        command = playback_dispatcher.wait(command_id, timeout=wait)
+        if command is None:
+            return jsonify({"error": "Unbekannter Wiedergabe-Befehl."}), 404
+        return jsonify(command.to_dict())
 
     @training_bp.route("/stats", methods=["POST"])
     def stats():
@@ -115,23 +191,14 @@ def create_training_blueprint(
         user_id = data.get("user_id")
         playlist_id = data.get("playlist_id")
 
-        # Hole die Daten aus dem Repository
-        finished_tracks = training_service.training_repository.get_finished_track_count(
-            user_id, playlist_id
-        )
-        active_tracks = training_service.training_repository.get_active_track_count(
-            user_id, playlist_id
-        )
-        total_revisions = training_service.training_repository.get_total_revisions(
-            user_id, playlist_id
-        )
+        training_repository = training_service.training_repository
 
-        return jsonify(
-            {
-                "finished_tracks": finished_tracks,
-                "active_tracks": active_tracks,
-                "total_revisions": total_revisions,
-            }
-        )
+        # Dashboard-Ansicht: Kennzahlen aller Playlists des Users auf einmal
+        if data.get("all_playlists") or not playlist_id:
+            playlists = training_repository.get_training_stats_by_playlist(user_id)
+            return jsonify({"playlists": playlists})
+
+        # Hole alle Kennzahlen mit einer einzigen Abfrage aus dem Repository
+        return jsonify(training_repository.get_training_stats(user_id, playlist_id))
 
     return training_bp
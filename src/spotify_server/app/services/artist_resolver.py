@@ -0,0 +1,161 @@
+"""Module for resolving artist names to their database IDs."""
+
+from collections import OrderedDict
+import threading
+from sqlalchemy import event
+from spotify_server.extensions import db, insert_ignore
+from spotify_server.app.models import Artist
+
+# Maximale Anzahl an Namen pro IN-Klausel bzw. INSERT
+ARTIST_CHUNK_SIZE = 500
+
+
+class ArtistResolver:
+    """
+    Löst Künstlernamen gebündelt in Artist-IDs auf und legt fehlende Künstler an.
+
+    Bekannte Namen kommen aus einem prozesslokalen, begrenzten LRU-Cache. Für
+    alle anderen genügt eine IN-Abfrage plus ein INSERT IGNORE pro Block; der
+    eindeutige Index auf artist.name verhindert Duplikate auch bei parallelen
+    Importen. Aus der Datenbank gelesene IDs landen erst nach dem Commit im
+    Cache, damit nach einem Rollback, auch eines Savepoints, keine ungültigen
+    IDs gecacht sind.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max(1, max_size)
+        self._cache = OrderedDict()  # name -> artist_id
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, artist_names) -> dict[str, int]:
+        """
+        Liefert die IDs zu allen übergebenen Namen und legt fehlende Künstler an.
+        Es wird nicht committet.
+
+        Returns:
+            Ein Dictionary {name: artist_id}.
+        """
+        names = list(dict.fromkeys(artist_names))
+        artist_ids = {}
+        with self._lock:
+            for name in names:
+                artist_id = self._cache.get(name)
+                if artist_id is not None:
+                    self._cache.move_to_end(name)
+                    artist_ids[name] = artist_id
+            self.hits += len(artist_ids)
+            self.misses += len(names) - len(artist_ids)
+
+        missing_names = [name for name in names if name not in artist_ids]
+        if not missing_names:
+            return artist_ids
+
+        # Auch gefundene Künstler können aus der noch offenen Transaktion stammen;
+        # bis zum Commit liegen alle IDs pro Resolver in der Session (siehe _after_commit)
+        pending = db.session.info.setdefault("pending_artist_ids", {})
+        pending = pending.setdefault(self, {})
+        artist_ids.update(
+            (name, pending[name]) for name in missing_names if name in pending
+        )
+        missing_names = [name for name in missing_names if name not in artist_ids]
+        if not missing_names:
+            return artist_ids
+
+        found = self._select_ids(missing_names)
+        pending.update(found)
+        artist_ids.update(found)
+
+        new_names = [name for name in missing_names if name not in found]
+        if new_names:
+            for start in range(0, len(new_names), ARTIST_CHUNK_SIZE):
+                chunk = new_names[start : start + ARTIST_CHUNK_SIZE]
+                db.session.execute(
+                    insert_ignore(Artist.__table__).values(
+                        [{"name": name} for name in chunk]
+                    )
+                )
+            inserted = self._select_ids(new_names, compare_in_db=True)
+            pending.update(inserted)
+            artist_ids.update(inserted)
+
+        return artist_ids
+
+    def invalidate(self):
+        """Leert den Cache, z.B. nach manuellen Änderungen an der artist-Tabelle."""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        """Liefert die Zähler des Caches, z.B. für Monitoring."""
+        with self._lock:
+            return {"size": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def _select_ids(
+        self, names: list[str], compare_in_db: bool = False
+    ) -> dict[str, int]:
+        """
+        Sucht die IDs bestehender Künstler mit IN-Abfragen.
+
+        Zugeordnet werden nur exakt gleich geschriebene Namen. Die Collation von
+        MySQL ignoriert aber z.B. Groß-/Kleinschreibung, Akzente und Leerzeichen
+        am Ende, sodass ein INSERT IGNORE einen Namen verwerfen kann, der anders
+        geschrieben gespeichert ist. Mit `compare_in_db=True` wird jeder danach
+        noch fehlende Name einzeln mit dem Vergleich der Datenbank gesucht.
+        """
+        artist_ids = {}
+        for start in range(0, len(names), ARTIST_CHUNK_SIZE):
+            chunk = names[start : start + ARTIST_CHUNK_SIZE]
+            for name, artist_id in db.session.query(
+                Artist.name, Artist.artist_id
+            ).filter(Artist.name.in_(chunk)):
+                artist_ids[name] = artist_id
+
+        requested = {name: artist_ids[name] for name in names if name in artist_ids}
+        if compare_in_db:
+            for name in names:
+                if name not in requested:
+                    artist_id = (
+                        db.session.query(Artist.artist_id)
+                        .filter(Artist.name == name)
+                        .scalar()
+                    )
+                    if artist_id is not None:
+                        requested[name] = artist_id
+        return requested
+
+    def _remember(self, name: str, artist_id: int):
+        self._cache[name] = artist_id
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _remember_committed(self, artist_ids: dict[str, int]):
+        with self._lock:
+            for name, artist_id in artist_ids.items():
+                self._remember(name, artist_id)
+
+
+# Die Session-Events werden einmal pro Prozess registriert, nicht pro Resolver.
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    pending = session.info.pop("pending_artist_ids", None)
+    for resolver, artist_ids in (pending or {}).items():
+        resolver._remember_committed(artist_ids)
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    # Nach einem Rollback werden die vorgemerkten IDs verworfen
+    if transaction.parent is None:
+        session.info.pop("pending_artist_ids", None)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _after_soft_rollback(session, previous_transaction):
+    # Auch ein zurückgerollter Savepoint kann neu angelegte Künstler enthalten;
+    # welche IDs aus ihm stammen, ist nicht vermerkt, daher werden alle verworfen
+    if previous_transaction.nested:
+        session.info.pop("pending_artist_ids", None)
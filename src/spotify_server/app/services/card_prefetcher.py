@@ -0,0 +1,172 @@
+"""Module for precomputing the next due cards of active training sessions."""
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+from spotify_server.app.logging_setup import bind_log_context, clear_log_context
+from spotify_server.app.models import TrainingProgress
+from spotify_server.app.services.training_repository import TrainingRepository
+from spotify_server.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class CardPrefetcher:
+    """
+    Berechnet nach jeder gespeicherten Antwort die nächsten fälligen Karten einer
+    Session im Hintergrund vor, damit /api/skip und /api/answer nur noch eine
+    fertige Auswahl übernehmen und die Wiedergabe starten müssen.
+
+    Jeder Puffer merkt sich den Planungsstand, aus dem er berechnet wurde
+    (Anzahl Wiederholungen und Karten sowie der Track der aktuellen Runde aus
+    TrainingProgress). Ändert sich dieser Stand, z.B. durch eine weitere Antwort,
+    neue Karten oder eine neue Runde, wird der Puffer beim nächsten Zugriff
+    verworfen und die Karte wie bisher direkt gewählt. Der Track der aktuellen
+    Runde wird nie vorberechnet, damit er nicht direkt noch einmal läuft.
+    """
+
+    def __init__(
+        self,
+        app,
+        training_repository: TrainingRepository,
+        depth: int = 2,
+        max_workers: int = 2,
+        max_sessions: int = 1024,
+        weighting: str | None = None,
+    ):
+        self.app = app
+        self.training_repository = training_repository
+        self.depth = max(1, depth)
+        self.max_sessions = max(1, max_sessions)
+        self.weighting = weighting
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="card-prefetch"
+        )
+        # (user_id, playlist_id) -> (Planungsstand, Schritt, deque der Track-IDs)
+        self._buffers = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def schedule(self, user_id: str, playlist_id: str):
+        """Stößt die Vorberechnung für eine Session an (nach dem Commit aufrufen)."""
+        self.invalidate(user_id, playlist_id)
+        self._executor.submit(self._run, user_id, playlist_id)
+
+    def pop(
+        self,
+        user_id: str,
+        playlist_id: str,
+        progress: TrainingProgress,
+        version: tuple | None = None,
+    ) -> tuple[str, int] | None:
+        """
+        Entnimmt die nächste vorberechnete Karte, sofern der Puffer noch zum
+        Planungsstand passt.
+
+        Args:
+            progress: Der aktuelle Trainingsstand der Session.
+            version: Der erwartete Planungsstand (siehe `version`), z.B. der Stand
+                vor einer gerade gespeicherten Antwort. Standard: der von `progress`.
+
+        Returns:
+            Ein Tupel (track_id, Schritt, für den die Karte fällig ist) oder None.
+        """
+        if version is None:
+            version = self.version(progress)
+        key = (user_id, playlist_id)
+        with self._lock:
+            entry = self._buffers.get(key)
+            if entry is not None and entry[0] == version:
+                # Der Track der laufenden Runde wird nicht erneut gespielt
+                while entry[2] and entry[2][0] == progress.current_track_id:
+                    entry[2].popleft()
+            if entry is None or entry[0] != version or not entry[2]:
+                self._buffers.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            track_id = entry[2].popleft()
+            if not entry[2]:
+                del self._buffers[key]
+            return track_id, entry[1]
+
+    def invalidate(self, user_id: str, playlist_id: str):
+        """Verwirft den Puffer einer Session."""
+        with self._lock:
+            self._buffers.pop((user_id, playlist_id), None)
+
+    def stats(self) -> dict:
+        """Liefert die Zähler des Puffers, z.B. für Monitoring."""
+        with self._lock:
+            return {
+                "sessions": len(self._buffers),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def prefetch(self, user_id: str, playlist_id: str) -> int:
+        """
+        Berechnet die nächsten fälligen Karten einer Session und legt sie im Puffer ab.
+
+        Returns:
+            Die Anzahl der vorberechneten Karten.
+        """
+        progress = db.session.get(TrainingProgress, (user_id, playlist_id))
+        if progress is None:
+            return 0
+        next_due_step = self.training_repository.get_next_due_step(user_id, playlist_id)
+        if next_due_step is None:
+            return 0
+
+        # Wie in choose_next_song: ist nichts fällig, springt der Zähler weiter
+        step = max(progress.step, next_due_step)
+        # Eine Karte mehr ziehen, falls die der aktuellen Runde darunter ist
+        track_ids = self.training_repository.pick_due_track_ids(
+            user_id,
+            playlist_id,
+            count=self.depth + 1,
+            weighting=self.weighting,
+            step=step,
+        )
+        track_ids = [
+            track_id for track_id in track_ids if track_id != progress.current_track_id
+        ][: self.depth]
+        if not track_ids:
+            return 0
+
+        key = (user_id, playlist_id)
+        with self._lock:
+            self._buffers[key] = (self.version(progress), step, deque(track_ids))
+            self._buffers.move_to_end(key)
+            while len(self._buffers) > self.max_sessions:
+                self._buffers.popitem(last=False)
+        return len(track_ids)
+
+    def _run(self, user_id: str, playlist_id: str):
+        with self.app.app_context():
+            bind_log_context(user_id=user_id, playlist_id=playlist_id)
+            try:
+                self.prefetch(user_id, playlist_id)
+            # pylint: disable=W0718
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Fehler beim Vorberechnen der nächsten Karte: %s", e)
+            finally:
+                db.session.remove()
+                clear_log_context()
+
+    @staticmethod
+    def version(progress: TrainingProgress) -> tuple:
+        """
+        Planungsstand einer Session: jede Antwort erhöht revision_count, jede neue
+        Karte card_count, und jede neue Runde setzt current_track_id.
+        """
+        return (
+            progress.revision_count,
+            progress.card_count,
+            progress.current_track_id,
+        )
@@ -0,0 +1,414 @@
+"""
+Module for a simulated Spotify backend used for offline benchmarks and load tests.
+
+The simulation can run in-process (SPOTIFY_BACKEND=fake) or as a stand-in HTTP
+server that spotipy talks to (SPOTIFY_BACKEND=http):
+
+    python -m spotify_server.app.services.fake_spotify --port 5099 --latency-ms 80
+"""
+
+import argparse
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from flask import Flask, jsonify, redirect, request
+from spotipy.exceptions import SpotifyException
+from spotify_server.app.services.spotify_gateway import PLAYBACK_SCOPE, SpotifyGateway
+
+# Gültigkeit der simulierten Access Tokens in Sekunden
+FAKE_TOKEN_LIFETIME = 3600
+
+# Gerät, auf dem die simulierte Wiedergabe läuft
+FAKE_DEVICE = {"id": "fake-device", "name": "Fake Player", "type": "Computer"}
+
+_TITLE_WORDS = (
+    "Love", "Night", "Dance", "Heart", "Fire", "Summer", "Dream", "Rain", "Gold",
+    "Light", "River", "Road", "Home", "Blue", "Wild", "Time", "Sky", "Echo",
+    "Stone", "Shadow", "City", "Ocean", "Star", "Midnight", "Sweet", "Lonely",
+)  # fmt: skip
+_TITLE_SUFFIXES = ("", "", "", "", " (Live)", " - Remastered 2011", " (feat. Guest)")
+_ARTIST_WORDS = (
+    "Velvet", "Arctic", "Neon", "Silver", "Crimson", "Electric", "Golden",
+    "Paper", "Royal", "Hollow", "Wolves", "Tigers", "Kings", "Machines",
+    "Lights", "Brothers", "Parade", "Avenue", "Hearts", "Birds",
+)  # fmt: skip
+
+
+class FakeSpotifyWorld:
+    """
+    Deterministische Spotify-Simulation: Katalog, Playlists und Player pro User.
+
+    Tracks und Playlists werden aus `seed` und ihrer ID berechnet, sodass jede
+    Instanz mit gleichem Seed dieselben Daten liefert. Jeder Aufruf wartet
+    `latency_ms` (+ bis zu `jitter_ms`) und schlägt mit Wahrscheinlichkeit
+    `error_rate` mit einem SpotifyException (HTTP 503) fehl.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        playlist_size: int = 500,
+        catalog_size: int = 1_000_000,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0.0,
+    ):
+        self.seed = seed
+        self.playlist_size = playlist_size
+        self.catalog_size = max(catalog_size, playlist_size)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+        self._random = random.Random(seed)
+        self._players = {}  # user_id -> {"is_playing": bool, "track_id": str}
+        self._token_counter = 0
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.injected_errors = 0
+
+    def simulate(self, operation: str):
+        """Simuliert Latenz und Fehler eines Aufrufs."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.injected_errors += 1
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if failed:
+            raise SpotifyException(503, -1, f"{operation}: simulierter Fehler")
+
+    def track_id(self, index: int) -> str:
+        # 22 Zeichen wie echte Spotify-IDs
+        return f"fake{index:018d}"
+
+    def track(self, track_id: str) -> dict | None:
+        """Liefert einen Track im Format der Spotify API oder None."""
+        if not track_id.startswith("fake") or not track_id[4:].isdigit():
+            return None
+        index = int(track_id[4:])
+        if index >= self.catalog_size:
+            return None
+
+        rng = random.Random(self.seed * 1_000_003 + index)
+        title = " ".join(rng.sample(_TITLE_WORDS, rng.randint(1, 3)))
+        artists = [self._artist_name(rng.randrange(2000))]
+        if rng.random() < 0.2:
+            artists.append(self._artist_name(rng.randrange(2000)))
+        year, month = rng.randint(1960, 2024), rng.randint(1, 12)
+        return {
+            "id": track_id,
+            "name": title + rng.choice(_TITLE_SUFFIXES),
+            "popularity": rng.randint(0, 100),
+            "artists": [{"name": name} for name in artists],
+            "album": {"release_date": f"{year}-{month:02d}-01"},
+        }
+
+    def playlist_track_ids(self, playlist_id: str) -> list[str]:
+        """Die Tracks einer Playlist, abgeleitet aus Seed und Playlist-ID."""
+        rng = random.Random(f"{self.seed}:{playlist_id}")
+        indexes = rng.sample(range(self.catalog_size), self.playlist_size)
+        return [self.track_id(index) for index in indexes]
+
+    def issue_token(self, user_id: str) -> dict:
+        """Erstellt simulierte Token-Daten für einen User."""
+        with self._lock:
+            self._token_counter += 1
+            counter = self._token_counter
+        return {
+            "access_token": f"fake-access:{user_id}:{counter}",
+            "refresh_token": f"fake-refresh:{user_id}",
+            "token_type": "Bearer",
+            "expires_in": FAKE_TOKEN_LIFETIME,
+            "scope": PLAYBACK_SCOPE,
+        }
+
+    def user_for_token(self, token: str | None) -> str | None:
+        """Ermittelt den User zu einem Access oder Refresh Token."""
+        if token and token.startswith(("fake-access:", "fake-refresh:")):
+            return token.split(":")[1]
+        return None
+
+    def player(self, user_id: str) -> dict:
+        with self._lock:
+            return dict(
+                self._players.get(user_id, {"is_playing": False, "track_id": None})
+            )
+
+    def update_player(self, user_id: str, **changes):
+        with self._lock:
+            player = self._players.setdefault(
+                user_id, {"is_playing": False, "track_id": None}
+            )
+            player.update(changes)
+
+    def _artist_name(self, index: int) -> str:
+        rng = random.Random(self.seed * 7919 + index)
+        name = " ".join(rng.sample(_ARTIST_WORDS, 2))
+        return f"The {name}" if rng.random() < 0.15 else name
+
+
+class FakeSpotifyClient:
+    """Verhält sich wie die von den Services genutzten Teile von spotipy.Spotify."""
+
+    def __init__(self, world: FakeSpotifyWorld, user_id: str | None = None):
+        self.world = world
+        self.user_id = user_id
+
+    def track(self, track_id: str, market=None) -> dict:
+        self.world.simulate("track")
+        track = self.world.track(track_id)
+        if track is None:
+            raise SpotifyException(404, -1, f"Track {track_id} nicht gefunden")
+        return track
+
+    def tracks(self, tracks: list[str], market=None) -> dict:
+        self.world.simulate("tracks")
+        if len(tracks) > 50:
+            raise SpotifyException(400, -1, "Zu viele IDs angefragt")
+        return {"tracks": [self.world.track(track_id) for track_id in tracks]}
+
+    def playlist(self, playlist_id: str, fields=None, **kwargs) -> dict:
+        self.world.simulate("playlist")
+        return {"id": playlist_id, "name": f"Fake Playlist {playlist_id}"}
+
+    def playlist_items(
+        self, playlist_id: str, fields=None, limit=50, offset=0, **kwargs
+    ) -> dict:
+        self.world.simulate("playlist_items")
+        return self._playlist_page(playlist_id, int(limit), int(offset))
+
+    def playlist_tracks(self, playlist_id: str, fields=None, limit=50, offset=0, **kw):
+        return self.playlist_items(playlist_id, fields, limit, offset)
+
+    def next(self, result: dict) -> dict | None:
+        if not result.get("next"):
+            return None
+        url = urlparse(result["next"])
+        query = parse_qs(url.query)
+        return self.playlist_items(
+            url.path.split("/")[-2],
+            limit=query["limit"][0],
+            offset=query["offset"][0],
+        )
+
+    def current_user(self) -> dict:
+        self.world.simulate("current_user")
+        return {"id": self._require_user(), "display_name": self.user_id}
+
+    def current_playback(self, market=None, additional_types=None) -> dict:
+        self.world.simulate("current_playback")
+        player = self.world.player(self._require_user())
+        item = self.world.track(player["track_id"]) if player["track_id"] else None
+        return {
+            "is_playing": player["is_playing"],
+            "item": item,
+            "device": FAKE_DEVICE,
+            "progress_ms": 0,
+        }
+
+    def start_playback(self, device_id=None, context_uri=None, uris=None, **kwargs):
+        self.world.simulate("start_playback")
+        user_id = self._require_user()
+        if uris:
+            self.world.update_player(
+                user_id, is_playing=True, track_id=uris[0].split(":")[-1]
+            )
+            return None
+        # Wie bei Spotify: Fortsetzen einer laufenden Wiedergabe wird abgelehnt
+        if self.world.player(user_id)["is_playing"]:
+            raise SpotifyException(
+                403, -1, "Player command failed: Restriction violated"
+            )
+        self.world.update_player(user_id, is_playing=True)
+        return None
+
+    def pause_playback(self, device_id=None):
+        self.world.simulate("pause_playback")
+        user_id = self._require_user()
+        if not self.world.player(user_id)["is_playing"]:
+            raise SpotifyException(
+                403, -1, "Player command failed: Restriction violated"
+            )
+        self.world.update_player(user_id, is_playing=False)
+        return None
+
+    def _playlist_page(self, playlist_id: str, limit: int, offset: int) -> dict:
+        track_ids = self.world.playlist_track_ids(playlist_id)
+        page = track_ids[offset : offset + limit]
+        next_offset = offset + limit
+        return {
+            "items": [{"track": self.world.track(track_id)} for track_id in page],
+            "limit": limit,
+            "offset": offset,
+            "total": len(track_ids),
+            "next": (
+                f"fake://v1/playlists/{playlist_id}/items"
+                f"?offset={next_offset}&limit={limit}"
+                if next_offset < len(track_ids)
+                else None
+            ),
+        }
+
+    def _require_user(self) -> str:
+        if self.user_id is None:
+            raise SpotifyException(401, -1, "Kein User-Token")
+        return self.user_id
+
+
+class FakeSpotifyAuth:
+    """OAuth-Manager der Simulation; jeder Code und Refresh Token ist gültig."""
+
+    def __init__(self, world: FakeSpotifyWorld, redirect_uri: str | None = None):
+        self.world = world
+        self.redirect_uri = redirect_uri
+
+    def get_authorize_url(self, state=None) -> str:
+        # Der Login wird übersprungen, der Code ist direkt die User-ID
+        return f"{self.redirect_uri}?code=fake-user"
+
+    def get_access_token(self, code=None, as_dict=True, check_cache=False) -> dict:
+        self.world.simulate("token")
+        return self.world.issue_token(code or "fake-user")
+
+    def refresh_access_token(self, refresh_token: str) -> dict:
+        self.world.simulate("token")
+        user_id = self.world.user_for_token(refresh_token)
+        if user_id is None:
+            raise SpotifyException(400, -1, "invalid_grant")
+        return self.world.issue_token(user_id)
+
+
+class FakeSpotifyGateway(SpotifyGateway):
+    """Backend, das alle Anfragen im selben Prozess simuliert."""
+
+    def __init__(self, world: FakeSpotifyWorld, redirect_uri: str | None = None):
+        self.world = world
+        self.redirect_uri = redirect_uri
+
+    def app_client(self) -> FakeSpotifyClient:
+        return FakeSpotifyClient(self.world)
+
+    def user_client(self, access_token: str, requests_session=True):
+        return FakeSpotifyClient(self.world, self.world.user_for_token(access_token))
+
+    def auth_manager(self, scope: str = PLAYBACK_SCOPE) -> FakeSpotifyAuth:
+        return FakeSpotifyAuth(self.world, self.redirect_uri)
+
+
+def create_fake_spotify_app(world: FakeSpotifyWorld) -> Flask:
+    """
+    Stand-in-Server mit den Endpunkten der Spotify Web API, die Spotipy für
+    diese Anwendung aufruft (inklusive Token-Endpunkt).
+    """
+    app = Flask(__name__)
+
+    def client() -> FakeSpotifyClient:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        return FakeSpotifyClient(world, world.user_for_token(token))
+
+    @app.errorhandler(SpotifyException)
+    def spotify_error(error):
+        return (
+            jsonify({"error": {"status": error.http_status, "message": error.msg}}),
+            error.http_status,
+        )
+
+    @app.route("/api/token", methods=["POST"])
+    def token():
+        grant_type = request.form.get("grant_type")
+        world.simulate("token")
+        if grant_type == "client_credentials":
+            return jsonify(
+                {
+                    "access_token": "fake-app",
+                    "token_type": "Bearer",
+                    "expires_in": FAKE_TOKEN_LIFETIME,
+                }
+            )
+        if grant_type == "authorization_code":
+            return jsonify(world.issue_token(request.form.get("code") or "fake-user"))
+        user_id = world.user_for_token(request.form.get("refresh_token"))
+        if grant_type != "refresh_token" or user_id is None:
+            return jsonify({"error": "invalid_grant"}), 400
+        return jsonify(world.issue_token(user_id))
+
+    @app.route("/authorize")
+    def authorize():
+        return redirect(f"{request.args['redirect_uri']}?code=fake-user")
+
+    @app.route("/v1/tracks/<track_id>")
+    def track(track_id):
+        return jsonify(client().track(track_id))
+
+    @app.route("/v1/tracks/")
+    @app.route("/v1/tracks")
+    def tracks():
+        return jsonify(client().tracks(request.args.get("ids", "").split(",")))
+
+    @app.route("/v1/playlists/<playlist_id>")
+    def playlist(playlist_id):
+        return jsonify(client().playlist(playlist_id))
+
+    @app.route("/v1/playlists/<playlist_id>/items")
+    @app.route("/v1/playlists/<playlist_id>/tracks")
+    def playlist_items(playlist_id):
+        page = client().playlist_items(
+            playlist_id,
+            limit=request.args.get("limit", 50, type=int),
+            offset=request.args.get("offset", 0, type=int),
+        )
+        if page["next"]:
+            page["next"] = page["next"].replace("fake://", request.host_url)
+        return jsonify(page)
+
+    @app.route("/v1/me")
+    def current_user():
+        return jsonify(client().current_user())
+
+    @app.route("/v1/me/player")
+    def current_playback():
+        return jsonify(client().current_playback())
+
+    @app.route("/v1/me/player/play", methods=["PUT"])
+    def start_playback():
+        payload = request.get_json(silent=True) or {}
+        client().start_playback(uris=payload.get("uris"))
+        return "", 204
+
+    @app.route("/v1/me/player/pause", methods=["PUT"])
+    def pause_playback():
+        client().pause_playback()
+        return "", 204
+
+    return app
+
+
+def main():
+    """Startet den Stand-in-Server auf der Kommandozeile."""
+    parser = argparse.ArgumentParser(description="Simulierte Spotify Web API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--playlist-size", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    world = FakeSpotifyWorld(
+        seed=args.seed,
+        playlist_size=args.playlist_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+    )
+    create_fake_spotify_app(world).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Module for executing Spotify playback commands outside the request thread."""
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import threading
+import time
+import uuid
+from spotify_server.app.logging_setup import bind_log_context, clear_log_context
+from spotify_server.app.metrics import PLAYBACK_COMMAND_SECONDS
+from spotify_server.app.services.playback_service import PlaybackService
+from spotify_server.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Unterstützte Befehle
+PLAYBACK_ACTIONS = ("play", "toggle", "pause", "resume")
+
+# Zustände eines Befehls
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+COALESCED = "coalesced"  # hebt sich mit einem anderen Befehl auf
+SUPERSEDED = "superseded"  # durch einen späteren Befehl überflüssig geworden
+
+
+class PlaybackCommand:
+    """Ein Wiedergabe-Befehl samt Zustand, abrufbar über seine ID."""
+
+    def __init__(self, user_id: str, action: str, track_id: str | None = None):
+        self.command_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.action = action
+        self.track_id = track_id
+        self.status = QUEUED
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wartet, bis der Befehl abgeschlossen ist; False bei Timeout."""
+        return self._finished.wait(timeout)
+
+    def finish(self, status: str, error: str | None = None):
+        """Setzt den Endzustand und weckt alle Wartenden auf."""
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.utcnow()
+        self._finished.set()
+
+    def to_dict(self) -> dict:
+        return {
+            "command_id": self.command_id,
+            "action": self.action,
+            "track_id": self.track_id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class PlaybackDispatcher:
+    """
+    Führt Wiedergabe-Befehle asynchron in einem Worker-Pool aus.
+
+    Jeder User hat eine eigene Warteschlange, die immer nur von einem Worker
+    abgearbeitet wird; die Reihenfolge pro User bleibt dadurch erhalten.
+    Noch nicht gestartete Befehle werden zusammengefasst: zwei direkt
+    aufeinanderfolgende Toggles heben sich auf, ein neuer Song ersetzt alle
+    wartenden Befehle, Pause/Fortsetzen ersetzen wartende Toggles und
+    Pause/Fortsetzen-Befehle.
+
+    Mit `asynchronous=False` werden Befehle direkt im aufrufenden Thread
+    ausgeführt (z.B. für Tests).
+    """
+
+    def __init__(
+        self,
+        app,
+        playback_service: PlaybackService,
+        max_workers: int = 4,
+        max_commands: int = 10000,
+        asynchronous: bool = True,
+    ):
+        self.app = app
+        self.playback_service = playback_service
+        self.max_commands = max(1, max_commands)
+        self.asynchronous = asynchronous
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="playback"
+        )
+        self._queues = {}  # user_id -> deque wartender Befehle
+        self._active_users = set()  # User, deren Warteschlange gerade läuft
+        self._commands = OrderedDict()  # command_id -> PlaybackCommand
+        self._lock = threading.Lock()
+
+    def submit(
+        self, user_id: str, action: str, track_id: str | None = None
+    ) -> PlaybackCommand:
+        """
+        Reiht einen Befehl für einen User ein und kehrt sofort zurück.
+
+        Args:
+            user_id: Die ID des Benutzers.
+            action: Einer der Befehle aus PLAYBACK_ACTIONS.
+            track_id: Der abzuspielende Track (nur für "play").
+
+        Returns:
+            Der eingereihte (oder direkt zusammengefasste) Befehl.
+
+        Raises:
+            ValueError: Bei einem unbekannten Befehl.
+        """
+        if action not in PLAYBACK_ACTIONS:
+            raise ValueError(f"Unbekannter Wiedergabe-Befehl: {action}")
+
+        command = PlaybackCommand(user_id, action, track_id)
+        with self._lock:
+            self._remember(command)
+            queue = self._queues.setdefault(user_id, deque())
+            self._coalesce(queue, command)
+            if command.status == QUEUED:
+                queue.append(command)
+
+            start_worker = bool(queue) and user_id not in self._active_users
+            if start_worker:
+                self._active_users.add(user_id)
+            elif not queue:
+                del self._queues[user_id]
+
+        if start_worker:
+            if self.asynchronous:
+                self._executor.submit(self._drain, user_id)
+            else:
+                self._drain(user_id)
+        return command
+
+    def get(self, command_id: str) -> PlaybackCommand | None:
+        """Liefert einen Befehl anhand seiner ID (oder None, wenn unbekannt)."""
+        with self._lock:
+            return self._commands.get(command_id)
+
+    def wait(self, command_id: str, timeout: float | None = None):
+        """Wartet auf den Abschluss eines Befehls und liefert ihn zurück."""
+        command = self.get(command_id)
+        if command is not None:
+            command.wait(timeout)
+        return command
+
+    def stats(self) -> dict:
+        """Liefert den Zustand der Warteschlangen, z.B. für Monitoring."""
+        with self._lock:
+            return {
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "active_users": len(self._active_users),
+                "commands": len(self._commands),
+            }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Beendet den Worker-Pool. Mit `wait=True` werden die bereits
+        eingereihten Befehle noch ausgeführt, bevor die Methode zurückkehrt.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _coalesce(self, queue: deque, command: PlaybackCommand):
+        """Fasst den neuen Befehl mit den wartenden Befehlen zusammen."""
+        if command.action == "toggle":
+            if queue and queue[-1].action == "toggle":
+                queue.pop().finish(COALESCED)
+                command.finish(COALESCED)
+        elif command.action == "play":
+            while queue:
+                queue.pop().finish(SUPERSEDED)
+        else:
+            while queue and queue[-1].action != "play":
+                queue.pop().finish(SUPERSEDED)
+
+    def _drain(self, user_id: str):
+        """Arbeitet die Warteschlange eines Users der Reihe nach ab."""
+        while True:
+            with self._lock:
+                queue = self._queues.get(user_id)
+                if not queue:
+                    self._queues.pop(user_id, None)
+                    self._active_users.discard(user_id)
+                    return
+                command = queue.popleft()
+                command.status = RUNNING
+
+            if self.asynchronous:
+                with self.app.app_context():
+                    bind_log_context(user_id=user_id)
+                    try:
+                        self._execute(command)
+                    finally:
+                        db.session.remove()
+                        clear_log_context()
+            else:
+                self._execute(command)
+
+    def _execute(self, command: PlaybackCommand):
+        started = time.perf_counter()
+        try:
+            if command.action == "play":
+                error = self.playback_service.play_song(
+                    command.user_id, command.track_id
+                )
+            elif command.action == "pause":
+                error = self.playback_service.pause_playback(command.user_id)
+            elif command.action == "resume":
+                error = self.playback_service.resume_playback(command.user_id)
+            else:
+                error = self.playback_service.toggle_play_pause(command.user_id)
+        # pylint: disable=W0718
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Fehler beim Wiedergabe-Befehl %s: %s", command.action, e)
+            command.finish(FAILED, str(e))
+        else:
+            if error:
+                command.finish(FAILED, "Wiedergabe bei Spotify fehlgeschlagen.")
+            else:
+                command.finish(DONE)
+
+        PLAYBACK_COMMAND_SECONDS.observe(
+            time.perf_counter() - started,
+            action=command.action,
+            status=command.status,
+        )
+
+    def _remember(self, command: PlaybackCommand):
+        self._commands[command.command_id] = command
+        while len(self._commands) > self.max_commands:
+            self._commands.popitem(last=False)
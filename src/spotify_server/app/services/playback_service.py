@@ -1,30 +1,39 @@
 """Module for handling user specific playback interactions with Spotify."""
 
 from datetime import datetime, timedelta
+import logging
+import threading
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from spotify_server.app.dto import PlaybackState
 from spotify_server.app.models import User, Track
 from spotify_server.app.services.user_repository import UserRepository
+from spotify_server.app.services.spotify_client_cache import SpotifyClientCache
+from spotify_server.app.services.spotify_gateway import SpotifyGateway
 from spotify_server.extensions import db
 import time
 
+logger = logging.getLogger(__name__)
+
 
 class PlaybackService:
     def __init__(
         self,
-        client_id: str,
-        client_secret: str,
-        redirect_uri: str,
+        gateway: SpotifyGateway,
         user_repository: UserRepository,
+        client_cache: SpotifyClientCache | None = None,
+        state_max_age: float = 30,
     ):
-        # Diese Konfiguration wird für den OAuth-Flow benötigt
-        self.auth_manager = SpotifyOAuth(
-            client_id=client_id,
-            client_secret=client_secret,
-            redirect_uri=redirect_uri,
-            scope="user-modify-playback-state user-read-playback-state",
-        )
+        # Der Auth-Manager wird für den OAuth-Flow benötigt
+        self.gateway = gateway
+        self.auth_manager = gateway.auth_manager()
         self.user_repository = user_repository
+        # Wiederverwendete Clients sparen den Verbindungsaufbau pro Anfrage
+        self.client_cache = client_cache or SpotifyClientCache(gateway)
+
+        # Zuletzt bekannter Wiedergabe-Zustand pro User (siehe get_playback_state)
+        self.state_max_age = state_max_age
+        self._states = {}  # user_id -> PlaybackState
+        self._states_lock = threading.Lock()
 
     def _get_user_spotify_client(self, user: User) -> spotipy.Spotify | None:
         """
@@ -37,12 +46,12 @@ class PlaybackService:
                 return None
 
         if not user.spotify_refresh_token:
-            print(f"User {user.username} hat Spotify nicht verbunden.")
+            logger.info("User %s hat Spotify nicht verbunden.", user.username)
             return None
 
         # Prüfen, ob der Access Token abgelaufen ist
         if datetime.utcnow() >= user.spotify_token_expires_at:
-            print("Spotify Access Token ist abgelaufen. Erneuere...")
+            logger.debug("Spotify Access Token ist abgelaufen. Erneuere...")
             try:
                 # Token mit dem Refresh Token erneuern
                 new_token_info = self.auth_manager.refresh_access_token(
@@ -59,14 +68,16 @@ class PlaybackService:
                 )
 
                 db.session.commit()
-                print("Token erfolgreich erneuert und gespeichert.")
+                logger.info("Token erfolgreich erneuert und gespeichert.")
             # pylint: disable=W0718
             except Exception as e:
-                print(f"Fehler beim Erneuern des Tokens für User {user.id}: {e}")
+                logger.error(
+                    "Fehler beim Erneuern des Tokens für User %s: %s", user.user_id, e
+                )
                 return None
 
-        # Erstelle den Client mit dem gültigen Access Token
-        return spotipy.Spotify(auth=user.spotify_access_token)
+        # Hole den Client aus dem Cache oder erstelle ihn mit dem gültigen Access Token
+        return self.client_cache.get_client(user.user_id, user.spotify_access_token)
 
     def play_song(self, user: User, track_id: str):
         """Spielt einen bestimmten Song für einen User ab."""
@@ -80,8 +91,10 @@ class PlaybackService:
                 track_uri = f"spotify:track:{track_id}"
                 # Der 'uris'-Parameter erwartet eine Liste von Song-URIs
                 sp.start_playback(uris=[track_uri])
+                self._set_state(user.user_id, is_playing=True, track_id=track_id)
             except spotipy.exceptions.SpotifyException as e:
-                print(f"Fehler bei der Wiedergabe: {e}")
+                logger.warning("Fehler bei der Wiedergabe: %s", e)
+                self._forget_state(user.user_id)
                 return TimeoutError
 
     def pause_playback(self, user: User):
@@ -91,7 +104,9 @@ class PlaybackService:
         if sp:
             try:
                 sp.pause_playback()
+                self._set_state(self._user_id(user), is_playing=False)
             except spotipy.exceptions.SpotifyException:
+                self._forget_state(self._user_id(user))
                 return TimeoutError()
 
     def resume_playback(self, user: User):
@@ -100,38 +115,118 @@ class PlaybackService:
         if sp:
             try:
                 sp.start_playback()
+                self._set_state(self._user_id(user), is_playing=True)
             except spotipy.exceptions.SpotifyException:
+                self._forget_state(self._user_id(user))
                 return TimeoutError()
 
     def toggle_play_pause(self, user: User):
         """
         Wechselt zwischen Pause und Wiedergabe für einen User.
+
+        Anhand des bekannten Zustands wird genau ein Befehl gesendet. Nur wenn
+        Spotify diesen ablehnt (der Zustand war veraltet, z.B. weil am Handy
+        pausiert wurde), folgt der jeweils andere Befehl.
         """
         sp = self._get_user_spotify_client(user)
 
         if sp is None:
             return
 
+        user_id = self._user_id(user)
+        try:
+            state = self._get_state(user_id, sp)
+        except spotipy.exceptions.SpotifyException:
+            # Zustand unbekannt: wie bisher zuerst pausieren
+            state = PlaybackState(is_playing=True)
+        commands = [sp.pause_playback, sp.start_playback]
+        if not state.is_playing:
+            commands.reverse()
+
         try:
-            sp.pause_playback()
+            commands[0]()
+            self._set_state(user_id, is_playing=not state.is_playing)
 
         except spotipy.exceptions.SpotifyException as e:
             if e.http_status == 403 or e.http_status == 500:  # 500er kommen bei Spotify State-Fehlern auch mal vor
                 try:
-                    sp.start_playback()
+                    commands[1]()
+                    self._set_state(user_id, is_playing=bool(state.is_playing))
                 except spotipy.exceptions.SpotifyException:
-                    pass
+                    self._forget_state(user_id)
             else:
-                print(f"[ERROR] Pause fehlgeschlagen mit unerwartetem Fehler: {e}", flush=True)
+                self._forget_state(user_id)
+                logger.error("Toggle fehlgeschlagen mit unerwartetem Fehler: %s", e)
 
         except Exception as e:
-            print(f"[ERROR] Allgemeiner Fehler bei toggle: {e}", flush=True)
+            self._forget_state(user_id)
+            logger.exception("Allgemeiner Fehler bei toggle: %s", e)
 
     def get_current_id(self, user: User) -> str | None:
         """Holt die aktuelle Song-ID für einen User."""
         sp = self._get_user_spotify_client(user)
         if sp:
-            current_playback = sp.current_playback()
-            if current_playback and current_playback.get("item"):
-                return current_playback["item"]["id"]
+            return self._refresh_state(self._user_id(user), sp).track_id
         return None
+
+    def get_playback_state(self, user: User, refresh: bool = False) -> PlaybackState:
+        """
+        Liefert den Wiedergabe-Zustand eines Users.
+
+        Spotify wird nur gefragt, wenn der bekannte Zustand älter als
+        `state_max_age` Sekunden ist oder `refresh` gesetzt ist.
+        """
+        sp = self._get_user_spotify_client(user)
+        if sp is None:
+            return PlaybackState()
+        if refresh:
+            return self._refresh_state(self._user_id(user), sp)
+        return self._get_state(self._user_id(user), sp)
+
+    def _get_state(self, user_id: str, sp: spotipy.Spotify) -> PlaybackState:
+        with self._states_lock:
+            state = self._states.get(user_id)
+        if state is None or state.is_stale(self.state_max_age):
+            state = self._refresh_state(user_id, sp)
+        return state
+
+    def _refresh_state(self, user_id: str, sp: spotipy.Spotify) -> PlaybackState:
+        """Fragt den Zustand bei Spotify ab und merkt ihn sich."""
+        current_playback = sp.current_playback()
+        if current_playback:
+            item = current_playback.get("item") or {}
+            device = current_playback.get("device") or {}
+            state = PlaybackState(
+                is_playing=bool(current_playback.get("is_playing")),
+                track_id=item.get("id"),
+                device_id=device.get("id"),
+                confirmed_at=datetime.utcnow(),
+            )
+        else:
+            # Kein aktives Gerät: es läuft nichts
+            state = PlaybackState(is_playing=False, confirmed_at=datetime.utcnow())
+
+        with self._states_lock:
+            self._states[user_id] = state
+        return state
+
+    def _set_state(self, user_id: str, **changes):
+        """Übernimmt das Ergebnis eines eigenen, erfolgreichen Befehls."""
+        with self._states_lock:
+            previous = self._states.get(user_id) or PlaybackState()
+            state = PlaybackState(
+                is_playing=changes.get("is_playing", previous.is_playing),
+                track_id=changes.get("track_id", previous.track_id),
+                device_id=changes.get("device_id", previous.device_id),
+                confirmed_at=datetime.utcnow(),
+            )
+            self._states[user_id] = state
+
+    def _forget_state(self, user_id: str):
+        """Verwirft den Zustand, damit er beim nächsten Zugriff neu geladen wird."""
+        with self._states_lock:
+            self._states.pop(user_id, None)
+
+    @staticmethod
+    def _user_id(user: User | str) -> str:
+        return user if type(user) is str else user.user_id
@@ -0,0 +1,205 @@
+"""Module for attributing SQL queries and database time to Flask requests."""
+
+import logging
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from spotify_server.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Route, unter der Abfragen außerhalb eines Requests gezählt werden
+BACKGROUND_ROUTE = "<background>"
+
+# Maximale Länge eines gespeicherten oder geloggten Statements
+STATEMENT_MAX_LENGTH = 500
+
+# Aufsummierte Abfragen und Datenbankzeit pro Thread (z.B. für die Metriken der
+# Repository-Methoden); nur gefüllt, solange QueryStats registriert sind.
+_thread_totals = threading.local()
+_installed = False
+
+
+def thread_totals() -> tuple[int, float] | None:
+    """
+    Liefert (Anzahl, Sekunden) aller bisherigen Abfragen des aktuellen Threads,
+    oder None, wenn keine QueryStats registriert sind. Die Differenz zweier
+    Aufrufe ergibt die Abfragen eines Abschnitts.
+    """
+    if not _installed:
+        return None
+    return getattr(_thread_totals, "count", 0), getattr(_thread_totals, "seconds", 0.0)
+
+
+class RequestQueries:
+    """Abfragen eines einzelnen Requests."""
+
+    __slots__ = ("count", "seconds", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = []  # Liste (Sekunden, Statement), absteigend sortiert
+
+
+class RouteQueries:
+    """Aufsummierte Abfragen aller Requests einer Route."""
+
+    __slots__ = ("requests", "queries", "seconds", "max_queries", "slowest")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.max_queries = 0
+        self.slowest = []
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "queries": self.queries,
+            "queries_per_request": (
+                self.queries / self.requests if self.requests else 0.0
+            ),
+            "max_queries": self.max_queries,
+            "db_time_ms": self.seconds * 1000,
+            "slowest": [
+                {"ms": seconds * 1000, "statement": statement}
+                for seconds, statement in self.slowest
+            ],
+        }
+
+
+class QueryStats:
+    """
+    Misst über die Engine-Events von SQLAlchemy jede SQL-Abfrage und ordnet
+    Anzahl, Datenbankzeit und die langsamsten Statements dem laufenden Request
+    bzw. dessen Route zu. Abfragen aus Hintergrund-Threads landen unter
+    BACKGROUND_ROUTE.
+
+    Statements über `slow_query_ms` werden geloggt; mit `headers=True` stehen
+    die Werte eines Requests zusätzlich in den Antwort-Headern (X-DB-*).
+    """
+
+    def __init__(self, slow_query_ms: float = 200, headers: bool = False, top: int = 3):
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms > 0 else None
+        self.headers = headers
+        self.top = max(1, top)
+
+        self._routes = {}  # Route -> RouteQueries
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Registriert die Engine-Events und Request-Hooks an der App."""
+        global _installed
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_execute)
+                event.listen(engine, "after_cursor_execute", self._after_execute)
+                event.listen(engine, "handle_error", self._handle_error)
+        _installed = True
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions["query_stats"] = self
+
+    def stats(self) -> dict:
+        """Liefert die aufsummierten Werte pro Route, z.B. für Monitoring."""
+        with self._lock:
+            return {route: entry.to_dict() for route, entry in self._routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        _thread_totals.count = getattr(_thread_totals, "count", 0) + 1
+        _thread_totals.seconds = getattr(_thread_totals, "seconds", 0.0) + elapsed
+
+        if has_request_context():
+            route = _route_name()
+            current = g.get("request_queries")
+        else:
+            route = BACKGROUND_ROUTE
+            current = None
+
+        if self.slow_query_seconds and elapsed >= self.slow_query_seconds:
+            logger.warning(
+                "Langsame SQL-Abfrage (%.1f ms, %s): %s",
+                elapsed * 1000,
+                route,
+                _shorten(statement),
+                extra={"duration_ms": elapsed * 1000},
+            )
+
+        if current is not None:
+            current.count += 1
+            current.seconds += elapsed
+            self._keep_slowest(current.slowest, elapsed, statement)
+        elif route == BACKGROUND_ROUTE:
+            with self._lock:
+                entry = self._routes.setdefault(route, RouteQueries())
+                entry.queries += 1
+                entry.seconds += elapsed
+                self._keep_slowest(entry.slowest, elapsed, statement)
+
+    def _handle_error(self, exception_context):
+        # Ein fehlgeschlagenes Statement erreicht after_cursor_execute nicht,
+        # seine Startzeit muss trotzdem vom Stapel der Verbindung.
+        conn = exception_context.connection
+        if conn is None or exception_context.statement is None:
+            return
+        started_at = conn.info.get("query_started_at")
+        if started_at:
+            started_at.pop()
+
+    def _start_request(self):
+        g.request_queries = RequestQueries()
+
+    def _finish_request(self, response):
+        current = g.pop("request_queries", None)
+        if current is None:
+            return response
+
+        with self._lock:
+            entry = self._routes.setdefault(_route_name(), RouteQueries())
+            entry.requests += 1
+            entry.queries += current.count
+            entry.seconds += current.seconds
+            entry.max_queries = max(entry.max_queries, current.count)
+            for seconds, statement in current.slowest:
+                self._keep_slowest(entry.slowest, seconds, statement)
+
+        if self.headers:
+            response.headers["X-DB-Query-Count"] = str(current.count)
+            response.headers["X-DB-Time-Ms"] = f"{current.seconds * 1000:.2f}"
+            if current.slowest:
+                response.headers["X-DB-Slowest-Ms"] = (
+                    f"{current.slowest[0][0] * 1000:.2f}"
+                )
+        return response
+
+    def _keep_slowest(self, slowest: list, seconds: float, statement: str):
+        if len(slowest) >= self.top and seconds <= slowest[-1][0]:
+            return
+        slowest.append((seconds, _shorten(statement)))
+        slowest.sort(key=lambda item: item[0], reverse=True)
+        del slowest[self.top :]
+
+
+def _route_name() -> str:
+    rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+    return f"{request.method} {rule}"
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > STATEMENT_MAX_LENGTH:
+        return statement[:STATEMENT_MAX_LENGTH] + " ..."
+    return statement
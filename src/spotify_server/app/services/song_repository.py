@@ -1,7 +1,10 @@
 """Module for managing song data in the database and interacting with Spotify."""
 
-from sqlalchemy import and_
-from sqlalchemy.orm import joinedload
+from datetime import datetime
+import logging
+import spotipy
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, selectinload
 from spotify_server.extensions import db
 from spotify_server.app.models import (
     Track,
@@ -9,18 +12,47 @@ from spotify_server.app.models import (
     PlaylistTrack,
     Playlist,
     TrainingData,
+    track_artists,
 )  # <-- Importiere deine Model-Klassen
 from spotify_server.app.services.spotify_service import (
     SpotifyService,
 )  # <-- Importiere den SpotifyService
-from spotify_server.app.dto import SongDTO
+from spotify_server.app.services.artist_resolver import ArtistResolver
+from spotify_server.app.services.track_cache import TrackCache
+from spotify_server.app.dto import PlaylistTrackTable, SongDTO
+from spotify_server.app.matching import (
+    artist_keys,
+    join_artist_keys,
+    split_artist_keys,
+    title_key,
+)
+from spotify_server.app.metrics import instrument_repository
 
+logger = logging.getLogger(__name__)
 
+# Maximale Anzahl an Werten pro IN-Klausel, damit die Abfragen handlich bleiben
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int):
+    """Teilt eine Liste in aufeinanderfolgende Blöcke der Größe `size` auf."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+@instrument_repository
 class SongRepository:
-    def __init__(self, spotify_service: SpotifyService):
+    def __init__(
+        self,
+        spotify_service: SpotifyService,
+        artist_resolver: ArtistResolver | None = None,
+        track_cache: TrackCache | None = None,
+    ):
         self.spotify_service = spotify_service
+        self.artist_resolver = artist_resolver or ArtistResolver()
+        self.track_cache = track_cache or TrackCache()
 
-    def get_song(self, track_id: str) -> Track:
+    def get_song(self, track_id: str) -> Track | None:
 
         if type(track_id) is Track:
             track_id = track_id.track_id
@@ -29,37 +61,104 @@ class SongRepository:
         if song:
             return song  # Song existiert bereits in der DB
 
-        else:
-            song_details = self.spotify_service.get_song_details(track_id)
+        # Song über denselben Weg wie beim Playlist-Import anlegen
+        imported_tracks = self._import_tracks([track_id])
 
-            # Erstelle ein neues Track-Objekt, aber speichere es noch nicht.
-            new_track = Track(
-                track_id=track_id,
-                name=song_details["title"],
-                year=song_details["year"],
-                popularity=song_details["popularity"],
-            )
-            db.session.add(new_track)
+        # Speichere alle Änderungen (neuer Track, neue Künstler) in die DB.
+        db.session.commit()
 
-            # Verarbeite die Künstler: Finde bestehende oder erstelle neue.
-            processed_artist_names = []
-            for artist_name in song_details["artists"]:
-                # Prüfe, ob der Künstler bereits in der DB existiert.
-                artist = Artist.query.filter_by(name=artist_name).first()
-                if not artist:
-                    # Wenn nicht, erstelle ein neues Artist-Objekt.
-                    artist = Artist(name=artist_name)
-                    db.session.add(artist)
+        return imported_tracks.get(track_id)
 
-                # Füge den gefundenen oder neuen Künstler zur Track-Beziehung hinzu.
-                new_track.artists.append(artist)
-                processed_artist_names.append(artist.name)
+    def get_song_dto(self, track_id: str) -> SongDTO | None:
+        """
+        Holt die Metadaten eines Songs als DTO, bevorzugt aus dem Track-Cache.
+
+        Bei einem Cache-Miss wird der Track samt Künstlern mit einer Abfrage
+        geladen (bzw. von Spotify importiert) und anschließend gecacht.
+        """
+        song_dto = self.track_cache.get(track_id)
+        if song_dto:
+            return song_dto
+
+        song = Track.query.options(selectinload(Track.artists)).get(track_id)
+        if not song:
+            song = self.get_song(track_id)  # Import von Spotify
+        if not song:
+            return None
 
-            # Speichere alle Änderungen (neuer Track, neue Künstler) in die DB.
-            db.session.commit()
+        song_dto = self.get_dto_by_track(song)
+        self.track_cache.put(song_dto)
+        return song_dto
 
-            # Gib das DTO mit den frisch geholten Daten zurück.
-            return new_track
+    def preload_playlist(self, user_id: str, playlist_id: str) -> int:
+        """
+        Lädt die Metadaten aller Tracks, für die der User in der Playlist Lernkarten
+        hat, gebündelt in den Track-Cache.
+
+        Returns:
+            Die Anzahl der neu gecachten Tracks.
+        """
+        table = self.get_playlist_table(playlist_id, user_id=user_id)
+        preloaded = 0
+        for position, track_id in enumerate(table.track_ids):
+            if not self.track_cache.contains(track_id):
+                self.track_cache.put(table.row(position))
+                preloaded += 1
+        return preloaded
+
+    def get_playlist_table(
+        self, playlist_id: str, user_id: str | None = None
+    ) -> PlaylistTrackTable:
+        """
+        Lädt alle Tracks einer Playlist spaltenorientiert, ohne ORM-Objekte zu erzeugen.
+
+        Args:
+            playlist_id: Die ID der Playlist.
+            user_id: Wenn gesetzt, nur die Tracks, für die der User Lernkarten hat.
+
+        Returns:
+            Eine PlaylistTrackTable mit zwei Abfragen (Tracks und Künstler).
+        """
+        if user_id is None:
+            track_filter = (
+                db.session.query(PlaylistTrack.track_id)
+                .filter(PlaylistTrack.playlist_id == playlist_id)
+                .subquery()
+            )
+        else:
+            track_filter = (
+                db.session.query(TrainingData.track_id)
+                .filter(
+                    TrainingData.user_id == user_id,
+                    TrainingData.playlist_id == playlist_id,
+                )
+                .subquery()
+            )
+
+        table = PlaylistTrackTable(playlist_id)
+        for row in db.session.query(
+            Track.track_id,
+            Track.name,
+            Track.year,
+            Track.popularity,
+            Track.match_title,
+            Track.match_artists,
+        ).join(track_filter, Track.track_id == track_filter.c.track_id):
+            table.append(*row)
+
+        artist_positions = {}
+        artists_per_track = {}
+        for track_id, artist_name in (
+            db.session.query(track_artists.c.track_id, Artist.name)
+            .join(Artist, Artist.artist_id == track_artists.c.artist_id)
+            .join(track_filter, track_artists.c.track_id == track_filter.c.track_id)
+        ):
+            artists_per_track.setdefault(track_id, []).append(
+                artist_positions.setdefault(artist_name, len(artist_positions))
+            )
+        table.set_artists(list(artist_positions), artists_per_track)
+
+        return table
 
     def save_new_song(self, new_song: Track):
         """Speichert einen neuen Song in der Datenbank."""
@@ -98,33 +197,37 @@ class SongRepository:
         song.year = song_dto.year
 
         # Synchronisiere die Künstler-Beziehung.
-        # 1. Bestehende Künstlerverknüpfungen für diesen Song löschen.
-        song.artists.clear()
-
-        # 2. Die Künstlerliste aus dem DTO neu aufbauen.
-        processed_artist_names = []
-        for artist_name in song_dto.artists:
-            # Prüfe, ob der Künstler bereits existiert, sonst erstelle ihn.
-            artist = Artist.query.filter_by(name=artist_name).first()
-            if not artist:
-                artist = Artist(name=artist_name)
-                db.session.add(artist)
-
-            # Füge die Verknüpfung zum Song hinzu.
-            song.artists.append(artist)
-            processed_artist_names.append(artist.name)
+        # Alle Namen werden gebündelt aufgelöst (fehlende Künstler werden angelegt)
+        # und die Künstlerliste anschließend mit einer Abfrage neu aufgebaut.
+        artist_ids = self.artist_resolver.resolve(song_dto.artists)
+        artists_by_id = {
+            artist.artist_id: artist
+            for artist in Artist.query.filter(
+                Artist.artist_id.in_(set(artist_ids.values()))
+            )
+        }
+        song.artists = list(
+            dict.fromkeys(artists_by_id[artist_ids[name]] for name in song_dto.artists)
+        )
+        song.match_title = title_key(song_dto.title)
+        song.match_artists = join_artist_keys(artist_keys(song_dto.artists))
 
         # Speichere die Änderungen in der Datenbank.
         db.session.commit()
+        self.track_cache.invalidate(song_dto.track_id)
 
     def get_playlist_tracks(self, playlist_id: str) -> list[Track]:
         """
         Holt die Track-Objekte einer Playlist aus der DB oder lädt sie von Spotify.
 
-        Prüft, ob die Playlist bereits vollständig in der Datenbank existiert.
-        Wenn nicht, werden die Track-IDs von Spotify geladen, jeder einzelne
-        Track wird über die 'get_song'-Logik verarbeitet (in die DB geschrieben) und
-        anschließend mit der Playlist in der Datenbank verknüpft.
+        Prüft, ob die Playlist bereits vollständig in der Datenbank existiert,
+        d.h. ob ihr Import abgeschlossen wurde (`Playlist.imported_at`).
+        Wenn nicht, werden die Tracks seitenweise samt Metadaten von Spotify
+        geladen, per IN-Abfrage mit der DB abgeglichen, fehlende Tracks angelegt
+        und mit der Playlist verknüpft. Jede Seite wird geschrieben, sobald sie
+        vorliegt; alles wird mit einem einzigen Commit gespeichert. Der Import
+        läuft in einem Savepoint: schlägt eine Seite fehl, wird nur der Import
+        zurückgerollt, nicht die übrigen Änderungen der Session.
 
         Args:
             playlist_id: Die Spotify-ID der Playlist.
@@ -133,20 +236,20 @@ class SongRepository:
             Eine Liste der Track-Objekte, die zur Playlist gehören.
         """
         # Prüfe, ob die Playlist bereits in der DB existiert.
-        # .options(joinedload(Playlist.tracks)) optimiert die Abfrage, um die verknüpften
-        # Track-Objekte direkt mitzuladen und weitere DB-Anfragen zu vermeiden.
-        playlist = Playlist.query.options(joinedload(Playlist.tracks)).get(playlist_id)
-
-        # Wenn die Playlist existiert und bereits Tracks zugeordnet sind, gib die Objekte zurück.
-        if playlist and playlist.tracks:
-            print(f"Lade Tracks für Playlist {playlist_id} aus der Datenbank.")
+        # Die verschachtelten joinedloads laden PlaylistTrack UND Track in einer
+        # einzigen Abfrage, statt für jeden Eintrag den Track einzeln nachzuladen.
+        playlist = Playlist.query.options(
+            joinedload(Playlist.tracks).joinedload(PlaylistTrack.track)
+        ).get(playlist_id)
+
+        # Wenn der Import der Playlist abgeschlossen ist, gib die Objekte zurück.
+        if playlist and playlist.imported_at:
+            logger.debug("Lade Tracks für Playlist %s aus der Datenbank.", playlist_id)
             return [pt.track for pt in playlist.tracks]
 
-        # Wenn die Playlist nicht (vollständig) existiert, lade die IDs von Spotify.
-        print(f"Lade Tracks für Playlist {playlist_id} von der Spotify-API.")
-        track_ids_from_spotify = self.spotify_service.get_playlist_tracks(playlist_id)
-        if not track_ids_from_spotify:
-            return []  # Playlist ist leer oder konnte nicht geladen werden.
+        # Wenn die Playlist nicht (vollständig) existiert, lade sie von Spotify.
+        logger.info("Lade Tracks für Playlist %s von der Spotify-API.", playlist_id)
+        savepoint = db.session.begin_nested()
 
         # Wenn die Playlist selbst noch nicht existiert, erstelle sie.
         if not playlist:
@@ -161,25 +264,129 @@ class SongRepository:
             playlist = Playlist(playlist_id=playlist_id, name=playlist_name)
             db.session.add(playlist)
 
-        # Stelle sicher, dass alle Tracks in der DB existieren und erstelle die Verknüpfungen.
-        final_track_objects = []
-        for track_id in track_ids_from_spotify:
-            # get_song stellt sicher, dass der Track in der DB ist und gibt das Objekt zurück.
-            track = self.get_song(track_id)  # Annahme: diese Methode existiert
-            if track:
-                final_track_objects.append(track)
-                # Erstelle die Verknüpfung in der PlaylistTrack-Tabelle, falls sie noch nicht existiert.
-                association_exists = PlaylistTrack.query.get((playlist_id, track_id))
-                if not association_exists:
-                    association = PlaylistTrack(
-                        playlist_id=playlist_id, track_id=track_id
-                    )
-                    db.session.add(association)
-
-        # Speichere alle neuen Einträge (Playlist, Tracks, Artists, Verknüpfungen).
+        # Jede Seite enthält bereits alle Metadaten und wird sofort geschrieben,
+        # bevor die nächste Seite angefragt wird.
+        tracks_by_id = {}
+        try:
+            for page in self.spotify_service.iter_playlist_track_pages(playlist_id):
+                page_details = {
+                    details["track_id"]: details
+                    for details in page
+                    if details["track_id"] not in tracks_by_id
+                }
+                if not page_details:
+                    continue
+
+                page_tracks = self._import_tracks(list(page_details), page_details)
+                self._link_tracks(playlist_id, list(page_tracks))
+                tracks_by_id.update(page_tracks)
+                db.session.flush()
+        except spotipy.exceptions.SpotifyException:
+            # Eine unvollständige Playlist nicht speichern
+            savepoint.rollback()
+            logger.error(
+                "Import der Playlist %s abgebrochen, nichts gespeichert.", playlist_id
+            )
+            return []
+
+        if not tracks_by_id:
+            savepoint.rollback()
+            return []  # Playlist ist leer oder konnte nicht geladen werden.
+
+        # Speichere alle neuen Einträge (Playlist, Tracks, Artists, Verknüpfungen)
+        # zusammen mit der Markierung des abgeschlossenen Imports in einer
+        # einzigen Transaktion.
+        playlist.imported_at = datetime.utcnow()
+        savepoint.commit()
         db.session.commit()
 
-        return final_track_objects
+        return list(tracks_by_id.values())
+
+    def _link_tracks(self, playlist_id: str, track_ids: list[str]):
+        """Erstellt die fehlenden Verknüpfungen in der PlaylistTrack-Tabelle."""
+        linked_track_ids = set()
+        for chunk in _chunks(track_ids, IN_CLAUSE_CHUNK_SIZE):
+            linked_track_ids.update(
+                row[0]
+                for row in db.session.query(PlaylistTrack.track_id).filter(
+                    PlaylistTrack.playlist_id == playlist_id,
+                    PlaylistTrack.track_id.in_(chunk),
+                )
+            )
+        db.session.add_all(
+            PlaylistTrack(playlist_id=playlist_id, track_id=track_id)
+            for track_id in track_ids
+            if track_id not in linked_track_ids
+        )
+
+    def _import_tracks(
+        self, track_ids: list[str], known_details: dict[str, dict] | None = None
+    ) -> dict[str, Track]:
+        """
+        Stellt sicher, dass alle übergebenen Tracks in der Session existieren.
+
+        Bereits gespeicherte Tracks werden mit IN-Abfragen geladen. Für fehlende
+        Tracks werden die Details aus `known_details` genutzt (z.B. aus der
+        Playlist-Antwort) oder gebündelt über den Multi-Track-Endpunkt von Spotify
+        geholt und samt Künstlern angelegt. Es wird nicht committet, damit der
+        Aufrufer alles in einer Transaktion speichern kann.
+
+        Returns:
+            Ein Dictionary {track_id: Track} aller gefundenen oder neu angelegten Tracks.
+        """
+        tracks_by_id = {}
+        for chunk in _chunks(track_ids, IN_CLAUSE_CHUNK_SIZE):
+            for track in Track.query.filter(Track.track_id.in_(chunk)):
+                tracks_by_id[track.track_id] = track
+
+        missing_ids = [
+            track_id for track_id in track_ids if track_id not in tracks_by_id
+        ]
+        if not missing_ids:
+            return tracks_by_id
+
+        if known_details is not None:
+            song_details = {
+                track_id: known_details[track_id]
+                for track_id in missing_ids
+                if track_id in known_details
+            }
+        else:
+            song_details = self.spotify_service.get_several_song_details(missing_ids)
+
+        # Alle Künstler der neuen Tracks mit einem Aufruf auflösen bzw. anlegen
+        artist_ids = self.artist_resolver.resolve(
+            artist_name
+            for details in song_details.values()
+            for artist_name in details["artists"]
+        )
+
+        for track_id, details in song_details.items():
+            new_track = Track(
+                track_id=track_id,
+                name=details["title"],
+                year=details["year"],
+                popularity=details["popularity"],
+                match_title=title_key(details["title"]),
+                match_artists=join_artist_keys(artist_keys(details["artists"])),
+            )
+            db.session.add(new_track)
+            tracks_by_id[track_id] = new_track
+
+        # Die Tracks müssen vor den Verknüpfungen geschrieben sein (Fremdschlüssel).
+        db.session.flush()
+        artist_links = [
+            {"track_id": track_id, "artist_id": artist_id}
+            for track_id, details in song_details.items()
+            # dict.fromkeys verhindert doppelte Verknüpfungen bei doppelt genannten Künstlern
+            for artist_id in dict.fromkeys(
+                artist_ids[name] for name in details["artists"]
+            )
+        ]
+        for chunk in _chunks(artist_links, IN_CLAUSE_CHUNK_SIZE):
+            db.session.execute(insert(track_artists).values(chunk))
+
+        return tracks_by_id
 
     def find_most_popular_untrained_track(
         self, user_id: str, playlist_id: str
@@ -188,32 +395,74 @@ class SongRepository:
         Findet den populärsten Track in einer Playlist, für den ein User noch keine
         Lernkarte hat, mit einer einzigen, effizienten Datenbankabfrage.
         """
+        return self._untrained_tracks_query(Track, user_id, playlist_id).first()
+
+    def find_untrained_track_ids(
+        self, user_id: str, playlist_id: str, limit: int
+    ) -> list[str]:
+        """
+        Findet die IDs der `limit` populärsten Tracks einer Playlist, für die der
+        User noch keine Lernkarte hat (eine Anti-Join-Abfrage, nur IDs).
+        """
+        return [
+            row[0]
+            for row in self._untrained_tracks_query(
+                Track.track_id, user_id, playlist_id
+            )
+            .limit(limit)
+            .all()
+        ]
+
+    def _untrained_tracks_query(self, entity, user_id: str, playlist_id: str):
+        """
+        Baut die Anti-Join-Abfrage für Tracks einer Playlist ohne Lernkarte.
+        """
         # Diese Abfrage führt folgende Schritte aus:
-        # 1. JOIN Track mit PlaylistTrack, um die Playlist-Zugehörigkeit zu prüfen.
-        # 2. OUTERJOIN mit TrainingData für den spezifischen User.
-        # 3. FILTER auf die korrekte Playlist-ID.
-        # 4. FILTER auf die Zeilen, bei denen der OUTERJOIN fehlschlug (TrainingData.user_id IS NULL),
-        #    was bedeutet, dass für diesen Track keine Karte existiert.
-        # 5. ORDER BY Popularität absteigend.
-        # 6. LIMIT 1, um nur den besten Treffer zu erhalten.
-
-        most_popular_track = (
-            Track.query.join(PlaylistTrack, Track.track_id == PlaylistTrack.track_id)
-            .outerjoin(
-                TrainingData,
-                and_(
-                    Track.track_id == TrainingData.track_id,
-                    TrainingData.user_id == user_id,
-                ),
+        # 1. Tracks absteigend nach Popularität über ix_track_popularity lesen,
+        #    ohne das Ergebnis sortieren zu müssen.
+        # 2. EXISTS: der Track gehört zur Playlist (Primärschlüssel von PlaylistTrack).
+        # 3. NOT EXISTS: der User hat für den Track noch keine Lernkarte
+        #    (Primärschlüssel von TrainingData).
+        # Mit LIMIT endet der Scan beim ersten passenden Track; ein JOIN ab
+        # PlaylistTrack müsste dagegen erst alle Tracks der Playlist sortieren.
+        in_playlist = (
+            db.session.query(PlaylistTrack.track_id)
+            .filter(
+                PlaylistTrack.playlist_id == playlist_id,
+                PlaylistTrack.track_id == Track.track_id,
             )
+            .exists()
+        )
+        has_card = (
+            db.session.query(TrainingData.track_id)
             .filter(
-                PlaylistTrack.playlist_id == playlist_id, TrainingData.user_id.is_(None)
+                TrainingData.user_id == user_id,
+                TrainingData.playlist_id == playlist_id,
+                TrainingData.track_id == Track.track_id,
             )
+            .exists()
+        )
+        return (
+            db.session.query(entity)
+            .filter(in_playlist, ~has_card)
             .order_by(Track.popularity.desc())
-            .first()
         )
 
-        return most_popular_track
+    def ensure_playlist_imported(self, playlist_id: str) -> bool:
+        """
+        Stellt sicher, dass die Tracks einer Playlist in der DB sind, ohne sie zu laden.
+
+        Returns:
+            True, wenn der Import der Playlist abgeschlossen ist und sie Tracks enthält.
+        """
+        imported_at = (
+            db.session.query(Playlist.imported_at)
+            .filter(Playlist.playlist_id == playlist_id)
+            .scalar()
+        )
+        if imported_at:
+            return True
+        return bool(self.get_playlist_tracks(playlist_id))
 
     def get_dto_by_track(self, track: Track) -> SongDTO:
         """
@@ -225,4 +474,6 @@ class SongRepository:
             artists=[artist.name for artist in track.artists],
             year=track.year,
             popularity=track.popularity,
+            match_title=track.match_title,
+            match_artists=split_artist_keys(track.match_artists),
         )
@@ -0,0 +1,119 @@
+"""Module for caching user specific Spotify clients between requests."""
+
+from collections import OrderedDict
+import threading
+import time
+import requests
+import spotipy
+from urllib3.util.retry import Retry
+from spotify_server.app.services.spotify_gateway import SpotifyGateway
+
+
+class SpotifyClientCache:
+    """
+    Begrenzter LRU-Cache für Spotipy-Clients pro User.
+
+    Alle Clients teilen sich eine gepoolte Keep-Alive-Session, sodass nicht bei
+    jeder Anfrage eine neue TCP/TLS-Verbindung zu Spotify aufgebaut werden muss.
+    Ein Eintrag wird verworfen, sobald sich der Access Token des Users ändert
+    oder er länger als `idle_timeout` Sekunden nicht benutzt wurde.
+    """
+
+    def __init__(
+        self,
+        gateway: SpotifyGateway,
+        max_size: int = 256,
+        idle_timeout: int = 900,
+        pool_size: int = 32,
+    ):
+        self.gateway = gateway
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.session = self._build_session(pool_size)
+
+        # user_id -> (access_token, client, zuletzt benutzt)
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_client(self, user_id: str, access_token: str):
+        """
+        Gibt den gecachten Client für einen User zurück oder erstellt einen neuen.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(user_id)
+            if entry is not None:
+                cached_token, client, last_used = entry
+                if cached_token == access_token and now - last_used < self.idle_timeout:
+                    self._clients[user_id] = (cached_token, client, now)
+                    self._clients.move_to_end(user_id)
+                    self.hits += 1
+                    return client
+
+                # Token wurde erneuert oder der Eintrag ist zu alt
+                del self._clients[user_id]
+                self.evictions += 1
+
+            self.misses += 1
+            client = self.gateway.user_client(
+                access_token, requests_session=self.session
+            )
+            self._clients[user_id] = (access_token, client, now)
+
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+
+            return client
+
+    def invalidate(self, user_id: str):
+        """Entfernt den Client eines Users, z.B. nach einem Token-Wechsel."""
+        with self._lock:
+            if self._clients.pop(user_id, None) is not None:
+                self.evictions += 1
+
+    def active_user_ids(self) -> list[str]:
+        """Gibt die User zurück, deren Client innerhalb von `idle_timeout` benutzt wurde."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                user_id
+                for user_id, (_, _, last_used) in self._clients.items()
+                if now - last_used < self.idle_timeout
+            ]
+
+    def stats(self) -> dict:
+        """Liefert die Zähler des Caches, z.B. für Monitoring."""
+        with self._lock:
+            return {
+                "size": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _build_session(self, pool_size: int) -> requests.Session:
+        """
+        Baut eine gemeinsame Session mit Verbindungspool.
+        Die Retry-Einstellungen entsprechen den Standardwerten von Spotipy.
+        """
+        session = requests.Session()
+        retry = Retry(
+            total=3,
+            connect=None,
+            read=False,
+            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+            status=3,
+            backoff_factor=0.3,
+            status_forcelist=spotipy.Spotify.default_retry_codes,
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
@@ -0,0 +1,214 @@
+"""Module for the Spotify backends the services talk to."""
+
+from abc import ABC, abstractmethod
+import functools
+import time
+import spotipy
+from spotipy.exceptions import SpotifyException
+from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
+from spotify_server.app.metrics import SPOTIFY_REQUEST_SECONDS, SPOTIFY_TOKEN_REFRESHES
+
+# Berechtigungen, die der OAuth-Flow für die Wiedergabe anfragt
+PLAYBACK_SCOPE = "user-modify-playback-state user-read-playback-state"
+
+# Unterstützte Werte für SPOTIFY_BACKEND
+SPOTIFY_BACKENDS = ("spotify", "http", "fake")
+
+# Methoden des Auth-Managers, die Spotify tatsächlich aufrufen
+AUTH_OPERATIONS = ("get_access_token", "refresh_access_token")
+
+
+class SpotifyGateway(ABC):
+    """
+    Schnittstelle zwischen den Services und einem Spotify-Backend.
+
+    Die gelieferten Clients verhalten sich wie `spotipy.Spotify`, soweit die
+    Services sie nutzen (track, tracks, playlist, playlist_items, next,
+    current_user, current_playback, start_playback, pause_playback), und
+    melden Fehler als `spotipy.exceptions.SpotifyException`. Der Auth-Manager
+    bietet get_authorize_url, get_access_token und refresh_access_token.
+    """
+
+    @abstractmethod
+    def app_client(self):
+        """Client für Katalog-Anfragen ohne User-Bezug (Client Credentials)."""
+
+    @abstractmethod
+    def user_client(self, access_token: str, requests_session=True):
+        """Client für die Anfragen eines Users mit dessen Access Token."""
+
+    @abstractmethod
+    def auth_manager(self, scope: str = PLAYBACK_SCOPE):
+        """OAuth-Manager für Login und das Erneuern von Tokens."""
+
+
+class SpotipyGateway(SpotifyGateway):
+    """
+    Spricht per Spotipy mit der echten Spotify API oder, wenn `api_url` gesetzt
+    ist, mit einem kompatiblen Stand-in-Server (siehe fake_spotify.py).
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str | None = None,
+        api_url: str | None = None,
+    ):
+        if not client_id or not client_secret:
+            raise ValueError("Spotify Client ID und Secret müssen konfiguriert sein.")
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.api_url = api_url.rstrip("/") if api_url else None
+
+    def app_client(self) -> spotipy.Spotify:
+        # Nutzt den "Client Credentials Flow" für Server-zu-Server-Anfragen
+        auth_manager = SpotifyClientCredentials(
+            client_id=self.client_id, client_secret=self.client_secret
+        )
+        self._redirect_auth(auth_manager)
+        return self._redirect_client(spotipy.Spotify(auth_manager=auth_manager))
+
+    def user_client(self, access_token: str, requests_session=True) -> spotipy.Spotify:
+        return self._redirect_client(
+            spotipy.Spotify(auth=access_token, requests_session=requests_session)
+        )
+
+    def auth_manager(self, scope: str = PLAYBACK_SCOPE) -> SpotifyOAuth:
+        auth_manager = SpotifyOAuth(
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            redirect_uri=self.redirect_uri,
+            scope=scope,
+        )
+        self._redirect_auth(auth_manager)
+        return auth_manager
+
+    def _redirect_client(self, client: spotipy.Spotify) -> spotipy.Spotify:
+        if self.api_url:
+            client.prefix = f"{self.api_url}/v1/"
+        return client
+
+    def _redirect_auth(self, auth_manager):
+        if self.api_url:
+            auth_manager.OAUTH_TOKEN_URL = f"{self.api_url}/api/token"
+            auth_manager.OAUTH_AUTHORIZE_URL = f"{self.api_url}/authorize"
+
+
+class InstrumentedGateway(SpotifyGateway):
+    """
+    Umhüllt ein anderes Backend und misst jeden Aufruf an Spotify, getrennt
+    nach Operation und Status (siehe metrics.py).
+    """
+
+    def __init__(self, gateway: SpotifyGateway):
+        self.gateway = gateway
+
+    def app_client(self):
+        return InstrumentedClient(self.gateway.app_client())
+
+    def user_client(self, access_token: str, requests_session=True):
+        return InstrumentedClient(
+            self.gateway.user_client(access_token, requests_session=requests_session)
+        )
+
+    def auth_manager(self, scope: str = PLAYBACK_SCOPE):
+        return InstrumentedClient(
+            self.gateway.auth_manager(scope), operations=AUTH_OPERATIONS
+        )
+
+
+class InstrumentedClient:
+    """
+    Stellvertreter für einen Client oder Auth-Manager, der die Aufrufe der
+    öffentlichen Methoden (bzw. nur der in `operations` genannten) misst.
+    """
+
+    def __init__(self, client, operations: tuple[str, ...] | None = None):
+        self._client = client
+        self._operations = operations
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if (
+            name.startswith("_")
+            or not callable(attribute)
+            or (self._operations is not None and name not in self._operations)
+        ):
+            return attribute
+
+        wrapper = _observe_spotify_call(attribute, name)
+        # Nur beim ersten Zugriff umhüllen
+        setattr(self, name, wrapper)
+        return wrapper
+
+
+def _observe_spotify_call(function, operation: str):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except SpotifyException as e:
+            status = str(e.http_status)
+            raise
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            SPOTIFY_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, operation=operation, status=status
+            )
+            if operation == "refresh_access_token":
+                SPOTIFY_TOKEN_REFRESHES.inc(status=status)
+
+    return wrapper
+
+
+def create_spotify_gateway(config) -> SpotifyGateway:
+    """
+    Erstellt das Backend laut SPOTIFY_BACKEND:
+        "spotify" - die echte Spotify API,
+        "http"    - ein Stand-in-Server unter SPOTIFY_API_URL,
+        "fake"    - simulierte Daten im selben Prozess.
+
+    Raises:
+        ValueError: Bei einem unbekannten Backend.
+    """
+    backend = config["SPOTIFY_BACKEND"]
+    if backend == "spotify":
+        return SpotipyGateway(
+            config["SPOTIFY_CLIENT_ID"],
+            config["SPOTIFY_CLIENT_SECRET"],
+            redirect_uri=config["SPOTIFY_REDIRECT_URI"],
+        )
+    if backend == "http":
+        # Der Stand-in prüft keine Zugangsdaten
+        return SpotipyGateway(
+            config["SPOTIFY_CLIENT_ID"] or "fake-client",
+            config["SPOTIFY_CLIENT_SECRET"] or "fake-secret",
+            redirect_uri=config["SPOTIFY_REDIRECT_URI"],
+            api_url=config["SPOTIFY_API_URL"],
+        )
+    if backend == "fake":
+        from spotify_server.app.services.fake_spotify import (
+            FakeSpotifyGateway,
+            FakeSpotifyWorld,
+        )
+
+        return FakeSpotifyGateway(
+            FakeSpotifyWorld(
+                seed=config["FAKE_SPOTIFY_SEED"],
+                playlist_size=config["FAKE_SPOTIFY_PLAYLIST_SIZE"],
+                latency_ms=config["FAKE_SPOTIFY_LATENCY_MS"],
+                jitter_ms=config["FAKE_SPOTIFY_JITTER_MS"],
+                error_rate=config["FAKE_SPOTIFY_ERROR_RATE"],
+            ),
+            redirect_uri=config["SPOTIFY_REDIRECT_URI"],
+        )
+    raise ValueError(
+        f"Unbekanntes Spotify-Backend: {backend} (erlaubt: {SPOTIFY_BACKENDS})"
+    )
@@ -1,7 +1,23 @@
 """Module for handling any not user related spotify interactions."""
 
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
 import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+from spotify_server.app.services.spotify_gateway import SpotifyGateway
+
+logger = logging.getLogger(__name__)
+
+# Maximale Anzahl an IDs, die der Multi-Track-Endpunkt pro Anfrage akzeptiert
+TRACKS_PER_REQUEST = 50
+
+# Maximale Seitengröße des Playlist-Endpunkts
+PLAYLIST_PAGE_SIZE = 100
+
+# Alle Felder, die wir für einen Track brauchen, direkt in der Playlist-Anfrage
+PLAYLIST_TRACK_FIELDS = (
+    "items(track(id,name,popularity,artists(name),album(release_date))),next,total"
+)
 
 
 class SpotifyService:
@@ -9,79 +25,154 @@ class SpotifyService:
     Kapselt die gesamte Kommunikation mit der Spotify API.
     """
 
-    def __init__(self, client_id: str, client_secret: str):
-        """
-        Initialisiert den Service und authentifiziert sich bei der Spotify API.
+    def __init__(self, gateway: SpotifyGateway, page_concurrency: int = 4):
         """
-        if not client_id or not client_secret:
-            raise ValueError("Spotify Client ID und Secret müssen konfiguriert sein.")
+        Initialisiert den Service mit dem Spotify-Backend.
 
-        # Nutzt den "Client Credentials Flow" für Server-zu-Server-Anfragen
-        auth_manager = SpotifyClientCredentials(
-            client_id=client_id, client_secret=client_secret
+        `page_concurrency` begrenzt, wie viele Playlist-Seiten gleichzeitig
+        angefragt werden. Die Seiten laden in einem dauerhaften Worker-Pool,
+        damit jeder Worker seinen Client über mehrere Importe behält.
+        """
+        self.gateway = gateway
+        self.page_concurrency = max(1, page_concurrency)
+        self._clients = threading.local()
+        self._page_executor = ThreadPoolExecutor(
+            max_workers=self.page_concurrency, thread_name_prefix="playlist-page"
         )
-        self.sp = spotipy.Spotify(auth_manager=auth_manager)
-        print("Spotify Service initialisiert.")
+        logger.info("Spotify Service initialisiert.")
 
-    def get_song_details(self, spotify_id: str) -> dict | None:
+    @property
+    def sp(self):
         """
-        Holt die Details für einen einzelnen Song anhand seiner Spotify ID.
+        Der Client des aktuellen Threads. Ein Spotipy-Client (und seine
+        requests.Session) ist nicht threadsicher, daher bekommt jeder Thread
+        einen eigenen, der beim ersten Zugriff angelegt wird.
+        """
+        client = getattr(self._clients, "client", None)
+        if client is None:
+            client = self._clients.client = self.gateway.app_client()
+        return client
 
-        Gibt ein sauberes Dictionary mit den wichtigsten Daten zurück oder None bei einem Fehler.
+    def get_several_song_details(self, spotify_ids: list[str]) -> dict[str, dict]:
         """
-        try:
-            track_result = self.sp.track(spotify_id)
+        Holt die Details für mehrere Songs über den Multi-Track-Endpunkt.
 
-            if not track_result:
-                return None
+        Spotify erlaubt maximal 50 IDs pro Anfrage, daher werden die IDs in
+        entsprechende Blöcke aufgeteilt. Statt N Einzelanfragen sind so nur
+        noch N/50 Anfragen nötig.
 
-            # Extrahiere nur die Daten, die wir wirklich brauchen.
-            # Das entkoppelt den Rest der App von der komplexen Spotify-Struktur.
-            details = {
-                "title": track_result["name"],
-                "artists": [artist["name"] for artist in track_result["artists"]],
-                "popularity": track_result["popularity"],
-                "year": int(track_result["album"]["release_date"][:4]),
-            }
-            return details
+        Gibt ein Dictionary {track_id: details} zurück. Tracks, die nicht
+        geladen werden konnten, fehlen im Ergebnis.
+        """
+        all_details = {}
+        for start in range(0, len(spotify_ids), TRACKS_PER_REQUEST):
+            chunk = spotify_ids[start : start + TRACKS_PER_REQUEST]
+            try:
+                results = self.sp.tracks(chunk)
+            except spotipy.exceptions.SpotifyException as e:
+                logger.warning(
+                    "Fehler bei der Spotify-Anfrage für %s Tracks: %s", len(chunk), e
+                )
+                continue
+
+            for track_result in (results or {}).get("tracks", []):
+                # Unbekannte IDs liefert Spotify als None zurück
+                if track_result and track_result.get("id"):
+                    all_details[track_result["id"]] = self._extract_song_details(
+                        track_result
+                    )
+
+        return all_details
+
+    def _extract_song_details(self, track_result: dict) -> dict:
+        """
+        Extrahiert nur die Daten, die wir wirklich brauchen.
+        Das entkoppelt den Rest der App von der komplexen Spotify-Struktur.
+        """
+        release_date = (track_result.get("album") or {}).get("release_date") or ""
+        return {
+            "track_id": track_result["id"],
+            "title": track_result["name"],
+            "artists": [artist["name"] for artist in track_result["artists"]],
+            "popularity": track_result.get("popularity", 0),
+            "year": int(release_date[:4]) if release_date[:4].isdigit() else -1,
+        }
+
+    def iter_playlist_track_pages(self, playlist_id: str):
+        """
+        Liefert die vollständigen Track-Daten einer Playlist Seite für Seite.
 
-        except spotipy.exceptions.SpotifyException as e:
-            print(f"Fehler bei der Spotify-Anfrage für ID {spotify_id}: {e}")
-            return None
+        Name, Künstler, Popularität und Erscheinungsdatum werden direkt in der
+        Playlist-Anfrage mitgeladen, sodass keine zweite Anfrage pro Track nötig ist.
 
-    def get_playlist_tracks(self, playlist_id: str) -> list[str]:
-        """
-        Holt die IDs aller Songs in einer Playlist anhand ihrer Spotify ID.
-        Behandelt automatisch die Paginierung für Playlists mit mehr als 100 Songs.
+        Die erste Seite liefert die Gesamtanzahl der Einträge. Damit sind alle
+        weiteren Offsets bekannt und werden parallel (begrenzt durch
+        `page_concurrency`) angefragt, aber in der richtigen Reihenfolge geliefert.
+        Während der Aufrufer eine Seite speichert, laden die nächsten bereits.
 
-        Gibt eine Liste von Track-IDs (str) zurück oder eine leere Liste bei einem Fehler.
+        Yields:
+            Pro Seite eine Liste von Dictionaries im Format von
+            get_several_song_details.
+
+        Raises:
+            SpotifyException: Wenn eine Seite nicht geladen werden konnte. Der
+                Aufrufer darf die bis dahin gelieferten Seiten dann nicht als
+                vollständige Playlist speichern.
         """
-        all_track_ids = []
         try:
-            # Fordere nur die benötigten Felder an, um die Anfrage zu beschleunigen.
-            results = self.sp.playlist_tracks(playlist_id, fields="items.track.id,next")
+            results = self._fetch_playlist_page(playlist_id, offset=0)
             if not results:
-                return []
-
-            # Erste Seite der Ergebnisse verarbeiten
-            for item in results.get("items", []):
-                # Stelle sicher, dass der Track existiert und eine ID hat
-                if item.get("track") and item["track"].get("id"):
-                    # KORREKTUR: Gib die ID zurück, nicht den Namen
-                    all_track_ids.append(item["track"]["id"])
-
-            # Weitere Seiten abrufen, solange es sie gibt
-            while results.get("next"):
-                results = self.sp.next(results)
-                for item in results.get("items", []):
-                    if item.get("track") and item["track"].get("id"):
-                        all_track_ids.append(item["track"]["id"])
-
-            return all_track_ids
+                return
+            yield self._extract_page_details(results)
+
+            total = results.get("total") or 0
+            remaining_offsets = range(PLAYLIST_PAGE_SIZE, total, PLAYLIST_PAGE_SIZE)
+
+            # Ohne Gesamtanzahl (oder ohne Parallelität) klassisch über "next" blättern
+            if not total or self.page_concurrency == 1:
+                while results.get("next"):
+                    results = self.sp.next(results)
+                    yield self._extract_page_details(results)
+                return
+
+            futures = [
+                self._page_executor.submit(
+                    self._fetch_playlist_page, playlist_id, offset
+                )
+                for offset in remaining_offsets
+            ]
+            try:
+                for future in futures:
+                    yield self._extract_page_details(future.result() or {})
+            finally:
+                # Bricht der Aufrufer ab, werden noch nicht gestartete Anfragen verworfen
+                for future in futures:
+                    future.cancel()
 
         except spotipy.exceptions.SpotifyException as e:
-            print(f"Fehler bei der Spotify-Anfrage für Playlist {playlist_id}: {e}")
-            return []
+            logger.warning(
+                "Fehler bei der Spotify-Anfrage für Playlist %s: %s", playlist_id, e
+            )
+            raise
+
+    def _fetch_playlist_page(self, playlist_id: str, offset: int) -> dict | None:
+        """Holt eine einzelne Seite der Playlist ab dem angegebenen Offset."""
+        return self.sp.playlist_items(
+            playlist_id,
+            fields=PLAYLIST_TRACK_FIELDS,
+            limit=PLAYLIST_PAGE_SIZE,
+            offset=offset,
+            additional_types=("track",),
+        )
+
+    def _extract_page_details(self, results: dict) -> list[dict]:
+        """Wandelt eine Seite der Playlist-Antwort in eine Liste von Song-Details um."""
+        page_details = []
+        for item in results.get("items", []):
+            # Lokale Dateien und entfernte Songs haben keine ID
+            if item.get("track") and item["track"].get("id"):
+                page_details.append(self._extract_song_details(item["track"]))
+        return page_details
 
     def get_playlist_details(self, playlist_id: str) -> dict:
         """
@@ -104,7 +195,9 @@ class SpotifyService:
 
             return {}
         except spotipy.exceptions.SpotifyException as e:
-            print(
-                f"Fehler bei der Spotify-Anfrage für Playlist-Details {playlist_id}: {e}"
+            logger.warning(
+                "Fehler bei der Spotify-Anfrage für Playlist-Details %s: %s",
+                playlist_id,
+                e,
             )
             return {}
@@ -0,0 +1,146 @@
+"""Module for refreshing Spotify access tokens in the background."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import threading
+from spotipy.oauth2 import SpotifyOAuth
+from spotify_server.app.models import User
+from spotify_server.app.services.spotify_client_cache import SpotifyClientCache
+from spotify_server.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefresher:
+    """
+    Erneuert die Access Tokens aktiver User, bevor sie ablaufen.
+
+    Ein Hintergrund-Thread sucht regelmäßig alle User, deren Token innerhalb von
+    `refresh_window` Sekunden abläuft, erneuert diese parallel (begrenzt durch
+    `max_workers`) und schreibt alle neuen Tokens mit einem einzigen Update.
+    Dadurch findet der Request-Pfad praktisch immer einen gültigen Token vor.
+
+    Berücksichtigt werden nur User, die kürzlich aktiv waren (laut Client-Cache),
+    damit nicht dauerhaft Tokens für inaktive Accounts erneuert werden. Der Cache
+    ist prozesslokal: unter gunicorn erneuert jeder Worker nur die Tokens der
+    User, die er selbst bedient hat.
+    """
+
+    def __init__(
+        self,
+        app,
+        auth_manager: SpotifyOAuth,
+        client_cache: SpotifyClientCache,
+        refresh_window: int = 300,
+        interval: int = 60,
+        max_workers: int = 4,
+    ):
+        self.app = app
+        self.auth_manager = auth_manager
+        self.client_cache = client_cache
+        self.refresh_window = refresh_window
+        self.interval = interval
+        self.max_workers = max(1, max_workers)
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Startet den Hintergrund-Thread mit dem ersten Request, den die App bedient.
+        CLI-Befehle wie `flask db-upgrade` starten ihn so nie, und unter gunicorn
+        läuft er erst nach dem Fork im jeweiligen Worker.
+        """
+        app.before_request(self._start_with_first_request)
+        app.extensions["token_refresher"] = self
+
+    def start(self):
+        """Startet den Hintergrund-Thread (nur einmal pro Instanz)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="token-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Beendet den Hintergrund-Thread nach dem aktuellen Durchlauf."""
+        self._stop_event.set()
+
+    def _start_with_first_request(self):
+        if self._thread is None:
+            self.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.refresh_expiring_tokens()
+                # pylint: disable=W0718
+                except Exception as e:
+                    db.session.rollback()
+                    logger.exception(
+                        "Fehler beim Erneuern der Tokens im Hintergrund: %s", e
+                    )
+                finally:
+                    db.session.remove()
+
+    def refresh_expiring_tokens(self) -> int:
+        """
+        Erneuert alle bald ablaufenden Tokens der aktiven User.
+
+        Returns:
+            Die Anzahl der erfolgreich erneuerten Tokens.
+        """
+        active_user_ids = self.client_cache.active_user_ids()
+        if not active_user_ids:
+            return 0
+
+        deadline = datetime.utcnow() + timedelta(seconds=self.refresh_window)
+        candidates = (
+            db.session.query(User.user_id, User.spotify_refresh_token)
+            .filter(
+                User.user_id.in_(active_user_ids),
+                User.spotify_refresh_token.isnot(None),
+                User.spotify_token_expires_at <= deadline,
+            )
+            .all()
+        )
+        if not candidates:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._refresh_token, candidates))
+
+        token_updates = [update for update in results if update]
+        if token_updates:
+            # Alle neuen Tokens in einem gebündelten Update speichern
+            db.session.bulk_update_mappings(User, token_updates)
+            db.session.commit()
+
+        logger.info(
+            "%s von %s Tokens vorab erneuert.", len(token_updates), len(candidates)
+        )
+        return len(token_updates)
+
+    def _refresh_token(self, candidate) -> dict | None:
+        """Erneuert den Token eines Users und liefert die zu speichernden Werte."""
+        user_id, refresh_token = candidate
+        try:
+            new_token_info = self.auth_manager.refresh_access_token(refresh_token)
+        # pylint: disable=W0718
+        except Exception as e:
+            logger.error("Fehler beim Erneuern des Tokens für User %s: %s", user_id, e)
+            return None
+
+        return {
+            "user_id": user_id,
+            "spotify_access_token": new_token_info["access_token"],
+            # Spotify sendet nicht immer einen neuen Refresh Token
+            "spotify_refresh_token": new_token_info.get("refresh_token", refresh_token),
+            "spotify_token_expires_at": datetime.utcnow()
+            + timedelta(seconds=new_token_info["expires_in"]),
+        }
@@ -0,0 +1,85 @@
+"""Module for caching immutable track metadata in memory."""
+
+from collections import OrderedDict
+import sys
+import threading
+from spotify_server.app.dto import SongDTO
+
+
+class TrackCache:
+    """
+    Read-Through-LRU-Cache für Track-Metadaten (SongDTOs), begrenzt nach Speicher.
+
+    Track-Daten ändern sich nach dem Import praktisch nicht mehr. Die Größe
+    jedes Eintrags wird grob abgeschätzt; überschreitet die Summe `max_bytes`,
+    werden die am längsten nicht benutzten Einträge verworfen.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+
+        self._entries = OrderedDict()  # track_id -> (SongDTO, geschätzte Größe)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, track_id: str) -> SongDTO | None:
+        """Gibt das gecachte DTO zurück oder None."""
+        with self._lock:
+            entry = self._entries.get(track_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(track_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, song: SongDTO):
+        """Legt ein DTO im Cache ab und verdrängt bei Bedarf alte Einträge."""
+        size = self._estimate_size(song)
+        with self._lock:
+            previous = self._entries.pop(song.track_id, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self._entries[song.track_id] = (song, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def contains(self, track_id: str) -> bool:
+        """Prüft, ob ein Track gecacht ist, ohne die Zähler zu verändern."""
+        with self._lock:
+            return track_id in self._entries
+
+    def invalidate(self, track_id: str):
+        """Entfernt einen Track, z.B. nachdem seine Daten geändert wurden."""
+        with self._lock:
+            entry = self._entries.pop(track_id, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+
+    def stats(self) -> dict:
+        """Liefert die Zähler des Caches, z.B. für Monitoring."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _estimate_size(self, song: SongDTO) -> int:
+        """Schätzt den Speicherbedarf eines DTOs samt Strings und Künstlerliste."""
+        size = sys.getsizeof(song) + sys.getsizeof(song.track_id)
+        size += sys.getsizeof(song.title) + sys.getsizeof(song.artists)
+        size += sum(sys.getsizeof(artist) for artist in song.artists)
+        size += sys.getsizeof(song.match_title) + sys.getsizeof(song.match_artists)
+        size += sum(sys.getsizeof(key) for key in song.match_artists)
+        if hasattr(song, "__dict__"):
+            size += sys.getsizeof(song.__dict__)
+        return size
@@ -1,13 +1,25 @@
 """Module für die Verwaltung von TrainingData-Lernkarten in der Datenbank."""
 
+import logging
 import random
-from sqlalchemy import func
-from spotify_server.extensions import db
+from sqlalchemy import and_, case, func
+from spotify_server.extensions import db, insert_ignore
+from spotify_server.app.metrics import instrument_repository
 from spotify_server.app.models import (
     TrainingData,
+    TrainingProgress,
 )  # Importiere das eben erstellte Model
 
+logger = logging.getLogger(__name__)
 
+# Unterstützte Gewichtungen für pick_due_card (None = gleichverteilt)
+SELECTION_WEIGHTINGS = (None, "overdue", "weak")
+
+# Karten mit weniger richtigen Antworten in Folge gelten als "noch in Lernphase"
+LEARNING_THRESHOLD = 3
+
+
+@instrument_repository
 class TrainingRepository:
     """
     Verwaltet alle Datenbankoperationen für die TrainingData-Lernkarten.
@@ -33,27 +45,85 @@ class TrainingRepository:
         # Prüfen, ob eine Karte bereits existiert
         existing_card = self.get_card(user_id, playlist_id, track_id)
         if existing_card:
-            print(f"Karte für Track {track_id} existiert bereits für User {user_id}.")
+            logger.debug(
+                "Karte für Track %s existiert bereits für User %s.", track_id, user_id
+            )
             return existing_card
 
         # Wenn keine Karte existiert, eine neue erstellen
-        print(f"Erstelle neue Karte für Track {track_id} für User {user_id}.")
+        logger.debug("Erstelle neue Karte für Track %s für User %s.", track_id, user_id)
+        progress = self.get_progress(user_id, playlist_id)
         new_card = TrainingData(
             user_id=user_id,
             playlist_id=playlist_id,
             track_id=track_id,
             correct_guesses=0,
             correct_in_row=0,
-            repeat_in_n=random.randint(1, 6),  # Startwert für die Wiederholung
+            # Startwert für die Wiederholung, relativ zum aktuellen Schritt
+            due_step=progress.step + random.randint(1, 6),
             revisions=0,
             is_done=False,
         )
 
         db.session.add(new_card)
+        # Neue Karten starten mit correct_in_row = 0
+        self._increment_counters(progress, card_count=1, learning_count=1)
         db.session.commit()
 
         return new_card
 
+    def create_cards(
+        self,
+        user_id: str,
+        playlist_id: str,
+        track_ids: list[str],
+        commit: bool = True,
+    ) -> int:
+        """
+        Erstellt Lernkarten für mehrere Tracks mit einem einzigen INSERT.
+
+        Bereits existierende Karten werden von der Datenbank übersprungen
+        (INSERT IGNORE bzw. INSERT OR IGNORE), sodass keine vorherige Prüfung
+        pro Karte nötig ist. Alles wird mit einem Commit gespeichert.
+
+        Args:
+            user_id: Die ID des Benutzers.
+            playlist_id: Die ID der Playlist.
+            track_ids: Die IDs der Tracks, für die Karten angelegt werden sollen.
+            commit: False, wenn der Aufrufer selbst committet.
+
+        Returns:
+            Die Anzahl der tatsächlich neu angelegten Karten.
+        """
+        if not track_ids:
+            return 0
+
+        progress = self.get_progress(user_id, playlist_id)
+        new_cards = [
+            {
+                "user_id": user_id,
+                "playlist_id": playlist_id,
+                "track_id": track_id,
+                "correct_guesses": 0,
+                "correct_in_row": 0,
+                # Startwert für die Wiederholung, relativ zum aktuellen Schritt
+                "due_step": progress.step + random.randint(1, 6),
+                "revisions": 0,
+                "is_done": False,
+            }
+            for track_id in dict.fromkeys(track_ids)
+        ]
+        created = db.session.execute(
+            insert_ignore(TrainingData.__table__).values(new_cards)
+        ).rowcount
+
+        # Neue Karten starten mit correct_in_row = 0
+        self._increment_counters(progress, card_count=created, learning_count=created)
+        if commit:
+            db.session.commit()
+
+        return created
+
     def get_card(
         self, user_id: str, playlist_id: str, track_id: str
     ) -> TrainingData | None:
@@ -71,6 +141,150 @@ class TrainingRepository:
         # .get() ist optimiert für die Suche nach Primärschlüsseln, auch bei zusammengesetzten.
         return TrainingData.query.get((user_id, playlist_id, track_id))
 
+    def get_progress(self, user_id: str, playlist_id: str) -> TrainingProgress:
+        """
+        Holt den Schrittzähler einer User/Playlist-Kombination oder legt ihn an.
+
+        Beim Anlegen werden bestehende Karten, die noch kein due_step haben,
+        aus ihrem alten repeat_in_n-Wert übernommen und die Zähler einmalig aus
+        den Karten berechnet. Es wird nicht committet.
+
+        Args:
+            user_id: Die ID des Benutzers.
+            playlist_id: Die ID der Playlist.
+
+        Returns:
+            Die (ggf. neue) TrainingProgress-Instanz.
+        """
+        progress = TrainingProgress.query.get((user_id, playlist_id))
+        if progress:
+            if progress.card_count is None:
+                self._apply_stats(progress, self._count_stats(user_id, playlist_id))
+            return progress
+
+        progress = TrainingProgress(user_id=user_id, playlist_id=playlist_id, step=0)
+        self._apply_stats(progress, self._count_stats(user_id, playlist_id))
+        db.session.add(progress)
+
+        # Bei Schritt 0 entspricht der restliche Abstand direkt dem Fälligkeitsschritt.
+        TrainingData.query.filter(
+            TrainingData.user_id == user_id,
+            TrainingData.playlist_id == playlist_id,
+            TrainingData.due_step.is_(None),
+        ).update(
+            {
+                TrainingData.due_step: case(
+                    (TrainingData.repeat_in_n > 0, TrainingData.repeat_in_n), else_=0
+                )
+            },
+            synchronize_session=False,
+        )
+        db.session.flush()
+        return progress
+
+    def get_current_track_id(self, user_id: str, playlist_id: str) -> str | None:
+        """
+        Liefert den Track der aktuellen Runde, ohne den Trainingsstand anzulegen.
+
+        Returns:
+            Die track_id oder None, wenn noch keine Runde gestartet wurde.
+        """
+        return (
+            db.session.query(TrainingProgress.current_track_id)
+            .filter(
+                TrainingProgress.user_id == user_id,
+                TrainingProgress.playlist_id == playlist_id,
+            )
+            .scalar()
+        )
+
+    def record_revision(
+        self,
+        progress: TrainingProgress,
+        card: TrainingData,
+        previous_correct_in_row: int,
+        finished: bool = False,
+    ):
+        """
+        Aktualisiert die Zähler nach einer Antwort auf eine Karte. Es wird nicht committet.
+
+        Args:
+            progress: Der Trainingsstand der User/Playlist-Kombination.
+            card: Die bereits aktualisierte Karte.
+            previous_correct_in_row: correct_in_row der Karte vor der Antwort.
+            finished: True, wenn die Karte mit dieser Antwort als erledigt markiert wurde.
+        """
+        self._increment_counters(
+            progress,
+            revision_count=1,
+            learning_count=int(card.correct_in_row < LEARNING_THRESHOLD)
+            - int(previous_correct_in_row < LEARNING_THRESHOLD),
+            finished_count=int(finished),
+        )
+
+    def _increment_counters(self, progress: TrainingProgress, **deltas: int):
+        """
+        Erhöht die Zähler eines Trainingsstands in der Datenbank (SET x = x + n),
+        damit sich gleichzeitige Antworten nicht gegenseitig überschreiben. Die
+        geänderten Attribute werden verworfen und beim nächsten Zugriff neu geladen.
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        TrainingProgress.query.filter(
+            TrainingProgress.user_id == progress.user_id,
+            TrainingProgress.playlist_id == progress.playlist_id,
+        ).update(
+            {
+                getattr(TrainingProgress, name): getattr(TrainingProgress, name) + delta
+                for name, delta in deltas.items()
+            },
+            synchronize_session=False,
+        )
+        db.session.expire(progress, list(deltas))
+
+    def reconcile_progress(self) -> int:
+        """
+        Berechnet alle materialisierten Zähler neu aus den Lernkarten.
+
+        Fehlende TrainingProgress-Einträge werden dabei angelegt und übernehmen
+        bestehende Karten wie in get_progress.
+
+        Returns:
+            Die Anzahl der abgeglichenen User/Playlist-Kombinationen.
+        """
+        all_stats = self._query_training_stats(LEARNING_THRESHOLD)
+        for user_id, playlist_id in all_stats:
+            self.get_progress(user_id, playlist_id)
+
+        for progress in TrainingProgress.query.all():
+            stats = all_stats.get(
+                (progress.user_id, progress.playlist_id), self._empty_stats()
+            )
+            self._apply_stats(progress, stats)
+
+        db.session.commit()
+        return len(all_stats)
+
+    def get_next_due_step(self, user_id: str, playlist_id: str) -> int | None:
+        """
+        Ermittelt den kleinsten Fälligkeitsschritt aller Karten einer User/Playlist-Kombination.
+
+        Returns:
+            Den Schritt, ab dem die nächste Karte fällig ist, oder None, wenn es keine Karten gibt.
+        """
+        return (
+            db.session.query(TrainingData.due_step)
+            .filter(
+                TrainingData.user_id == user_id,
+                TrainingData.playlist_id == playlist_id,
+            )
+            .order_by(TrainingData.due_step)
+            .limit(1)
+            .scalar()
+        )
+
     def save_card(self):
         """
         Speichert die Änderungen an einer bestehenden Lernkarte.
@@ -91,11 +305,15 @@ class TrainingRepository:
         Returns:
             Eine Liste von TrainingData-Instanzen für aktive Songs.
         """
-        return TrainingData.query.filter(
-            TrainingData.user_id == user_id,
-            TrainingData.playlist_id == playlist_id,
-            TrainingData.repeat_in_n <= 0,
-        ).all()
+        return (
+            TrainingData.query.join(TrainingProgress, self._progress_join_condition())
+            .filter(
+                TrainingData.user_id == user_id,
+                TrainingData.playlist_id == playlist_id,
+                TrainingData.due_step <= TrainingProgress.step,
+            )
+            .all()
+        )
 
     def get_active_song_ids(self, user_id: str, playlist_id: str) -> list[str]:
         """
@@ -105,10 +323,11 @@ class TrainingRepository:
         # .with_entities() ist optimiert, um nur spezifische Spalten zu laden.
         query_result = (
             db.session.query(TrainingData.track_id)
+            .join(TrainingProgress, self._progress_join_condition())
             .filter(
                 TrainingData.user_id == user_id,
                 TrainingData.playlist_id == playlist_id,
-                TrainingData.repeat_in_n <= 0,
+                TrainingData.due_step <= TrainingProgress.step,
             )
             .all()
         )
@@ -117,6 +336,115 @@ class TrainingRepository:
         # Wir wandeln sie in eine einfache Liste von Strings um.
         return [item[0] for item in query_result]
 
+    def pick_due_card(
+        self, user_id: str, playlist_id: str, weighting: str | None = None
+    ) -> TrainingData | None:
+        """
+        Wählt zufällig eine fällige Lernkarte aus und lädt nur diese eine Karte.
+
+        Für die Auswahl wird lediglich eine kompakte Projektion (Track-ID,
+        Fälligkeitsschritt, correct_in_row) der fälligen Karten geladen, statt
+        alle Karten als ORM-Objekte zu erzeugen.
+
+        Args:
+            user_id: Die ID des Benutzers.
+            playlist_id: Die ID der Playlist.
+            weighting: Optionale Gewichtung der Auswahl:
+                None      - alle fälligen Karten gleich wahrscheinlich,
+                "overdue" - je länger überfällig, desto wahrscheinlicher,
+                "weak"    - je weniger richtige Antworten in Folge, desto wahrscheinlicher.
+
+        Returns:
+            Die gewählte TrainingData-Instanz oder None, wenn keine Karte fällig ist.
+
+        Raises:
+            ValueError: Wenn eine unbekannte Gewichtung übergeben wird.
+        """
+        track_ids = self.pick_due_track_ids(user_id, playlist_id, weighting=weighting)
+        if not track_ids:
+            return None
+        return self.get_card(user_id, playlist_id, track_ids[0])
+
+    def pick_due_track_ids(
+        self,
+        user_id: str,
+        playlist_id: str,
+        count: int = 1,
+        weighting: str | None = None,
+        step: int | None = None,
+    ) -> list[str]:
+        """
+        Wählt bis zu `count` verschiedene fällige Karten aus, ohne sie zu laden.
+
+        Args:
+            user_id: Die ID des Benutzers.
+            playlist_id: Die ID der Playlist.
+            count: Die maximale Anzahl an Karten.
+            weighting: Gewichtung der Auswahl (siehe pick_due_card).
+            step: Schritt, für den die Fälligkeit geprüft wird; ohne Angabe der
+                gespeicherte Schritt aus TrainingProgress.
+
+        Returns:
+            Die Track-IDs der gewählten Karten in Auswahlreihenfolge.
+
+        Raises:
+            ValueError: Wenn eine unbekannte Gewichtung übergeben wird.
+        """
+        if weighting not in SELECTION_WEIGHTINGS:
+            raise ValueError(
+                f"Unbekannte Gewichtung für die Kartenauswahl: {weighting}"
+            )
+
+        if step is None:
+            candidates = (
+                db.session.query(
+                    TrainingData.track_id,
+                    TrainingData.due_step,
+                    TrainingData.correct_in_row,
+                    TrainingProgress.step,
+                )
+                .join(TrainingProgress, self._progress_join_condition())
+                .filter(
+                    TrainingData.user_id == user_id,
+                    TrainingData.playlist_id == playlist_id,
+                    TrainingData.due_step <= TrainingProgress.step,
+                )
+                .all()
+            )
+        else:
+            candidates = (
+                db.session.query(
+                    TrainingData.track_id,
+                    TrainingData.due_step,
+                    TrainingData.correct_in_row,
+                )
+                .filter(
+                    TrainingData.user_id == user_id,
+                    TrainingData.playlist_id == playlist_id,
+                    TrainingData.due_step <= step,
+                )
+                .all()
+            )
+            candidates = [(*candidate, step) for candidate in candidates]
+
+        if weighting == "overdue":
+            weights = [1 + step - due_step for _, due_step, _, step in candidates]
+        elif weighting == "weak":
+            weights = [
+                1 / (1 + max(0, correct_in_row or 0))
+                for _, _, correct_in_row, _ in candidates
+            ]
+        else:
+            weights = [1] * len(candidates)
+
+        # Ziehen ohne Zurücklegen; count ist klein, daher genügt eine Schleife
+        track_ids = []
+        while candidates and len(track_ids) < count:
+            position = random.choices(range(len(candidates)), weights=weights)[0]
+            track_ids.append(candidates.pop(position)[0])
+            weights.pop(position)
+        return track_ids
+
     def get_all_cards(self, user_id: str, playlist_id: str) -> list[TrainingData]:
         """
         Holt alle Lernkarten für eine bestimmte User/Playlist-Kombination.
@@ -184,6 +512,130 @@ class TrainingRepository:
         # .scalar() gibt None zurück, wenn keine Zeilen gefunden werden. Wir geben stattdessen 0 zurück.
         return total or 0
 
+    def get_training_stats(
+        self, user_id: str, playlist_id: str, threshold: int = LEARNING_THRESHOLD
+    ) -> dict:
+        """
+        Liefert alle Kennzahlen einer User/Playlist-Kombination.
+
+        Die Zähler werden aus dem materialisierten TrainingProgress-Eintrag gelesen,
+        nur die fälligen Karten werden über den Index gezählt – beides in einer
+        Abfrage. Ohne Eintrag (oder bei abweichendem `threshold`) wird auf eine
+        gruppierte Aggregat-Abfrage über training_data zurückgegriffen.
+
+        Returns:
+            Ein Dictionary mit finished_tracks, active_tracks, due_tracks,
+            learning_tracks (correct_in_row unter `threshold`) und total_revisions.
+        """
+        if threshold == LEARNING_THRESHOLD:
+            due_count = (
+                db.session.query(func.count())
+                .filter(
+                    TrainingData.user_id == TrainingProgress.user_id,
+                    TrainingData.playlist_id == TrainingProgress.playlist_id,
+                    TrainingData.due_step <= TrainingProgress.step,
+                )
+                .scalar_subquery()
+            )
+            row = (
+                db.session.query(TrainingProgress, due_count)
+                .filter(
+                    TrainingProgress.user_id == user_id,
+                    TrainingProgress.playlist_id == playlist_id,
+                )
+                .first()
+            )
+            if row and row[0].card_count is not None:
+                return self._progress_stats(row[0], row[1])
+
+        return self._count_stats(user_id, playlist_id, threshold)
+
+    def get_training_stats_by_playlist(
+        self, user_id: str, threshold: int = LEARNING_THRESHOLD
+    ) -> dict[str, dict]:
+        """
+        Ermittelt die Kennzahlen aller Playlists eines Users mit einer einzigen Abfrage.
+
+        Returns:
+            Ein Dictionary {playlist_id: Kennzahlen} im Format von get_training_stats.
+        """
+        return {
+            playlist_id: stats
+            for (_, playlist_id), stats in self._query_training_stats(
+                threshold, user_id
+            ).items()
+        }
+
+    def _count_stats(
+        self, user_id: str, playlist_id: str, threshold: int = LEARNING_THRESHOLD
+    ) -> dict:
+        """Berechnet die Kennzahlen einer User/Playlist-Kombination direkt aus den Karten."""
+        stats = self._query_training_stats(threshold, user_id, playlist_id)
+        return stats.get((user_id, playlist_id), self._empty_stats())
+
+    def _query_training_stats(
+        self,
+        threshold: int,
+        user_id: str | None = None,
+        playlist_id: str | None = None,
+    ) -> dict[tuple[str, str], dict]:
+        """Gruppierte Aggregat-Abfrage über training_data, optional gefiltert."""
+        query = db.session.query(
+            TrainingData.user_id,
+            TrainingData.playlist_id,
+            func.count(),
+            func.sum(case((TrainingData.is_done == True, 1), else_=0)),
+            func.sum(
+                case((TrainingData.due_step <= TrainingProgress.step, 1), else_=0)
+            ),
+            func.sum(case((TrainingData.correct_in_row < threshold, 1), else_=0)),
+            func.sum(TrainingData.revisions),
+        ).outerjoin(TrainingProgress, self._progress_join_condition())
+        if user_id is not None:
+            query = query.filter(TrainingData.user_id == user_id)
+        if playlist_id is not None:
+            query = query.filter(TrainingData.playlist_id == playlist_id)
+
+        return {
+            (row_user_id, row_playlist_id): {
+                "finished_tracks": int(finished or 0),
+                "active_tracks": int(active or 0),
+                "due_tracks": int(due or 0),
+                "learning_tracks": int(learning or 0),
+                "total_revisions": int(revisions or 0),
+            }
+            for row_user_id, row_playlist_id, active, finished, due, learning, revisions in (
+                query.group_by(TrainingData.user_id, TrainingData.playlist_id).all()
+            )
+        }
+
+    def _progress_stats(self, progress: TrainingProgress, due_count: int) -> dict:
+        """Wandelt die materialisierten Zähler in das Format von get_training_stats um."""
+        return {
+            "finished_tracks": progress.finished_count,
+            "active_tracks": progress.card_count,
+            "due_tracks": int(due_count or 0),
+            "learning_tracks": progress.learning_count,
+            "total_revisions": progress.revision_count,
+        }
+
+    def _apply_stats(self, progress: TrainingProgress, stats: dict):
+        """Überschreibt die materialisierten Zähler mit frisch berechneten Werten."""
+        progress.card_count = stats["active_tracks"]
+        progress.finished_count = stats["finished_tracks"]
+        progress.learning_count = stats["learning_tracks"]
+        progress.revision_count = stats["total_revisions"]
+
+    def _empty_stats(self) -> dict:
+        """Kennzahlen für eine Playlist ohne Lernkarten."""
+        return {
+            "finished_tracks": 0,
+            "active_tracks": 0,
+            "due_tracks": 0,
+            "learning_tracks": 0,
+            "total_revisions": 0,
+        }
+
     def get_active_track_count(self, user_id: str, playlist_id: str) -> int:
         """
         Zählt alle Tracks, für die ein Training in einer Playlist für einen User begonnen wurde.
@@ -201,3 +653,10 @@ class TrainingRepository:
             TrainingData.playlist_id == playlist_id,
             TrainingData.is_done == True,  # oder einfach nur TrainingData.is_done
         ).count()
+
+    def _progress_join_condition(self):
+        """Verknüpft eine Karte mit dem Schrittzähler ihrer User/Playlist-Kombination."""
+        return and_(
+            TrainingProgress.user_id == TrainingData.user_id,
+            TrainingProgress.playlist_id == TrainingData.playlist_id,
+        )
@@ -1,14 +1,22 @@
 """Module für die Trainings-Logik des Spotify-Servers."""
 
+import logging
 import random
-import re
-from rapidfuzz import fuzz
-from spotify_server.app.models import Track, User
+from rapidfuzz import fuzz, process
+from spotify_server.app.matching import clean_title, normalize
+from spotify_server.app.metrics import SCORE_CPU_SECONDS, observe_cpu_time
+from spotify_server.app.models import Track, TrainingData, TrainingProgress, User
+from spotify_server.app.services.card_prefetcher import CardPrefetcher
 from spotify_server.app.services.song_repository import SongRepository
-from spotify_server.app.services.training_repository import TrainingRepository
+from spotify_server.app.services.training_repository import (
+    LEARNING_THRESHOLD,
+    TrainingRepository,
+)
 from spotify_server.app.services.playback_service import PlaybackService
 from spotify_server.app.services.user_repository import UserRepository
 
+logger = logging.getLogger(__name__)
+
 
 class TrainingService:
     """
@@ -21,11 +29,20 @@ class TrainingService:
         training_repository: TrainingRepository,
         playback_service: PlaybackService,
         user_repository: UserRepository,
+        selection_weighting: str | None = None,
+        verify_playback: bool = False,
+        card_prefetcher: CardPrefetcher | None = None,
     ):
         self.song_repository = song_repository
         self.training_repository = training_repository
         self.playback_service = playback_service
         self.user_repository = user_repository
+        # Gewichtung bei der Auswahl der nächsten fälligen Karte (siehe pick_due_card)
+        self.selection_weighting = selection_weighting
+        # Beim Bewerten zusätzlich bei Spotify nachfragen, was gerade läuft
+        self.verify_playback = verify_playback
+        # Optionaler Puffer mit vorberechneten nächsten Karten pro Session
+        self.card_prefetcher = card_prefetcher
 
     def init_training(self, user_id: str, playlist_id: str):
         """
@@ -34,51 +51,32 @@ class TrainingService:
         Es werden die 20 populärsten Songs aus der Playlist ausgewählt, für die
         noch keine Lernkarte existiert, und neue Lernkarten dafür angelegt.
         """
-        print(
-            f"Initialisiere Training für User {user_id} mit Playlist {playlist_id}..."
-        )
-
-        # Annahme: song_repository kann alle Tracks einer Playlist holen.
-        # Dies könnte auch in einem separaten PlaylistRepository liegen.
-        all_tracks_in_playlist = self.song_repository.get_playlist_tracks(
-            playlist_id=playlist_id
+        logger.info(
+            "Initialisiere Training für User %s mit Playlist %s...",
+            user_id,
+            playlist_id,
         )
 
-        if not all_tracks_in_playlist:
-            print(
+        # Importiert die Playlist bei Bedarf, ohne alle Tracks zu laden.
+        if not self.song_repository.ensure_playlist_imported(playlist_id):
+            logger.warning(
                 "Keine Tracks in der Playlist gefunden oder Playlist existiert nicht."
             )
             return
 
-        # Finde heraus, für welche Tracks bereits Karten existieren
-        trained_track_ids = {
-            card.track_id
-            for card in self.training_repository.get_all_cards(user_id, playlist_id)
-        }
-
-        # Filtere die Tracks, für die noch keine Karte existiert
-        untrained_tracks = [
-            track
-            for track in all_tracks_in_playlist
-            if track.track_id not in trained_track_ids
-        ]
-
-        if not untrained_tracks:
+        # Die 20 populärsten Tracks ohne Karte, per Anti-Join direkt in der DB ermittelt
+        track_ids_to_add = self.song_repository.find_untrained_track_ids(
+            user_id, playlist_id, limit=20
+        )
+        if not track_ids_to_add:
             return
 
-        # Sortiere die neuen Tracks nach Popularität (absteigend)
-        untrained_tracks.sort(key=lambda track: track.popularity, reverse=True)
-
-        # Wähle die Top 20 (oder weniger, falls nicht so viele übrig sind)
-        tracks_to_add = untrained_tracks[:20]
-
-        # Erstelle für jeden dieser Tracks eine neue Lernkarte
-        for track in tracks_to_add:
-            self.training_repository.create_new_card(
-                user_id=user_id, playlist_id=playlist_id, track_id=track.track_id
-            )
+        # Lege alle Lernkarten mit einem einzigen INSERT an
+        created = self.training_repository.create_cards(
+            user_id, playlist_id, track_ids_to_add
+        )
 
-        print(f"{len(tracks_to_add)} neue Lernkarten wurden erstellt.")
+        logger.info("%s neue Lernkarten wurden erstellt.", created)
 
     def add_new_song(self, user_id: str, playlist_id: str) -> str | None:
         """
@@ -96,38 +94,60 @@ class TrainingService:
         if most_popular_track:
             return most_popular_track.track_id
         else:
-            print(
-                f"User {user_id} lernt bereits alle Songs aus Playlist {playlist_id}."
+            logger.info(
+                "User %s lernt bereits alle Songs aus Playlist %s.",
+                user_id,
+                playlist_id,
             )
             return None
 
+    @observe_cpu_time(SCORE_CPU_SECONDS)
     def calculate_score(self, user_guess: dict, user_id: str) -> int:
         """
         Berechnet den Score basierend auf der Antwort des Nutzers.
         (Diese Funktion wird von dir implementiert)
         """
-        # Hier kommt deine Logik zum Berechnen der Punkte
-        track_id = self.playback_service.get_current_id(user_id)
+        # Der Track der Runde wurde beim Starten der Wiedergabe gespeichert
+        # (siehe choose_next_song), dafür ist keine Anfrage an Spotify nötig.
+        track_id = None
+        if user_guess.get("playlist_id"):
+            track_id = self.training_repository.get_current_track_id(
+                user_id, user_guess["playlist_id"]
+            )
+
+        # Spotify nur optional zur Kontrolle oder ohne gespeicherte Runde fragen
+        if track_id is None or self.verify_playback:
+            playing_track_id = self.playback_service.get_current_id(user_id)
+            if playing_track_id:
+                if track_id and playing_track_id != track_id:
+                    logger.warning(
+                        "Bei Spotify läuft %s statt %s, bewerte den laufenden Track.",
+                        playing_track_id,
+                        track_id,
+                    )
+                track_id = playing_track_id
+
         if not track_id:
             raise LookupError("Kein aktueller Track gefunden.")
 
-        song = self.song_repository.get_song(track_id)
+        song = self.song_repository.get_song_dto(track_id)
         if not song:
             raise LookupError(f"Song mit ID {track_id} nicht gefunden.")
-        song = self.song_repository.get_dto_by_track(song)
 
+        # Die Schlüssel des Songs sind vorberechnet; nur die Antwort wird normalisiert
         if user_guess["name"] is not None:
-            name_sim = fuzz.ratio(
-                self.clean_title(song.title).lower(), user_guess["name"].lower()
-            )
+            name_sim = fuzz.ratio(song.match_title, normalize(user_guess["name"]))
         else:
             name_sim = 0
-        artist_sim = 0
-        for artist in song.artists:
-            artist_sim = max(
-                artist_sim,
-                fuzz.ratio(artist.lower(), user_guess["artist"].lower()),
+        artist_match = None
+        if user_guess["artist"] is not None and song.match_artists:
+            artist_match = process.extractOne(
+                normalize(user_guess["artist"]),
+                song.match_artists,
+                scorer=fuzz.ratio,
+                processor=None,
             )
+        artist_sim = artist_match[1] if artist_match else 0
         year_diff = abs(int(song.year) - int(user_guess["year"]))
 
         score = (5 - min(5, year_diff)) / 2
@@ -148,38 +168,140 @@ class TrainingService:
             "correct_year": song.year,
             "correct_artist": ", ".join(song.artists),  # Fügt mehrere Künstler zusammen
             "correct_title": song.title,
+            "track_id": track_id,
         }
 
         # 5. Gib das fertige Dictionary zurück
         return score_result
 
-    def choose_next_song(self, user: User, playlist_id: str) -> Track | None:
+    def start_training(self, user: User, playlist_id: str) -> Track | None:
+        """
+        Startet das Training einer Playlist: wählt die erste Karte aus und lädt die
+        Metadaten aller Karten in den Track-Cache, damit das Bewerten der Antworten
+        ohne Datenbankzugriffe auskommt.
+        """
+        next_track = self.choose_next_song(user, playlist_id)
+        self.song_repository.preload_playlist(user.user_id, playlist_id)
+        return next_track
+
+    def answer_and_advance(
+        self, user: User, user_guess: dict
+    ) -> tuple[dict, Track | None]:
+        """
+        Bewertet eine Antwort, aktualisiert die Lernkarte und wählt die nächste
+        Karte aus, alles in einer Transaktion.
+
+        Bewertet wird der Track der aktuellen Runde; die Karte wird bereits vor
+        der Auswahl geflusht, sodass ihr neuer Fälligkeitsschritt berücksichtigt
+        wird.
+
+        Returns:
+            Das Ergebnis von calculate_score und die nächste Karte (oder None).
+        """
+        playlist_id = user_guess["playlist_id"]
+        score_result = self.calculate_score(user_guess, user.user_id)
+        # Die Vorberechnung nach der letzten Antwort kennt diese Antwort noch nicht
+        progress = self.training_repository.get_progress(user.user_id, playlist_id)
+        prefetch_version = CardPrefetcher.version(progress)
+        self.update_training(
+            playlist_id,
+            score_result["track_id"],
+            score_result["score"],
+            user.user_id,
+            commit=False,
+        )
+        next_track = self.choose_next_song(
+            user, playlist_id, commit=False, prefetch_version=prefetch_version
+        )
+        self.song_repository.save_changes()
+        self._schedule_prefetch(user.user_id, playlist_id)
+        return score_result, next_track
+
+    def choose_next_song(
+        self,
+        user: User,
+        playlist_id: str,
+        commit: bool = True,
+        prefetch_version: tuple | None = None,
+    ) -> Track | None:
         """
         Wählt nach einer bestimmten Logik die nächste zu wiederholende Lernkarte aus.
         (Diese Funktion wird von dir implementiert)
+
+        `prefetch_version` ist der Planungsstand, zu dem eine vorberechnete Auswahl
+        passen muss (Standard: der aktuelle, siehe CardPrefetcher.pop).
         """
-        # Hier kommt deine Logik zur Auswahl des nächsten Songs
-        # z.B. basierend auf 'repeat_in_n' oder anderen Kriterien
-        songs = self.training_repository.get_all_cards(user.user_id, playlist_id)
-        if not songs:
-            self.init_training(user.user_id, playlist_id)
-
-        active_songs = self.training_repository.get_active_songs(
-            user_id=user.user_id, playlist_id=playlist_id
-        )
+        # Jede User/Playlist-Kombination hat einen Schrittzähler; jede Karte
+        # speichert den Schritt, ab dem sie fällig ist.
+        progress = self.training_repository.get_progress(user.user_id, playlist_id)
 
-        while active_songs is None or len(active_songs) == 0:
-            for song in songs:
-                song.repeat_in_n -= 1
-            active_songs = self.training_repository.get_active_songs(
-                user_id=user.user_id, playlist_id=playlist_id
+        # Nach einer Antwort liegt die Auswahl meist schon im Hintergrund bereit
+        next_card = self._pop_prefetched_card(
+            user.user_id, playlist_id, progress, prefetch_version
+        )
+        if next_card is None:
+            next_due_step = self.training_repository.get_next_due_step(
+                user.user_id, playlist_id
+            )
+            if next_due_step is None:
+                self.init_training(user.user_id, playlist_id)
+                next_due_step = self.training_repository.get_next_due_step(
+                    user.user_id, playlist_id
+                )
+                if next_due_step is None:
+                    return None
+
+            # Ist gerade nichts fällig, springt der Zähler direkt zur nächsten
+            # fälligen Karte, statt alle Karten einzeln herunterzuzählen.
+            if next_due_step > progress.step:
+                progress.step = next_due_step
+
+            next_card = self.training_repository.pick_due_card(
+                user_id=user.user_id,
+                playlist_id=playlist_id,
+                weighting=self.selection_weighting,
             )
-        self.song_repository.save_changes()  # Speichert die Änderungen in der Datenbank
+        # Die Runde merken, damit beim Bewerten nicht bei Spotify nachgefragt werden muss
+        progress.current_track_id = next_card.track_id if next_card else None
+        if commit:
+            self.song_repository.save_changes()  # Speichert die Änderungen
+
+        return next_card
+
+    def _pop_prefetched_card(
+        self,
+        user_id: str,
+        playlist_id: str,
+        progress: TrainingProgress,
+        version: tuple | None = None,
+    ) -> TrainingData | None:
+        """
+        Übernimmt eine im Hintergrund vorberechnete Karte, falls sie noch fällig ist.
+        """
+        if self.card_prefetcher is None:
+            return None
+        prefetched = self.card_prefetcher.pop(user_id, playlist_id, progress, version)
+        if prefetched is None:
+            return None
+
+        track_id, step = prefetched
+        step = max(progress.step, step)
+        card = self.training_repository.get_card(
+            user_id=user_id, playlist_id=playlist_id, track_id=track_id
+        )
+        if card is None or card.due_step > step:
+            return None
 
-        return random.choice(active_songs)
+        progress.step = step
+        return card
 
     def update_training(
-        self, playlist_id: str, track_id: str, score: int, user_id: int = 0
+        self,
+        playlist_id: str,
+        track_id: str,
+        score: int,
+        user_id: int = 0,
+        commit: bool = True,
     ):
 
         training_card = self.training_repository.get_card(
@@ -189,14 +311,18 @@ class TrainingService:
         user = self.user_repository.get_user_by_id(user_id)
 
         if training_card is None:
-            print("Kein Trainingseintrag gefunden. Breche ab.")
-            print(
-                f"Playlist ID: {playlist_id}, Track ID: {track_id}, User ID: {user_id}"
+            logger.warning(
+                "Kein Trainingseintrag gefunden. Breche ab. "
+                "Playlist ID: %s, Track ID: %s, User ID: %s",
+                playlist_id,
+                track_id,
+                user_id,
             )
             return
         
-        if training_card.repeat_in_n != 0:
-            print("Karte ist nicht fällig für ein Update. Breche ab.")
+        progress = self.training_repository.get_progress(user_id, playlist_id)
+        if training_card.due_step > progress.step:
+            logger.info("Karte ist nicht fällig für ein Update. Breche ab.")
             return
 
         if training_card.correct_guesses < 0:
@@ -205,6 +331,9 @@ class TrainingService:
         if training_card.correct_in_row < 0:
             training_card.correct_in_row = 0
 
+        previous_correct_in_row = training_card.correct_in_row
+        finished = False
+
         # Update Score Logic
         if score == 5:
             user.current_streak += 1
@@ -219,10 +348,11 @@ class TrainingService:
             random_fuzz = random.randint(0, max(1, int(base_gap * 0.05)))
             base_gap += random_fuzz
 
+            # Materialisierter Zähler, korrigiert um die gerade beantwortete Karte
             below_threshold_count = (
-                self.training_repository.count_tracks_below_threshold(
-                    playlist_id=playlist_id, user_id=user_id, threshold=3
-                )
+                progress.learning_count
+                - int(previous_correct_in_row < LEARNING_THRESHOLD)
+                + int(training_card.correct_in_row < LEARNING_THRESHOLD)
             )
 
             if (
@@ -231,9 +361,8 @@ class TrainingService:
                 and below_threshold_count < 15
             ):
                 training_card.is_done = True
-                self.add_new_song(
-                    playlist_id=playlist_id, user_id=user_id
-                )  # Funktion muss angepasst werden
+                finished = True
+                self.add_new_song(playlist_id=playlist_id, user_id=user_id)
 
         elif score == 4:
             base_gap = 10 + random.randint(0, 3)
@@ -255,23 +384,32 @@ class TrainingService:
             user.current_streak = 0
             training_card.correct_in_row = 0
 
-        training_card.repeat_in_n = base_gap
+        training_card.due_step = progress.step + base_gap
         training_card.revisions += 1
+        self.training_repository.record_revision(
+            progress, training_card, previous_correct_in_row, finished
+        )
 
         if training_card.correct_guesses < 0:
-            print("Trotz Korrektur ist correct_guesses negativ. Bitte überprüfen.")
+            logger.error(
+                "Trotz Korrektur ist correct_guesses negativ. Bitte überprüfen."
+            )
 
         if training_card.correct_in_row < 0:
-            print("Trotz Korrektur ist correct_in_row negativ. Bitte überprüfen.")
+            logger.error(
+                "Trotz Korrektur ist correct_in_row negativ. Bitte überprüfen."
+            )
+
+        if commit:
+            self.training_repository.save_card()
+            self._schedule_prefetch(user_id, playlist_id)
 
-        self.training_repository.save_card()
+    def _schedule_prefetch(self, user_id: str, playlist_id: str):
+        """Stößt nach einer gespeicherten Antwort die Vorberechnung an."""
+        # Die nächste Karte schon berechnen, während der User das Ergebnis sieht
+        if self.card_prefetcher is not None:
+            self.card_prefetcher.schedule(user_id, playlist_id)
 
     def clean_title(self, title):
         """Bereinigt den Titel eines Songs von unnötigen Informationen."""
-
-        # Alles in Klammern entfernen
-        title = re.sub(r"\(.*?\)", "", title)
-        # Alles hinter einem Bindestrich entfernen
-        title = title.split("-")[0]
-        # Whitespace bereinigen
-        return title.strip()
+        return clean_title(title)
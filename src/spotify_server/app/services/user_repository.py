@@ -1,10 +1,12 @@
 """UserRepository for managing user data in the database."""
 
+from spotify_server.app.metrics import instrument_repository
 from spotify_server.app.models import User
 
 # from spotify_server.extensions import db
 
 
+@instrument_repository
 class UserRepository:
     """
     Verwaltet alle Datenbankoperationen für das User-Modell.
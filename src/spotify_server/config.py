@@ -17,6 +17,60 @@ class Config:
     SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
     SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
     SPOTIFY_REDIRECT_URI = os.getenv("REDIRECT_URL")
+    # Backend: "spotify" (echte API), "http" (Stand-in unter SPOTIFY_API_URL)
+    # oder "fake" (Simulation im selben Prozess, siehe fake_spotify.py)
+    SPOTIFY_BACKEND = os.getenv("SPOTIFY_BACKEND", "spotify")
+    SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "http://127.0.0.1:5099")
+    # Einstellungen der Simulation (Backend "fake")
+    FAKE_SPOTIFY_SEED = int(os.getenv("FAKE_SPOTIFY_SEED", "0"))
+    FAKE_SPOTIFY_PLAYLIST_SIZE = int(os.getenv("FAKE_SPOTIFY_PLAYLIST_SIZE", "500"))
+    FAKE_SPOTIFY_LATENCY_MS = float(os.getenv("FAKE_SPOTIFY_LATENCY_MS", "0"))
+    FAKE_SPOTIFY_JITTER_MS = float(os.getenv("FAKE_SPOTIFY_JITTER_MS", "0"))
+    FAKE_SPOTIFY_ERROR_RATE = float(os.getenv("FAKE_SPOTIFY_ERROR_RATE", "0"))
+    # Anzahl paralleler Anfragen beim Laden großer Playlists
+    SPOTIFY_PAGE_CONCURRENCY = int(os.getenv("SPOTIFY_PAGE_CONCURRENCY", "4"))
+    # Cache für die Spotify-Clients der User (Anzahl Einträge / Leerlauf in Sekunden)
+    SPOTIFY_CLIENT_CACHE_SIZE = int(os.getenv("SPOTIFY_CLIENT_CACHE_SIZE", "256"))
+    SPOTIFY_CLIENT_IDLE_TIMEOUT = int(os.getenv("SPOTIFY_CLIENT_IDLE_TIMEOUT", "900"))
+
+    # Tokens aktiver User im Hintergrund erneuern, bevor sie ablaufen
+    TOKEN_REFRESH_ENABLED = os.getenv("TOKEN_REFRESH_ENABLED", "1") == "1"
+    TOKEN_REFRESH_WINDOW = int(os.getenv("TOKEN_REFRESH_WINDOW", "300"))
+    TOKEN_REFRESH_INTERVAL = int(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+    TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "4"))
+
+    # Gewichtung bei der Kartenauswahl: leer (gleichverteilt), "overdue" oder "weak"
+    TRAINING_SELECTION_WEIGHTING = os.getenv("TRAINING_SELECTION_WEIGHTING") or None
+    # Beim Bewerten zusätzlich den laufenden Track bei Spotify abfragen (langsam)
+    VERIFY_PLAYBACK_ON_GUESS = os.getenv("VERIFY_PLAYBACK_ON_GUESS", "0") == "1"
+    # Anzahl im Hintergrund vorberechneter Karten pro Session (0 = aus)
+    LOOKAHEAD_DEPTH = int(os.getenv("LOOKAHEAD_DEPTH", "2"))
+    LOOKAHEAD_WORKERS = int(os.getenv("LOOKAHEAD_WORKERS", "2"))
+
+    # Wiedergabe-Befehle asynchron in einem Worker-Pool ausführen
+    PLAYBACK_ASYNC = os.getenv("PLAYBACK_ASYNC", "1") == "1"
+    PLAYBACK_WORKERS = int(os.getenv("PLAYBACK_WORKERS", "4"))
+    # Sekunden, nach denen der lokal bekannte Wiedergabe-Zustand neu geladen wird
+    PLAYBACK_STATE_MAX_AGE = float(os.getenv("PLAYBACK_STATE_MAX_AGE", "30"))
+
+    # SQL-Abfragen pro Request zählen und langsame Statements loggen (ms, 0 = aus)
+    QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "1") == "1"
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    # Abfragen und DB-Zeit als X-DB-*-Header ausgeben (im Debug-Modus immer)
+    QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "0") == "1"
+
+    # Logging: Level (z.B. DEBUG für Meldungen pro Karte) und Format ("json"/"text")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+    # Metriken im Prometheus-Format unter /metrics bereitstellen
+    # (die Datenbankzeit der Repositories setzt QUERY_STATS_ENABLED voraus)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+    # Anzahl der Künstlernamen im prozesslokalen Cache
+    ARTIST_CACHE_SIZE = int(os.getenv("ARTIST_CACHE_SIZE", "10000"))
+    # Speicherbudget (Bytes) für gecachte Track-Metadaten
+    TRACK_CACHE_MAX_BYTES = int(os.getenv("TRACK_CACHE_MAX_BYTES", "33554432"))  # 32 MB
 
     # Datenbank-Konfiguration
     DB_USER = os.getenv("DB_USER")
@@ -1,3 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert
 
 db = SQLAlchemy()
+
+
+def insert_ignore(table):
+    """
+    INSERT, bei dem die Datenbank bereits existierende Schlüssel überspringt
+    (INSERT IGNORE bei MySQL, INSERT OR IGNORE bei SQLite).
+    """
+    return (
+        insert(table)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
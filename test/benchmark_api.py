@@ -0,0 +1,355 @@
+"""
+Benchmark für die Hot Paths der Trainings-API.
+
+Erstellt pro Playlist-Größe eine frische SQLite-Datenbank über die App-Factory
+mit simuliertem Spotify-Backend, legt synthetische User und Lernkarten-Historien
+an und misst /api/set_playlist, /api/check_guess, /api/skip, /api/answer und
+/api/stats. Ausgegeben werden p50/p95/p99 und die Anzahl der
+SQL-Abfragen pro Endpunkt; die Ergebnisse landen als JSON in einer Datei,
+damit Läufe miteinander verglichen werden können.
+
+Beispiel:
+    python test/benchmark_api.py --sizes 100,1000,10000 --rounds 200
+    python test/benchmark_api.py --baseline benchmark_results.json
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from sqlalchemy import event
+from spotify_server.app import create_app
+from spotify_server.app.migrations import upgrade_schema
+from spotify_server.app.models import (
+    PlaylistTrack,
+    Track,
+    TrainingData,
+    TrainingProgress,
+    User,
+)
+from spotify_server.app.services.training_repository import TrainingRepository
+from spotify_server.config import Config
+from spotify_server.extensions import db, insert_ignore
+
+# Reihenfolge der Endpunkte in der Ausgabe
+ENDPOINTS = (
+    "set_playlist_cold",
+    "set_playlist",
+    "check_guess",
+    "skip",
+    "answer",
+    "stats",
+)
+
+
+def make_config(args, size: int, database_path: str):
+    """Baut die Konfiguration für einen Lauf mit der gegebenen Playlist-Größe."""
+
+    class BenchmarkConfig(Config):
+        TESTING = True
+        SECRET_KEY = "benchmark"
+        SPOTIFY_REDIRECT_URI = "http://localhost/callback"
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+        SPOTIFY_BACKEND = "fake"
+        FAKE_SPOTIFY_SEED = args.seed
+        FAKE_SPOTIFY_PLAYLIST_SIZE = size
+        FAKE_SPOTIFY_LATENCY_MS = args.latency_ms
+        FAKE_SPOTIFY_JITTER_MS = args.jitter_ms
+        FAKE_SPOTIFY_ERROR_RATE = 0.0
+        # Wiedergabe im Request-Thread und keine Vorberechnung: nach dem Lauf
+        # greift kein Worker mehr auf die temporäre Datenbank zu
+        PLAYBACK_ASYNC = False
+        LOOKAHEAD_DEPTH = 0
+
+    return BenchmarkConfig
+
+
+class QueryCounter:
+    """Zählt die SQL-Abfragen, die im messenden Thread ausgeführt werden."""
+
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, many):
+        # Abfragen anderer Threads gehören nicht zur gemessenen Anfrage
+        if threading.get_ident() == self.thread_id:
+            self.count += 1
+
+
+class EndpointStats:
+    """Sammelt Latenzen und Abfragen pro Endpunkt."""
+
+    def __init__(self):
+        self.samples = {}  # Endpunkt -> Liste (Sekunden, Abfragen, Statuscode)
+
+    def add(self, endpoint: str, seconds: float, queries: int, status: int):
+        self.samples.setdefault(endpoint, []).append((seconds, queries, status))
+
+    def summary(self) -> dict:
+        result = {}
+        for endpoint in ENDPOINTS:
+            samples = self.samples.get(endpoint)
+            if not samples:
+                continue
+            latencies = sorted(seconds for seconds, _, _ in samples)
+            queries = [count for _, count, _ in samples]
+            result[endpoint] = {
+                "requests": len(samples),
+                "errors": sum(1 for _, _, status in samples if status >= 400),
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": latencies[-1] * 1000,
+                "queries_mean": sum(queries) / len(queries),
+                "queries_max": max(queries),
+            }
+        return result
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Perzentil nach dem Nearest-Rank-Verfahren."""
+    rank = max(1, round(p / 100 * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def seed_users(user_count: int) -> list[str]:
+    """Legt User mit gültigen (simulierten) Spotify-Tokens an."""
+    user_ids = [f"bench-user-{index}" for index in range(user_count)]
+    expires_at = datetime.utcnow() + timedelta(hours=6)
+    db.session.add_all(
+        User(
+            user_id=user_id,
+            username=user_id,
+            max_streak=0,
+            current_streak=0,
+            spotify_access_token=f"fake-access:{user_id}:0",
+            spotify_refresh_token=f"fake-refresh:{user_id}",
+            spotify_token_expires_at=expires_at,
+        )
+        for user_id in user_ids
+    )
+    db.session.commit()
+    return user_ids
+
+
+def seed_histories(
+    user_ids: list[str], playlist_id: str, cards_per_user: int, rng: random.Random
+):
+    """
+    Legt für jeden User Lernkarten mit zufälliger Historie an und berechnet
+    anschließend die Zähler in training_progress.
+    """
+    track_ids = [
+        row[0]
+        for row in db.session.query(PlaylistTrack.track_id).filter(
+            PlaylistTrack.playlist_id == playlist_id
+        )
+    ]
+    step = 50
+    for user_id in user_ids:
+        cards = []
+        for track_id in rng.sample(track_ids, min(cards_per_user, len(track_ids))):
+            correct_in_row = rng.randint(0, 8)
+            cards.append(
+                {
+                    "user_id": user_id,
+                    "playlist_id": playlist_id,
+                    "track_id": track_id,
+                    "correct_guesses": correct_in_row + rng.randint(0, 5),
+                    "correct_in_row": correct_in_row,
+                    "due_step": rng.randint(0, step * 2),
+                    "revisions": correct_in_row + rng.randint(0, 20),
+                    "is_done": correct_in_row >= 5,
+                }
+            )
+        db.session.execute(insert_ignore(TrainingData.__table__).values(cards))
+
+        progress = db.session.get(TrainingProgress, (user_id, playlist_id))
+        if progress is None:
+            db.session.add(
+                TrainingProgress(user_id=user_id, playlist_id=playlist_id, step=step)
+            )
+        else:
+            progress.step = step
+    db.session.commit()
+    TrainingRepository().reconcile_progress()
+
+
+def make_guess(user_id: str, playlist_id: str, rng: random.Random) -> dict:
+    """Baut eine Antwort auf den aktuellen Track, meist richtig, manchmal falsch."""
+    track_id = (
+        db.session.query(TrainingProgress.current_track_id)
+        .filter(
+            TrainingProgress.user_id == user_id,
+            TrainingProgress.playlist_id == playlist_id,
+        )
+        .scalar()
+    )
+    track = db.session.get(Track, track_id)
+    correct = rng.random() < 0.7
+    return {
+        "user_id": user_id,
+        "playlist_id": playlist_id,
+        "track_id": track_id,
+        "name": track.name if correct else "Irgendein Titel",
+        "artist": track.artists[0].name if correct else "Irgendwer",
+        "year": track.year if correct else track.year + rng.randint(-8, 8),
+    }
+
+
+def run_size(args, size: int) -> dict:
+    """Führt den Benchmark für eine Playlist-Größe durch."""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(make_config(args, size, os.path.join(directory, "bench.db")))
+        client = app.test_client()
+        stats = EndpointStats()
+        counter = QueryCounter()
+        playlist_id = f"bench-playlist-{size}"
+
+        def request(endpoint: str, method: str, url: str, payload=None):
+            counter.count = 0
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=payload)
+            elapsed = time.perf_counter() - started
+            stats.add(endpoint, elapsed, counter.count, response.status_code)
+            return response
+
+        with app.app_context():
+            upgrade_schema()
+            user_ids = seed_users(args.users)
+            event.listen(db.engine, "before_cursor_execute", counter)
+
+        set_playlist = {
+            "playlist_url": f"https://open.spotify.com/playlist/{playlist_id}"
+        }
+
+        # Erster Aufruf importiert die Playlist vom (simulierten) Spotify
+        request(
+            "set_playlist_cold",
+            "POST",
+            "/api/set_playlist",
+            {"user_id": user_ids[0], **set_playlist},
+        )
+        with app.app_context():
+            seed_histories(user_ids, playlist_id, args.cards_per_user, rng)
+        for user_id in user_ids:
+            request(
+                "set_playlist",
+                "POST",
+                "/api/set_playlist",
+                {"user_id": user_id, **set_playlist},
+            )
+
+        for round_index in range(args.rounds):
+            user_id = user_ids[round_index % len(user_ids)]
+            with app.app_context():
+                guess = make_guess(user_id, playlist_id, rng)
+            request("check_guess", "POST", "/api/check_guess", guess)
+            request(
+                "skip",
+                "POST",
+                "/api/skip",
+                {"user_id": user_id, "playlist_id": playlist_id},
+            )
+            request(
+                "stats",
+                "POST",
+                "/api/stats",
+                {"user_id": user_id, "playlist_id": playlist_id},
+            )
+            with app.app_context():
+                guess = make_guess(user_id, playlist_id, rng)
+            request("answer", "POST", "/api/answer", guess)
+
+        with app.app_context():
+            event.remove(db.engine, "before_cursor_execute", counter)
+            db.session.remove()
+            db.engine.dispose()
+
+    return stats.summary()
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None = None):
+    """Gibt die Ergebnisse als Tabelle aus, optional mit Abweichung zur Baseline."""
+    header = f"{'Endpunkt':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'SQL':>7}"
+    for size, endpoints in results.items():
+        print(f"\nPlaylist mit {size} Tracks")
+        print(header + ("   Δp95" if baseline else ""))
+        for endpoint, row in endpoints.items():
+            line = (
+                f"{endpoint:<18}{row['p50_ms']:>7.1f}ms{row['p95_ms']:>7.1f}ms"
+                f"{row['p99_ms']:>7.1f}ms"
+                f"{row['queries_mean']:>7.1f}"
+            )
+            previous = (baseline or {}).get(size, {}).get(endpoint)
+            if previous and previous["p95_ms"]:
+                change = (row["p95_ms"] / previous["p95_ms"] - 1) * 100
+                line += f"{change:>+7.0f}%"
+            if row["errors"]:
+                line += f"  ({row['errors']} Fehler)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--cards-per-user", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Früheres Ergebnis zum Vergleich")
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"Benchmark mit {size} Tracks ...", flush=True)
+        results[str(size)] = run_size(args, size)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "meta": {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "git_revision": git_revision(),
+                    "python": platform.python_version(),
+                    "arguments": vars(args),
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nErgebnisse gespeichert in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Gemeinsame Fixtures: eine App mit SQLite-Datenbank und simuliertem Spotify."""
+
+from datetime import datetime, timedelta
+import pytest
+from spotify_server.app import create_app
+from spotify_server.app.migrations import upgrade_schema
+from spotify_server.app.models import User
+from spotify_server.app.services.fake_spotify import (
+    FakeSpotifyGateway,
+    FakeSpotifyWorld,
+)
+from spotify_server.app.services.playback_service import PlaybackService
+from spotify_server.app.services.song_repository import SongRepository
+from spotify_server.app.services.spotify_service import SpotifyService
+from spotify_server.app.services.training_repository import TrainingRepository
+from spotify_server.app.services.training_service import TrainingService
+from spotify_server.app.services.user_repository import UserRepository
+from spotify_server.config import Config
+from spotify_server.extensions import db
+
+
+class TestConfig(Config):
+    TESTING = True
+    SECRET_KEY = "test"
+    SPOTIFY_REDIRECT_URI = "http://localhost/callback"
+    SPOTIFY_BACKEND = "fake"
+    FAKE_SPOTIFY_PLAYLIST_SIZE = 150
+    TOKEN_REFRESH_ENABLED = False
+    # Deterministische Tests: Wiedergabe im Request-Thread, keine Vorberechnung
+    PLAYBACK_ASYNC = False
+    LOOKAHEAD_DEPTH = 0
+
+
+@pytest.fixture
+def config(tmp_path):
+    class AppConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+
+    return AppConfig
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        upgrade_schema()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def world():
+    return FakeSpotifyWorld(playlist_size=150)
+
+
+@pytest.fixture
+def training_service(app, world):
+    """Die Services wie in create_app, aber mit eigener Simulation zum Prüfen."""
+    gateway = FakeSpotifyGateway(world, redirect_uri=TestConfig.SPOTIFY_REDIRECT_URI)
+    user_repository = UserRepository()
+    return TrainingService(
+        song_repository=SongRepository(spotify_service=SpotifyService(gateway)),
+        training_repository=TrainingRepository(),
+        playback_service=PlaybackService(gateway, user_repository=user_repository),
+        user_repository=user_repository,
+    )
+
+
+def add_user(user_id: str = "u1") -> User:
+    """Legt einen User an, der bei der Simulation angemeldet ist."""
+    user = User(
+        user_id=user_id,
+        username=user_id,
+        current_streak=0,
+        max_streak=0,
+        spotify_access_token=f"fake-access:{user_id}:0",
+        spotify_refresh_token=f"fake-refresh:{user_id}",
+        spotify_token_expires_at=datetime.utcnow() + timedelta(hours=1),
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def user(app):
+    return add_user()
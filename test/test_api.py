@@ -0,0 +1,118 @@
+"""Tests für die Trainings-API über den Flask-Testclient."""
+
+import pytest
+from spotify_server.app.matching import clean_title
+from spotify_server.app.models import Track, TrainingData, TrainingProgress, User
+from spotify_server.extensions import db
+
+PLAYLIST_ID = "p1"
+PLAYLIST_URL = f"https://open.spotify.com/playlist/{PLAYLIST_ID}?si=abc"
+
+
+@pytest.fixture
+def logged_in(client):
+    """Meldet u1 über den OAuth-Callback der Simulation an."""
+    response = client.get("/callback?code=u1")
+    assert response.status_code == 302
+    return db.session.get(User, "u1")
+
+
+@pytest.fixture
+def started(client, logged_in):
+    response = client.post(
+        "/api/set_playlist", json={"user_id": "u1", "playlist_url": PLAYLIST_URL}
+    )
+    assert response.status_code == 200
+    return response.get_json()["track_id"]
+
+
+def _correct_guess(track_id: str) -> dict:
+    track = db.session.get(Track, track_id)
+    return {
+        "user_id": "u1",
+        "playlist_id": PLAYLIST_ID,
+        "name": clean_title(track.name),
+        "artist": track.artists[0].name,
+        "year": track.year,
+    }
+
+
+def _progress() -> TrainingProgress:
+    db.session.expire_all()
+    return db.session.get(TrainingProgress, ("u1", PLAYLIST_ID))
+
+
+def test_callback_stores_the_user_tokens(logged_in):
+    assert logged_in.spotify_access_token.startswith("fake-access:u1:")
+    assert logged_in.spotify_refresh_token == "fake-refresh:u1"
+
+
+def test_set_playlist_starts_the_first_song(client, started):
+    assert _progress().current_track_id == started
+    assert TrainingData.query.count() == 20
+
+    state = client.post("/api/playback/state", json={"user_id": "u1"}).get_json()
+    assert state["is_playing"] is True
+    assert state["track_id"] == started
+
+
+def test_set_playlist_requires_user_and_url(client):
+    response = client.post("/api/set_playlist", json={"user_id": "u1"})
+
+    assert response.status_code == 400
+
+
+def test_answer_scores_and_starts_the_next_song(client, started):
+    response = client.post("/api/answer", json=_correct_guess(started))
+
+    result = response.get_json()
+    assert response.status_code == 200
+    assert result["score"] == 5
+    assert result["track_id"] == _progress().current_track_id
+    assert client.get(f"/api/playback/commands/{result['command_id']}").get_json()[
+        "status"
+    ] in ("done", "superseded")
+    card = db.session.get(TrainingData, ("u1", PLAYLIST_ID, started))
+    assert card.revisions == 1
+    assert card.correct_in_row == 1
+
+
+def test_answer_requires_user_and_playlist(client, logged_in):
+    assert client.post("/api/answer", json={"user_id": "u1"}).status_code == 400
+
+
+def test_check_guess_scores_the_song_of_the_round(client, started):
+    guess = _correct_guess(started)
+    # Eine vom Client mitgeschickte ID wird nicht bewertet
+    guess["track_id"] = "fake000000000000000001"
+
+    result = client.post("/api/check_guess", json=guess).get_json()
+
+    assert result["score"] == 5
+    assert result["correct_answer"]["title"] == db.session.get(Track, started).name
+    assert db.session.get(TrainingData, ("u1", PLAYLIST_ID, started)).revisions == 1
+
+
+def test_skip_keeps_the_step_while_cards_are_due(client, started):
+    step = _progress().step
+
+    response = client.post(
+        "/api/skip", json={"user_id": "u1", "playlist_id": PLAYLIST_ID}
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["track_id"] == _progress().current_track_id
+    assert _progress().step == step
+
+
+def test_stats_for_one_and_all_playlists(client, started):
+    client.post("/api/answer", json=_correct_guess(started))
+
+    stats = client.post(
+        "/api/stats", json={"user_id": "u1", "playlist_id": PLAYLIST_ID}
+    ).get_json()
+    all_stats = client.post("/api/stats", json={"user_id": "u1"}).get_json()
+
+    assert stats["active_tracks"] == 20
+    assert stats["total_revisions"] == 1
+    assert all_stats == {"playlists": {PLAYLIST_ID: stats}}
@@ -0,0 +1,121 @@
+"""Tests für die gebündelte Auflösung von Künstlernamen (ArtistResolver)."""
+
+from spotify_server.app.models import Artist
+from spotify_server.app.services.artist_resolver import ArtistResolver
+from spotify_server.extensions import db
+
+
+def _artist_ids() -> dict[str, int]:
+    return dict(db.session.query(Artist.name, Artist.artist_id))
+
+
+def test_resolve_creates_missing_artists_once(app):
+    db.session.add(Artist(name="Abba"))
+    db.session.commit()
+    resolver = ArtistResolver()
+
+    artist_ids = resolver.resolve(["Abba", "Queen", "Abba", "Toto"])
+    db.session.commit()
+
+    assert artist_ids == _artist_ids()
+    assert set(artist_ids) == {"Abba", "Queen", "Toto"}
+    assert resolver.stats() == {"size": 3, "hits": 0, "misses": 3}
+
+
+def test_new_artists_are_cached_only_after_commit(app):
+    resolver = ArtistResolver()
+
+    artist_ids = resolver.resolve(["Queen"])
+    assert resolver.stats()["size"] == 0
+
+    db.session.commit()
+    assert resolver.stats()["size"] == 1
+    assert resolver.resolve(["Queen"]) == artist_ids
+    assert resolver.stats()["hits"] == 1
+
+
+def test_rollback_discards_new_artists(app):
+    resolver = ArtistResolver()
+
+    resolver.resolve(["Queen"])
+    db.session.rollback()
+    db.session.commit()
+
+    assert resolver.stats()["size"] == 0
+    assert _artist_ids() == {}
+    artist_ids = resolver.resolve(["Queen"])
+    db.session.commit()
+    assert artist_ids == _artist_ids()
+
+
+def test_ids_read_inside_the_transaction_are_discarded_on_rollback(app):
+    resolver, other = ArtistResolver(), ArtistResolver()
+
+    resolver.resolve(["Queen"])
+    # Ein zweiter Resolver findet den noch nicht committeten Künstler per SELECT
+    other.resolve(["Queen"])
+    db.session.rollback()
+
+    assert other.stats()["size"] == 0
+    assert resolver.stats()["size"] == 0
+
+
+def test_rollback_of_a_savepoint_discards_new_artists(app):
+    resolver = ArtistResolver()
+    resolver.resolve(["Abba"])
+
+    savepoint = db.session.begin_nested()
+    resolver.resolve(["Queen"])
+    savepoint.rollback()
+    db.session.commit()
+
+    assert set(_artist_ids()) == {"Abba"}
+    assert resolver.stats()["size"] == 0
+    artist_ids = resolver.resolve(["Queen"])
+    db.session.commit()
+    assert artist_ids == {"Queen": _artist_ids()["Queen"]}
+    assert resolver.stats()["size"] == 1
+
+
+def test_each_resolver_keeps_its_own_cache(app):
+    first, second = ArtistResolver(), ArtistResolver()
+
+    first.resolve(["Queen"])
+    second.resolve(["Toto"])
+    db.session.commit()
+
+    assert first.stats()["size"] == 1
+    assert second.stats()["size"] == 1
+    assert first.resolve(["Queen"]) == {"Queen": _artist_ids()["Queen"]}
+
+
+def test_cache_is_bounded(app):
+    resolver = ArtistResolver(max_size=2)
+
+    resolver.resolve(["A", "B", "C"])
+    db.session.commit()
+
+    assert resolver.stats()["size"] == 2
+
+
+def test_names_equal_under_the_db_collation_map_to_the_stored_artist(app):
+    # Wie bei MySQL: der eindeutige Index ignoriert Groß-/Kleinschreibung
+    db.session.remove()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE track_artists")
+        connection.exec_driver_sql("DROP TABLE artist")
+        connection.exec_driver_sql(
+            "CREATE TABLE artist (artist_id INTEGER NOT NULL PRIMARY KEY, "
+            "name VARCHAR(100) COLLATE NOCASE)"
+        )
+        connection.exec_driver_sql(
+            "CREATE UNIQUE INDEX ux_artist_name ON artist (name)"
+        )
+        connection.exec_driver_sql("INSERT INTO artist VALUES (1, 'ABBA')")
+    resolver = ArtistResolver()
+
+    artist_ids = resolver.resolve(["abba", "Abba", "Queen"])
+    db.session.commit()
+
+    assert artist_ids["abba"] == artist_ids["Abba"] == 1
+    assert db.session.query(Artist).count() == 2
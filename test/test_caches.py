@@ -0,0 +1,122 @@
+"""Tests für Track-Cache, Spotify-Client-Cache, Wiedergabe-Zustand und Token-Erneuerung."""
+
+from datetime import datetime, timedelta
+from spotify_server.app.dto import SongDTO
+from spotify_server.app.models import User
+from spotify_server.app.services.fake_spotify import FakeSpotifyGateway
+from spotify_server.app.services.playback_service import PlaybackService
+from spotify_server.app.services.spotify_client_cache import SpotifyClientCache
+from spotify_server.app.services.token_refresher import TokenRefresher
+from spotify_server.app.services.track_cache import TrackCache
+from spotify_server.app.services.user_repository import UserRepository
+from spotify_server.extensions import db
+
+
+def _song(index: int) -> SongDTO:
+    return SongDTO(f"t{index}", f"Song {index}", [f"Artist {index}"], 2000)
+
+
+def test_track_cache_evicts_least_recently_used_within_budget():
+    size = TrackCache()._estimate_size(_song(0))
+    cache = TrackCache(max_bytes=size * 3)
+
+    for index in range(3):
+        cache.put(_song(index))
+    cache.get("t0")
+    cache.put(_song(3))
+
+    assert cache.contains("t0")
+    assert not cache.contains("t1")
+    assert cache.stats()["size"] == 3
+    assert cache.stats()["bytes"] <= size * 3
+
+
+def test_track_cache_replaces_and_invalidates_entries():
+    cache = TrackCache()
+
+    cache.put(_song(1))
+    cache.put(_song(1))
+    assert cache.stats()["size"] == 1
+    cache.invalidate("t1")
+
+    assert cache.get("t1") is None
+    assert cache.stats() == {"size": 0, "bytes": 0, "hits": 0, "misses": 1}
+
+
+def test_client_cache_reuses_clients_until_the_token_changes(world):
+    cache = SpotifyClientCache(FakeSpotifyGateway(world), max_size=2)
+
+    client = cache.get_client("u1", "fake-access:u1:1")
+    assert cache.get_client("u1", "fake-access:u1:1") is client
+    assert cache.get_client("u1", "fake-access:u1:2") is not client
+    cache.get_client("u2", "fake-access:u2:1")
+    cache.get_client("u3", "fake-access:u3:1")
+
+    assert cache.active_user_ids() == ["u2", "u3"]
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 4, "evictions": 2}
+
+
+def test_client_cache_drops_idle_clients(world):
+    cache = SpotifyClientCache(FakeSpotifyGateway(world), idle_timeout=0)
+
+    client = cache.get_client("u1", "fake-access:u1:1")
+
+    assert cache.active_user_ids() == []
+    assert cache.get_client("u1", "fake-access:u1:1") is not client
+
+
+def test_playback_state_is_kept_between_commands(app, world, user):
+    service = PlaybackService(FakeSpotifyGateway(world), UserRepository())
+
+    service.play_song(user, "fake000000000000000001")
+    calls = world.calls
+    state = service.get_playback_state(user)
+    service.toggle_play_pause(user.user_id)
+
+    assert state.is_playing is True
+    assert state.track_id == "fake000000000000000001"
+    # Nur der Pause-Befehl selbst, keine Abfrage des Zustands
+    assert world.calls == calls + 1
+    assert world.player(user.user_id)["is_playing"] is False
+    assert service.get_playback_state(user, refresh=True).is_playing is False
+
+
+def test_toggle_recovers_from_a_stale_state(app, world, user):
+    service = PlaybackService(FakeSpotifyGateway(world), UserRepository())
+    service.play_song(user, "fake000000000000000001")
+    # Am Handy pausiert, der bekannte Zustand ist veraltet
+    world.update_player(user.user_id, is_playing=False)
+
+    service.toggle_play_pause(user.user_id)
+
+    assert world.player(user.user_id)["is_playing"] is True
+
+
+def test_token_refresher_renews_expiring_tokens_of_active_users(app, world):
+    gateway = FakeSpotifyGateway(world)
+    cache = SpotifyClientCache(gateway)
+    expires_at = datetime.utcnow() + timedelta(seconds=30)
+    for user_id in ("u1", "u2"):
+        db.session.add(
+            User(
+                user_id=user_id,
+                spotify_access_token=f"fake-access:{user_id}:0",
+                spotify_refresh_token=f"fake-refresh:{user_id}",
+                spotify_token_expires_at=expires_at,
+            )
+        )
+    db.session.commit()
+    # Nur u1 war kürzlich aktiv
+    cache.get_client("u1", "fake-access:u1:0")
+    refresher = TokenRefresher(
+        app, auth_manager=gateway.auth_manager(), client_cache=cache
+    )
+
+    assert refresher.refresh_expiring_tokens() == 1
+
+    db.session.expire_all()
+    renewed, idle = db.session.get(User, "u1"), db.session.get(User, "u2")
+    assert renewed.spotify_access_token != "fake-access:u1:0"
+    assert renewed.spotify_token_expires_at > expires_at
+    assert idle.spotify_access_token == "fake-access:u2:0"
+    assert refresher.refresh_expiring_tokens() == 0
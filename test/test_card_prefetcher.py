@@ -0,0 +1,101 @@
+"""Tests für die Vorberechnung der nächsten fälligen Karten (CardPrefetcher)."""
+
+import pytest
+from spotify_server.app.models import TrainingData, TrainingProgress
+from spotify_server.app.services.card_prefetcher import CardPrefetcher
+from spotify_server.extensions import db
+
+PLAYLIST_ID = "p1"
+
+
+@pytest.fixture
+def prefetcher(app, training_service, monkeypatch):
+    prefetcher = CardPrefetcher(app, training_service.training_repository, depth=2)
+    # Im Test-Thread vorberechnen, damit dieselbe Session genutzt wird
+    monkeypatch.setattr(prefetcher, "schedule", prefetcher.prefetch)
+    training_service.card_prefetcher = prefetcher
+
+    def score_current_round(user_guess, user_id):
+        progress = db.session.get(TrainingProgress, (user_id, PLAYLIST_ID))
+        return {"score": 0, "track_id": progress.current_track_id}
+
+    monkeypatch.setattr(training_service, "calculate_score", score_current_round)
+    return prefetcher
+
+
+def _seed_due_cards(count: int, step: int = 10) -> list[str]:
+    track_ids = [f"t{index}" for index in range(count)]
+    db.session.add(
+        TrainingProgress(
+            user_id="u1",
+            playlist_id=PLAYLIST_ID,
+            step=step,
+            card_count=count,
+            finished_count=0,
+            learning_count=count,
+            revision_count=0,
+        )
+    )
+    db.session.add_all(
+        TrainingData(
+            user_id="u1",
+            playlist_id=PLAYLIST_ID,
+            track_id=track_id,
+            due_step=step,
+            correct_guesses=0,
+            correct_in_row=0,
+            revisions=0,
+            is_done=False,
+        )
+        for track_id in track_ids
+    )
+    db.session.commit()
+    return track_ids
+
+
+def test_answer_takes_the_card_prefetched_after_the_previous_answer(
+    training_service, user, prefetcher
+):
+    _seed_due_cards(5)
+    current = training_service.choose_next_song(user, PLAYLIST_ID).track_id
+
+    for _ in range(3):
+        _, next_card = training_service.answer_and_advance(
+            user, {"playlist_id": PLAYLIST_ID}
+        )
+        assert next_card.track_id != current
+        current = next_card.track_id
+
+    # Die erste Antwort findet noch keinen Puffer vor
+    assert prefetcher.hits == 2
+
+
+def test_prefetch_skips_the_track_of_the_current_round(
+    training_service, user, prefetcher
+):
+    _seed_due_cards(2)
+    current = training_service.choose_next_song(user, PLAYLIST_ID).track_id
+
+    assert prefetcher.prefetch(user.user_id, PLAYLIST_ID) == 1
+    next_card = training_service.choose_next_song(user, PLAYLIST_ID)
+
+    assert next_card.track_id != current
+    assert prefetcher.hits == 1
+
+
+def test_prefetch_from_an_earlier_round_is_discarded(
+    training_service, user, prefetcher
+):
+    track_ids = _seed_due_cards(5)
+    training_service.choose_next_song(user, PLAYLIST_ID)
+    prefetcher.prefetch(user.user_id, PLAYLIST_ID)
+    # Eine neue Runde hat begonnen, bevor der Puffer übernommen wurde
+    progress = db.session.get(TrainingProgress, (user.user_id, PLAYLIST_ID))
+    progress.current_track_id = next(
+        track_id for track_id in track_ids if track_id != progress.current_track_id
+    )
+    db.session.commit()
+
+    training_service.choose_next_song(user, PLAYLIST_ID)
+
+    assert prefetcher.stats() == {"sessions": 0, "hits": 0, "misses": 2}
@@ -0,0 +1,141 @@
+"""Tests für die normalisierten Suchschlüssel und die Bewertung der Antworten."""
+
+import pytest
+from spotify_server.app.dto import SongDTO
+from spotify_server.app.matching import (
+    artist_keys,
+    clean_title,
+    join_artist_keys,
+    normalize,
+    split_artist_keys,
+    title_key,
+)
+from spotify_server.app.models import Artist, Track, TrainingProgress
+from spotify_server.extensions import db
+
+PLAYLIST_ID = "p1"
+# Eine ID aus dem Katalog der Simulation, damit der Player sie kennt
+TRACK_ID = "fake000000000000000001"
+
+
+@pytest.mark.parametrize(
+    "title, expected",
+    [
+        ("Song (Live)", "Song"),
+        ("Song - Remastered 2011", "Song"),
+        ("Song (feat. Guest) - Live", "Song"),
+        ("  Song  ", "Song"),
+    ],
+)
+def test_clean_title(title, expected):
+    assert clean_title(title) == expected
+
+
+def test_normalize_removes_accents_case_and_extra_whitespace():
+    assert normalize("  Beyoncé   KNOWLES ") == "beyonce knowles"
+    assert normalize("Straße") == "strasse"
+
+
+def test_title_key():
+    assert title_key("Déjà Vu (Live) - Remastered") == "deja vu"
+    assert title_key(None) == ""
+
+
+def test_artist_keys_add_alias_without_article():
+    assert artist_keys(["The Beatles", "Beyoncé", "the beatles", ""]) == (
+        "the beatles",
+        "beatles",
+        "beyonce",
+    )
+
+
+def test_artist_keys_round_trip():
+    keys = artist_keys(["The Beatles", "ABBA"])
+
+    assert split_artist_keys(join_artist_keys(keys)) == keys
+    assert split_artist_keys(None) is None
+    assert split_artist_keys("") == ()
+
+
+def test_song_dto_computes_missing_keys():
+    song = SongDTO("t1", "Déjà Vu (Live)", ["The Beatles"], 1999)
+
+    assert song.match_title == "deja vu"
+    assert song.match_artists == ("the beatles", "beatles")
+
+
+@pytest.fixture
+def current_track(app, training_service, user):
+    """Ein Song als aktuelle Runde, mit gespeicherten Suchschlüsseln."""
+    artist = Artist(name="The Beatles")
+    track = Track(
+        track_id=TRACK_ID,
+        name="Beyoncé Song (Live)",
+        year=2003,
+        popularity=50,
+        match_title=title_key("Beyoncé Song (Live)"),
+        match_artists=join_artist_keys(artist_keys(["The Beatles"])),
+        artists=[artist],
+    )
+    db.session.add(track)
+    db.session.add(
+        TrainingProgress(
+            user_id=user.user_id,
+            playlist_id=PLAYLIST_ID,
+            step=0,
+            current_track_id=TRACK_ID,
+        )
+    )
+    db.session.commit()
+    return track
+
+
+def _guess(name, artist, year):
+    return {"playlist_id": PLAYLIST_ID, "name": name, "artist": artist, "year": year}
+
+
+@pytest.mark.parametrize(
+    "guess, score",
+    [
+        (_guess("beyonce song", "Beatles", 2003), 5),
+        (_guess("BEYONCÉ SONG", "the beatles", 2003), 5),
+        (_guess("Beyonce Song", "Beatles", 2001), 4),
+        (_guess(None, None, 2003), 2),
+        (_guess("something else", "nobody", 1990), 0),
+    ],
+)
+def test_calculate_score(training_service, user, current_track, guess, score):
+    result = training_service.calculate_score(guess, user.user_id)
+
+    assert result["score"] == score
+    assert result["track_id"] == TRACK_ID
+    assert result["correct_title"] == "Beyoncé Song (Live)"
+    assert result["correct_artist"] == "The Beatles"
+    assert result["correct_year"] == 2003
+
+
+def test_calculate_score_uses_the_stored_round(
+    training_service, user, current_track, monkeypatch
+):
+    def get_current_id(user_id):
+        raise AssertionError("Spotify darf nicht gefragt werden")
+
+    monkeypatch.setattr(
+        training_service.playback_service, "get_current_id", get_current_id
+    )
+
+    training_service.calculate_score(_guess("x", "y", 2000), user.user_id)
+
+
+def test_calculate_score_without_round_asks_spotify(
+    training_service, user, current_track, world
+):
+    world.update_player(user.user_id, is_playing=True, track_id=TRACK_ID)
+    guess = _guess("beyonce song", "beatles", 2003)
+    guess["playlist_id"] = "other"
+
+    assert training_service.calculate_score(guess, user.user_id)["score"] == 5
+
+    world.update_player(user.user_id, is_playing=False, track_id=None)
+    with pytest.raises(LookupError):
+        training_service.calculate_score(guess, user.user_id)
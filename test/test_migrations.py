@@ -0,0 +1,192 @@
+"""Tests für die Schema-Migrationen und die Index-Prüfung gegen SQLite."""
+
+import random
+from sqlalchemy import inspect
+from spotify_server.app.migrations import (
+    MIGRATIONS,
+    check_index_usage,
+    get_pending_migrations,
+    get_schema_version,
+    upgrade_schema,
+)
+from spotify_server.app.models import (
+    Artist,
+    Playlist,
+    PlaylistTrack,
+    Track,
+    TrainingData,
+    TrainingProgress,
+    User,
+)
+from spotify_server.app.services.song_repository import SongRepository
+from spotify_server.app.services.training_repository import TrainingRepository
+from spotify_server.extensions import db
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Schema vor den versionierten Migrationen (Stand der Models vor user-006)
+LEGACY_SCHEMA = """
+CREATE TABLE user (
+    user_id VARCHAR(100) NOT NULL PRIMARY KEY,
+    username VARCHAR(100),
+    max_streak INTEGER,
+    current_streak INTEGER,
+    spotify_access_token VARCHAR(255),
+    spotify_refresh_token VARCHAR(255),
+    spotify_token_expires_at DATETIME,
+    spotify_id VARCHAR(100) UNIQUE
+);
+CREATE TABLE artist (
+    artist_id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(100)
+);
+CREATE TABLE track (
+    track_id VARCHAR(100) NOT NULL PRIMARY KEY,
+    name VARCHAR(100),
+    year INTEGER,
+    popularity INTEGER
+);
+CREATE TABLE playlist (
+    playlist_id VARCHAR(100) NOT NULL PRIMARY KEY,
+    name VARCHAR(100)
+);
+CREATE TABLE track_artists (
+    track_id VARCHAR(100) NOT NULL REFERENCES track (track_id) ON DELETE CASCADE,
+    artist_id INTEGER NOT NULL REFERENCES artist (artist_id) ON DELETE CASCADE,
+    PRIMARY KEY (track_id, artist_id)
+);
+CREATE TABLE playlist_track (
+    playlist_id VARCHAR(100) NOT NULL
+        REFERENCES playlist (playlist_id) ON DELETE CASCADE,
+    track_id VARCHAR(100) NOT NULL REFERENCES track (track_id) ON DELETE CASCADE,
+    PRIMARY KEY (playlist_id, track_id)
+);
+CREATE TABLE training_data (
+    user_id VARCHAR(100) NOT NULL REFERENCES user (user_id) ON DELETE CASCADE,
+    playlist_id VARCHAR(100) NOT NULL
+        REFERENCES playlist (playlist_id) ON DELETE CASCADE,
+    track_id VARCHAR(100) NOT NULL REFERENCES track (track_id) ON DELETE CASCADE,
+    correct_guesses INTEGER,
+    correct_in_row INTEGER,
+    repeat_in_n INTEGER,
+    revisions INTEGER,
+    is_done BOOLEAN,
+    PRIMARY KEY (user_id, playlist_id, track_id)
+);
+"""
+
+
+def _seed_playlists(playlist_count=10, tracks_per_playlist=200):
+    """Legt mehrere Playlists mit Tracks und Lernkarten für user u1 an."""
+    rng = random.Random(0)
+    db.session.add(User(user_id="u1", username="u1"))
+    db.session.add_all(
+        Playlist(playlist_id=f"p{index}", name=f"Playlist {index}")
+        for index in range(playlist_count)
+    )
+    track_count = playlist_count * tracks_per_playlist
+    db.session.execute(
+        db.insert(Track),
+        [
+            {
+                "track_id": f"t{index}",
+                "name": f"Song {index}",
+                "popularity": rng.randint(0, 100),
+            }
+            for index in range(track_count)
+        ],
+    )
+    db.session.execute(
+        db.insert(PlaylistTrack),
+        [
+            {"playlist_id": f"p{index % playlist_count}", "track_id": f"t{index}"}
+            for index in range(track_count)
+        ],
+    )
+    db.session.execute(
+        db.insert(TrainingData),
+        [
+            {
+                "user_id": "u1",
+                "playlist_id": "p0",
+                "track_id": f"t{index}",
+                "due_step": index % 7,
+                "correct_in_row": index % 4,
+                "is_done": index % 5 == 0,
+            }
+            for index in range(0, track_count, playlist_count * 4)
+        ],
+    )
+    db.session.add(TrainingProgress(user_id="u1", playlist_id="p0", step=3))
+    db.session.commit()
+
+
+def test_upgrade_creates_empty_database_at_latest_version(app):
+    assert get_schema_version() == LATEST_VERSION
+    assert get_pending_migrations() == []
+    assert upgrade_schema() == []
+
+
+def test_upgrade_migrates_legacy_schema(app):
+    db.drop_all()
+    with db.engine.begin() as connection:
+        for statement in LEGACY_SCHEMA.split(";"):
+            if statement.strip():
+                connection.exec_driver_sql(statement)
+        connection.exec_driver_sql(
+            "INSERT INTO track VALUES ('t1', 'Song (Live)', 1999, 50)"
+        )
+        # Doppelte Künstler, die vor dem eindeutigen Index entstanden sind
+        connection.exec_driver_sql(
+            "INSERT INTO artist (artist_id, name) VALUES (1, 'Abba'), (2, 'Abba')"
+        )
+        connection.exec_driver_sql("INSERT INTO track_artists VALUES ('t1', 2)")
+    db.session.remove()
+
+    assert get_pending_migrations() == [version for version, _, _ in MIGRATIONS]
+    assert upgrade_schema() == [version for version, _, _ in MIGRATIONS]
+    assert get_pending_migrations() == []
+
+    inspector = inspect(db.engine)
+    assert inspector.has_table("training_progress")
+    assert "due_step" in {c["name"] for c in inspector.get_columns("training_data")}
+    assert "revision_count" in {
+        c["name"] for c in inspector.get_columns("training_progress")
+    }
+    assert "imported_at" in {c["name"] for c in inspector.get_columns("playlist")}
+    assert "ix_track_popularity" in {i["name"] for i in inspector.get_indexes("track")}
+
+    assert [artist.artist_id for artist in Artist.query.all()] == [1]
+    track = db.session.get(Track, "t1")
+    assert [artist.artist_id for artist in track.artists] == [1]
+    assert track.match_title == "song"
+    assert track.match_artists
+
+
+def test_db_upgrade_command_reports_the_version(app):
+    result = app.test_cli_runner().invoke(args=["db-upgrade"])
+
+    assert result.exit_code == 0
+    assert "Schema ist bereits aktuell." in result.output
+    assert f"Schema-Version: {LATEST_VERSION}" in result.output
+
+
+def test_index_checks_use_the_expected_indexes(app):
+    _seed_playlists()
+
+    results = check_index_usage(
+        TrainingRepository(), SongRepository(spotify_service=None), "u1", "p0"
+    )
+
+    failed = [(name, used) for name, uses_index, used in results if not uses_index]
+    assert failed == []
+
+
+def test_check_indexes_command_reports_every_query(app):
+    _seed_playlists()
+
+    result = app.test_cli_runner().invoke(args=["check-indexes", "u1", "p0"])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines()
+    assert all(line.startswith("OK") for line in result.output.splitlines())
@@ -0,0 +1,164 @@
+"""Tests für Metriken, SQL-Statistiken, Schema-Prüfung und strukturiertes Logging."""
+
+import json
+import logging
+import sys
+import pytest
+from spotify_server.app import create_app
+from spotify_server.app.logging_setup import (
+    ContextFilter,
+    ContextQueueHandler,
+    JsonFormatter,
+    bind_log_context,
+    clear_log_context,
+)
+from spotify_server.app.migrations import upgrade_schema
+from spotify_server.extensions import db
+
+
+@pytest.fixture
+def make_app(config):
+    """Erstellt eine App mit abweichenden Einstellungen."""
+    apps = []
+
+    def make(**settings):
+        app = create_app(type("CustomConfig", (config,), settings))
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+def test_metrics_cover_requests_repositories_and_caches(client, user):
+    client.post(
+        "/api/set_playlist", json={"user_id": user.user_id, "playlist_url": "p1"}
+    )
+
+    response = client.get("/metrics")
+
+    text = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="POST",'
+        'route="/api/set_playlist",status="200"}'
+    ) in text
+    assert (
+        'repository_queries_total{repository="TrainingRepository",'
+        'method="create_cards"}'
+    ) in text
+    assert 'spotify_request_duration_seconds_count{operation="playlist_items"' in text
+    assert 'cache_size{cache="track_cache"} 20' in text
+    assert 'db_route_requests_total{route="POST /api/set_playlist"} 1' in text
+    assert "playback_queue_queued 0" in text
+
+
+def test_metrics_can_be_disabled(make_app):
+    app = make_app(METRICS_ENABLED=False)
+
+    assert app.test_client().get("/metrics").status_code == 404
+
+
+def test_query_stats_headers(make_app):
+    app = make_app(QUERY_STATS_HEADERS=True)
+    with app.app_context():
+        upgrade_schema()
+
+    response = app.test_client().post(
+        "/api/stats", json={"user_id": "u1", "playlist_id": "p1"}
+    )
+
+    assert int(response.headers["X-DB-Query-Count"]) >= 1
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
+    assert "X-DB-Slowest-Ms" in response.headers
+    stats = app.extensions["query_stats"].stats()
+    assert stats["POST /api/stats"]["requests"] == 1
+
+
+def test_query_stats_headers_are_off_by_default(client):
+    response = client.post("/api/stats", json={"user_id": "u1"})
+
+    assert "X-DB-Query-Count" not in response.headers
+
+
+def test_failed_statements_do_not_skew_query_timing(app):
+    with db.engine.connect() as connection:
+        with pytest.raises(Exception):
+            connection.execute(db.text("SELECT * FROM missing_table"))
+
+        assert not connection.info.get("query_started_at")
+        connection.execute(db.text("SELECT 1"))
+        assert not connection.info.get("query_started_at")
+
+
+def test_requests_wait_for_pending_migrations(make_app):
+    app = make_app(TESTING=False)
+    client = app.test_client()
+
+    response = client.post("/api/stats", json={"user_id": "u1"})
+    assert response.status_code == 503
+
+    with app.app_context():
+        upgrade_schema()
+    assert client.post("/api/stats", json={"user_id": "u1"}).status_code == 200
+
+
+def test_token_refresher_starts_with_the_first_request(make_app):
+    app = make_app(TESTING=False, TOKEN_REFRESH_ENABLED=True)
+    refresher = app.extensions["token_refresher"]
+    assert refresher._thread is None
+
+    try:
+        app.test_client().get("/metrics")
+        assert refresher._thread is not None
+        assert refresher._thread.is_alive()
+    finally:
+        refresher.stop()
+
+
+def test_testing_app_has_no_token_refresher(app):
+    assert "token_refresher" not in app.extensions
+
+
+def _format(record: logging.LogRecord) -> dict:
+    ContextFilter().filter(record)
+    record = ContextQueueHandler(None).prepare(record)
+    return json.loads(JsonFormatter().format(record))
+
+
+def test_json_log_lines_contain_context_and_extra_fields():
+    bind_log_context(request_id="r1", user_id="u1")
+    try:
+        record = logging.LogRecord(
+            "spotify_server.test", logging.INFO, __file__, 1, "%s Karten", (3,), None
+        )
+        record.duration_ms = 1.5
+        entry = _format(record)
+    finally:
+        clear_log_context()
+
+    assert entry["message"] == "3 Karten"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "spotify_server.test"
+    assert entry["request_id"] == "r1"
+    assert entry["user_id"] == "u1"
+    assert entry["duration_ms"] == 1.5
+
+
+def test_json_log_lines_keep_the_traceback_separate():
+    try:
+        raise ValueError("kaputt")
+    except ValueError:
+        record = logging.LogRecord(
+            "spotify_server.test", logging.ERROR, __file__, 1, "Fehler", (), None
+        )
+        record.exc_info = sys.exc_info()
+
+    entry = _format(record)
+
+    assert entry["message"] == "Fehler"
+    assert "ValueError: kaputt" in entry["exception"]
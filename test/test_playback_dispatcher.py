@@ -0,0 +1,192 @@
+"""Tests für das Zusammenfassen und Ausführen von Wiedergabe-Befehlen."""
+
+import threading
+import pytest
+from spotify_server.app.routes.training_routes import COMMAND_WAIT_MAX_SECONDS
+from spotify_server.app.services.playback_dispatcher import (
+    COALESCED,
+    DONE,
+    FAILED,
+    SUPERSEDED,
+    PlaybackDispatcher,
+)
+
+
+class RecordingPlaybackService:
+    """Führt keine Befehle aus, sondern merkt sie sich; blockiert bis `release`."""
+
+    def __init__(self, blocking: bool = False):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not blocking:
+            self.release.set()
+
+    def _run(self, *call):
+        self.started.set()
+        self.release.wait(5)
+        self.calls.append(call)
+
+    def play_song(self, user_id, track_id):
+        self._run("play", track_id)
+
+    def pause_playback(self, user_id):
+        self._run("pause")
+
+    def resume_playback(self, user_id):
+        self._run("resume")
+
+    def toggle_play_pause(self, user_id):
+        self._run("toggle")
+
+
+@pytest.fixture
+def blocked(app):
+    """Asynchroner Dispatcher, dessen erster Befehl bis zur Freigabe läuft."""
+    service = RecordingPlaybackService(blocking=True)
+    dispatcher = PlaybackDispatcher(app, playback_service=service, max_workers=2)
+    first = dispatcher.submit("u1", "play", "t1")
+    assert service.started.wait(5)
+    return dispatcher, service, first
+
+
+def _finish(service, commands):
+    service.release.set()
+    for command in commands:
+        assert command.wait(5)
+    return [command.status for command in commands]
+
+
+def test_synchronous_dispatcher_runs_commands_in_order(app):
+    service = RecordingPlaybackService()
+    dispatcher = PlaybackDispatcher(app, playback_service=service, asynchronous=False)
+
+    commands = [
+        dispatcher.submit("u1", "play", "t1"),
+        dispatcher.submit("u1", "toggle"),
+        dispatcher.submit("u1", "resume"),
+    ]
+
+    assert [command.status for command in commands] == [DONE, DONE, DONE]
+    assert service.calls == [("play", "t1"), ("toggle",), ("resume",)]
+    assert dispatcher.stats() == {"queued": 0, "active_users": 0, "commands": 3}
+
+
+def test_consecutive_toggles_cancel_out(blocked):
+    dispatcher, service, first = blocked
+
+    commands = [first] + [dispatcher.submit("u1", "toggle") for _ in range(3)]
+
+    assert _finish(service, commands) == [DONE, COALESCED, COALESCED, DONE]
+    assert service.calls == [("play", "t1"), ("toggle",)]
+
+
+def test_play_supersedes_waiting_commands(blocked):
+    dispatcher, service, first = blocked
+
+    commands = [
+        first,
+        dispatcher.submit("u1", "pause"),
+        dispatcher.submit("u1", "toggle"),
+        dispatcher.submit("u1", "play", "t2"),
+    ]
+
+    assert _finish(service, commands) == [DONE, SUPERSEDED, SUPERSEDED, DONE]
+    assert service.calls == [("play", "t1"), ("play", "t2")]
+
+
+def test_pause_supersedes_waiting_toggles_but_not_play(blocked):
+    dispatcher, service, first = blocked
+
+    commands = [
+        first,
+        dispatcher.submit("u1", "play", "t2"),
+        dispatcher.submit("u1", "toggle"),
+        dispatcher.submit("u1", "pause"),
+    ]
+
+    assert _finish(service, commands) == [DONE, DONE, SUPERSEDED, DONE]
+    assert service.calls == [("play", "t1"), ("play", "t2"), ("pause",)]
+
+
+def test_commands_of_other_users_are_not_coalesced(blocked):
+    dispatcher, service, first = blocked
+
+    commands = [first, dispatcher.submit("u1", "toggle")]
+    other = dispatcher.submit("u2", "toggle")
+
+    assert _finish(service, commands + [other]) == [DONE, DONE, DONE]
+
+
+def test_failed_commands_report_their_error(app):
+    class FailingPlaybackService(RecordingPlaybackService):
+        def pause_playback(self, user_id):
+            return TimeoutError()
+
+        def toggle_play_pause(self, user_id):
+            raise RuntimeError("kaputt")
+
+    dispatcher = PlaybackDispatcher(
+        app, playback_service=FailingPlaybackService(), asynchronous=False
+    )
+
+    assert dispatcher.submit("u1", "pause").status == FAILED
+    toggle = dispatcher.submit("u1", "toggle")
+    assert toggle.status == FAILED
+    assert toggle.error == "kaputt"
+
+
+def test_unknown_action_is_rejected(app):
+    dispatcher = PlaybackDispatcher(
+        app, playback_service=RecordingPlaybackService(), asynchronous=False
+    )
+
+    with pytest.raises(ValueError):
+        dispatcher.submit("u1", "stop")
+
+
+def test_command_status_endpoint(client, user):
+    response = client.post("/api/play_pause", json={"user_id": user.user_id})
+    command_id = response.get_json()["command_id"]
+
+    status = client.get(f"/api/playback/commands/{command_id}").get_json()
+    assert status["status"] == DONE
+    assert status["action"] == "toggle"
+    assert client.get("/api/playback/commands/unknown").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "wait, timeout",
+    [(None, 0), ("0.25", 0.25), ("-3", 0), ("30", COMMAND_WAIT_MAX_SECONDS)],
+)
+def test_command_status_wait_is_capped(client, monkeypatch, wait, timeout):
+    timeouts = []
+
+    def record_wait(self, command_id, timeout=None):
+        timeouts.append(timeout)
+
+    monkeypatch.setattr(PlaybackDispatcher, "wait", record_wait)
+
+    query = {"wait": wait} if wait is not None else {}
+    client.get("/api/playback/commands/abc", query_string=query)
+
+    assert timeouts == [timeout]
+
+
+@pytest.mark.parametrize("wait", ["nan", "inf", "-inf"])
+def test_command_status_rejects_invalid_wait(client, monkeypatch, wait):
+    monkeypatch.setattr(PlaybackDispatcher, "wait", pytest.fail)
+
+    response = client.get("/api/playback/commands/abc", query_string={"wait": wait})
+
+    assert response.status_code == 400
+
+
+def test_shutdown_runs_waiting_commands(blocked):
+    dispatcher, service, first = blocked
+    second = dispatcher.submit("u1", "pause")
+
+    service.release.set()
+    dispatcher.shutdown()
+
+    assert [first.status, second.status] == [DONE, DONE]
@@ -0,0 +1,203 @@
+"""Tests für den seitenweisen Playlist-Import und die Track-Metadaten."""
+
+import threading
+import pytest
+from spotipy.exceptions import SpotifyException
+from spotify_server.app.matching import join_artist_keys, artist_keys, title_key
+from spotify_server.app.models import (
+    Artist,
+    Playlist,
+    PlaylistTrack,
+    Track,
+    TrainingData,
+    User,
+)
+from spotify_server.app.services.fake_spotify import FakeSpotifyClient
+from spotify_server.extensions import db
+
+PLAYLIST_ID = "p1"
+
+
+@pytest.fixture
+def song_repository(training_service, world):
+    # Mehr als zwei Seiten à 100 Einträge
+    world.playlist_size = 250
+    return training_service.song_repository
+
+
+def _count(model) -> int:
+    return db.session.query(model).count()
+
+
+def test_import_loads_all_pages(song_repository, world):
+    tracks = song_repository.get_playlist_tracks(PLAYLIST_ID)
+
+    assert {track.track_id for track in tracks} == set(
+        world.playlist_track_ids(PLAYLIST_ID)
+    )
+    assert _count(PlaylistTrack) == 250
+    assert db.session.get(Playlist, PLAYLIST_ID).imported_at is not None
+
+    details = world.track(tracks[0].track_id)
+    track = db.session.get(Track, tracks[0].track_id)
+    assert track.name == details["name"]
+    assert track.match_title == title_key(details["name"])
+    assert track.match_artists == join_artist_keys(
+        artist_keys(artist["name"] for artist in details["artists"])
+    )
+    assert track.year == int(details["album"]["release_date"][:4])
+    assert track.popularity == details["popularity"]
+    assert [artist.name for artist in track.artists] == [
+        artist["name"] for artist in details["artists"]
+    ]
+
+
+def test_track_metadata_comes_with_the_playlist_pages(song_repository, world):
+    song_repository.get_playlist_tracks(PLAYLIST_ID)
+
+    # 3 Seiten der Playlist und ihr Name, keine Anfragen pro Track
+    assert world.calls == 3 + 1
+
+
+def test_imported_playlist_is_read_from_the_database(song_repository, world):
+    song_repository.get_playlist_tracks(PLAYLIST_ID)
+    calls = world.calls
+
+    assert len(song_repository.get_playlist_tracks(PLAYLIST_ID)) == 250
+    assert song_repository.ensure_playlist_imported(PLAYLIST_ID)
+    assert world.calls == calls
+
+
+@pytest.mark.parametrize("page_concurrency", [1, 4])
+def test_pages_keep_the_playlist_order(song_repository, world, page_concurrency):
+    song_repository.spotify_service.page_concurrency = page_concurrency
+
+    tracks = song_repository.get_playlist_tracks(PLAYLIST_ID)
+
+    assert [track.track_id for track in tracks] == world.playlist_track_ids(PLAYLIST_ID)
+    assert world.calls == 3 + 1
+
+
+def _fail_pages_from(monkeypatch, failing_offset: int):
+    # Jeder Seiten-Worker hat einen eigenen Client, daher an der Klasse ersetzen
+    playlist_items = FakeSpotifyClient.playlist_items
+
+    def failing_playlist_items(
+        client, playlist_id, fields=None, limit=50, offset=0, **kw
+    ):
+        if offset >= failing_offset:
+            raise SpotifyException(503, -1, "simulierter Fehler")
+        return playlist_items(client, playlist_id, fields, limit, offset, **kw)
+
+    monkeypatch.setattr(FakeSpotifyClient, "playlist_items", failing_playlist_items)
+
+
+def test_failed_page_stores_nothing(song_repository, monkeypatch):
+    _fail_pages_from(monkeypatch, 200)
+
+    assert song_repository.get_playlist_tracks(PLAYLIST_ID) == []
+    assert not song_repository.ensure_playlist_imported(PLAYLIST_ID)
+    db.session.commit()
+    for model in (Playlist, PlaylistTrack, Track, Artist):
+        assert _count(model) == 0
+    assert song_repository.artist_resolver.stats()["size"] == 0
+
+    monkeypatch.undo()
+    assert len(song_repository.get_playlist_tracks(PLAYLIST_ID)) == 250
+    assert _count(Track) == 250
+
+
+def test_failed_import_keeps_other_pending_changes(song_repository, monkeypatch):
+    _fail_pages_from(monkeypatch, 200)
+    # Eine Änderung des Aufrufers, die noch nicht gespeichert ist
+    db.session.add(User(user_id="u2", username="u2"))
+
+    assert song_repository.get_playlist_tracks(PLAYLIST_ID) == []
+    db.session.commit()
+
+    assert db.session.get(User, "u2") is not None
+    assert _count(Playlist) == 0
+
+
+def test_unfinished_import_is_repeated(song_repository, world):
+    # Stand eines Imports vor der Markierung über Playlist.imported_at
+    track_id = world.playlist_track_ids(PLAYLIST_ID)[0]
+    db.session.add(Playlist(playlist_id=PLAYLIST_ID, name="Alt"))
+    db.session.add(Track(track_id=track_id, name="Alt", popularity=1))
+    db.session.add(PlaylistTrack(playlist_id=PLAYLIST_ID, track_id=track_id))
+    db.session.commit()
+
+    assert len(song_repository.get_playlist_tracks(PLAYLIST_ID)) == 250
+
+    assert _count(PlaylistTrack) == 250
+    assert db.session.get(Playlist, PLAYLIST_ID).imported_at is not None
+
+
+def test_training_starts_with_the_most_popular_tracks(training_service, user):
+    training_service.init_training(user.user_id, PLAYLIST_ID)
+
+    card_ids = {card.track_id for card in TrainingData.query.all()}
+    popularity = dict(db.session.query(Track.track_id, Track.popularity))
+    assert len(card_ids) == 20
+    assert min(popularity[track_id] for track_id in card_ids) >= max(
+        value for track_id, value in popularity.items() if track_id not in card_ids
+    )
+    assert training_service.add_new_song(user.user_id, PLAYLIST_ID) not in card_ids
+
+
+def test_preload_keeps_the_stored_match_keys(training_service, user):
+    training_service.init_training(user.user_id, PLAYLIST_ID)
+    card = TrainingData.query.first()
+    track = db.session.get(Track, card.track_id)
+    # Gespeicherte Schlüssel werden übernommen, nicht neu berechnet
+    track.match_title = "gespeichert"
+    track.match_artists = "a|b"
+    db.session.commit()
+    song_repository = training_service.song_repository
+
+    assert song_repository.preload_playlist(user.user_id, PLAYLIST_ID) == 20
+
+    song = song_repository.track_cache.get(track.track_id)
+    assert song.title == track.name
+    assert song.year == track.year
+    assert song.artists == tuple(artist.name for artist in track.artists)
+    assert song.match_title == "gespeichert"
+    assert song.match_artists == ("a", "b")
+    assert song_repository.preload_playlist(user.user_id, PLAYLIST_ID) == 0
+
+
+def test_playlist_table_rows_match_the_tracks(song_repository):
+    song_repository.get_playlist_tracks(PLAYLIST_ID)
+
+    table = song_repository.get_playlist_table(PLAYLIST_ID)
+
+    assert len(table.track_ids) == 250
+    for position, track_id in enumerate(table.track_ids[:20]):
+        expected = song_repository.get_dto_by_track(db.session.get(Track, track_id))
+        row = table.row(position)
+        assert (row.title, row.year, row.popularity) == (
+            expected.title,
+            expected.year,
+            expected.popularity,
+        )
+        assert sorted(row.artists) == sorted(expected.artists)
+        assert row.match_title == expected.match_title
+        assert row.match_artists == expected.match_artists
+
+
+def test_each_page_worker_uses_its_own_client(song_repository, monkeypatch):
+    clients = set()
+    playlist_items = FakeSpotifyClient.playlist_items
+
+    def recording_playlist_items(client, *args, **kwargs):
+        clients.add((threading.get_ident(), id(client)))
+        return playlist_items(client, *args, **kwargs)
+
+    monkeypatch.setattr(FakeSpotifyClient, "playlist_items", recording_playlist_items)
+
+    song_repository.get_playlist_tracks(PLAYLIST_ID)
+
+    thread_ids = {thread_id for thread_id, _ in clients}
+    client_ids = {client_id for _, client_id in clients}
+    assert len(thread_ids) > 1
+    assert len(client_ids) == len(clients) == len(thread_ids)
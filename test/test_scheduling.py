@@ -0,0 +1,200 @@
+"""Tests für die Wiederholungsplanung über den Schrittzähler (due_step)."""
+
+import pytest
+from sqlalchemy import update
+from spotify_server.app.models import TrainingData, TrainingProgress
+from spotify_server.app.services import training_repository as repository_module
+from spotify_server.extensions import db
+
+PLAYLIST_ID = "p1"
+
+
+def _cards(user_id="u1"):
+    return TrainingData.query.filter_by(user_id=user_id, playlist_id=PLAYLIST_ID).all()
+
+
+def _progress(user_id="u1"):
+    return db.session.get(TrainingProgress, (user_id, PLAYLIST_ID))
+
+
+def test_new_cards_are_due_within_six_steps(training_service, user):
+    training_service.init_training(user.user_id, PLAYLIST_ID)
+
+    cards = _cards()
+    assert len(cards) == 20
+    assert all(1 <= card.due_step <= 6 for card in cards)
+    progress = _progress()
+    assert progress.step == 0
+    assert progress.card_count == 20
+    assert progress.learning_count == 20
+
+
+def test_step_jumps_to_next_due_card_when_nothing_is_due(training_service, user):
+    card = training_service.choose_next_song(user, PLAYLIST_ID)
+
+    progress = _progress()
+    assert progress.step == min(card.due_step for card in _cards())
+    assert card.due_step <= progress.step
+    assert progress.current_track_id == card.track_id
+
+
+def test_step_stays_while_cards_are_due(training_service, user):
+    training_service.choose_next_song(user, PLAYLIST_ID)
+    step = _progress().step
+
+    for _ in range(5):
+        card = training_service.choose_next_song(user, PLAYLIST_ID)
+        assert card.due_step <= step
+    assert _progress().step == step
+
+
+def test_update_training_schedules_relative_to_step(training_service, user):
+    card = training_service.choose_next_song(user, PLAYLIST_ID)
+    step = _progress().step
+
+    training_service.update_training(PLAYLIST_ID, card.track_id, 0, user.user_id)
+
+    card = db.session.get(TrainingData, (user.user_id, PLAYLIST_ID, card.track_id))
+    assert step + 1 <= card.due_step <= step + 3
+    assert card.revisions == 1
+    assert _progress().revision_count == 1
+
+
+def test_counters_are_incremented_in_the_database(training_service, user):
+    card = training_service.choose_next_song(user, PLAYLIST_ID)
+    progress = _progress()
+    # Eine gleichzeitige Antwort, die diese Session noch nicht gesehen hat
+    db.session.execute(
+        update(TrainingProgress)
+        .values(revision_count=TrainingProgress.revision_count + 5)
+        .execution_options(synchronize_session=False)
+    )
+
+    training_service.update_training(PLAYLIST_ID, card.track_id, 0, user.user_id)
+    db.session.expire_all()
+
+    assert progress.revision_count == 6
+
+
+def test_update_training_ignores_card_that_is_not_due(training_service, user):
+    training_service.choose_next_song(user, PLAYLIST_ID)
+    step = _progress().step
+    card = next(card for card in _cards() if card.due_step > step)
+    due_step = card.due_step
+
+    training_service.update_training(PLAYLIST_ID, card.track_id, 5, user.user_id)
+
+    assert card.due_step == due_step
+    assert card.revisions == 0
+    assert _progress().revision_count == 0
+
+
+def test_every_card_is_asked_before_the_step_moves_on(training_service, user):
+    seen = set()
+    for _ in range(40):
+        card = training_service.choose_next_song(user, PLAYLIST_ID)
+        assert card.due_step <= _progress().step
+        seen.add(card.track_id)
+        training_service.update_training(PLAYLIST_ID, card.track_id, 2, user.user_id)
+
+    # Alle Startkarten sind spätestens bei Schritt 6 fällig
+    assert len(seen) == 20
+
+
+def test_legacy_cards_are_adopted_from_repeat_in_n(app):
+    db.session.add_all(
+        TrainingData(
+            user_id="u1",
+            playlist_id=PLAYLIST_ID,
+            track_id=track_id,
+            correct_in_row=correct_in_row,
+            repeat_in_n=repeat_in_n,
+            revisions=2,
+            is_done=False,
+        )
+        for track_id, repeat_in_n, correct_in_row in (
+            ("t1", 4, 0),
+            ("t2", -1, 5),
+            ("t3", 0, 1),
+        )
+    )
+    db.session.commit()
+
+    progress = repository_module.TrainingRepository().get_progress("u1", PLAYLIST_ID)
+    db.session.commit()
+
+    assert progress.step == 0
+    assert {card.track_id: card.due_step for card in _cards()} == {
+        "t1": 4,
+        "t2": 0,
+        "t3": 0,
+    }
+    assert progress.card_count == 3
+    assert progress.learning_count == 2
+    assert progress.revision_count == 6
+
+
+def test_pick_due_track_ids_returns_distinct_due_cards(training_service, user):
+    training_service.choose_next_song(user, PLAYLIST_ID)
+    step = _progress().step
+
+    track_ids = training_service.training_repository.pick_due_track_ids(
+        user.user_id, PLAYLIST_ID, count=50
+    )
+
+    assert len(track_ids) == len(set(track_ids))
+    assert set(track_ids) == {
+        card.track_id for card in _cards() if card.due_step <= step
+    }
+
+
+@pytest.mark.parametrize(
+    "weighting, weights, picked",
+    [
+        (None, [1, 1], None),
+        ("overdue", [1, 7], "t1"),
+        ("weak", [0.25, 1], "t2"),
+    ],
+)
+def test_pick_due_track_ids_weights_candidates(
+    app, monkeypatch, weighting, weights, picked
+):
+    db.session.add(TrainingProgress(user_id="u1", playlist_id=PLAYLIST_ID, step=10))
+    db.session.add_all(
+        TrainingData(
+            user_id="u1",
+            playlist_id=PLAYLIST_ID,
+            track_id=track_id,
+            due_step=due_step,
+            correct_in_row=correct_in_row,
+        )
+        for track_id, due_step, correct_in_row in (
+            ("t1", 4, 3),
+            ("t2", 10, 0),
+            ("t3", 11, 0),  # noch nicht fällig
+        )
+    )
+    db.session.commit()
+    drawn = []
+
+    def choices(population, weights):
+        # Deterministisch: immer den Kandidaten mit dem größten Gewicht ziehen
+        drawn.append(sorted(weights))
+        return [max(population, key=lambda position: (weights[position], -position))]
+
+    monkeypatch.setattr(repository_module.random, "choices", choices)
+
+    track_ids = repository_module.TrainingRepository().pick_due_track_ids(
+        "u1", PLAYLIST_ID, weighting=weighting
+    )
+
+    assert drawn == [pytest.approx(weights)]
+    if picked:
+        assert track_ids == [picked]
+
+
+def test_pick_due_track_ids_rejects_unknown_weighting(app):
+    with pytest.raises(ValueError):
+        repository_module.TrainingRepository().pick_due_track_ids(
+            "u1", PLAYLIST_ID, weighting="random"
+        )
@@ -0,0 +1,47 @@
+"""Tests für die Auswahl und Schnittstelle der Spotify-Backends."""
+
+import pytest
+from spotify_server.app.services.fake_spotify import FakeSpotifyGateway
+from spotify_server.app.services.spotify_gateway import (
+    SpotifyGateway,
+    SpotipyGateway,
+    create_spotify_gateway,
+)
+
+
+def test_gateway_without_all_methods_cannot_be_created():
+    class CatalogOnlyGateway(SpotifyGateway):
+        def app_client(self):
+            return None
+
+    with pytest.raises(TypeError):
+        SpotifyGateway()
+    with pytest.raises(TypeError):
+        CatalogOnlyGateway()
+
+
+@pytest.mark.parametrize(
+    "backend, gateway_class",
+    [
+        ("spotify", SpotipyGateway),
+        ("http", SpotipyGateway),
+        ("fake", FakeSpotifyGateway),
+    ],
+)
+def test_create_spotify_gateway_picks_the_backend(config, backend, gateway_class):
+    settings = {key: getattr(config, key) for key in dir(config) if key.isupper()}
+    settings.update(
+        SPOTIFY_BACKEND=backend,
+        SPOTIFY_CLIENT_ID="id",
+        SPOTIFY_CLIENT_SECRET="secret",
+        SPOTIFY_API_URL="http://localhost:5099",
+    )
+
+    gateway = create_spotify_gateway(settings)
+
+    assert isinstance(gateway, gateway_class)
+
+
+def test_create_spotify_gateway_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_spotify_gateway({"SPOTIFY_BACKEND": "mock"})
@@ -0,0 +1,125 @@
+"""Tests für die materialisierten Trainingszähler in TrainingProgress."""
+
+import random
+from spotify_server.app.models import TrainingData, TrainingProgress
+from spotify_server.extensions import db
+
+PLAYLIST_ID = "p1"
+
+
+def _train(training_service, user, answers: int, playlist_id=PLAYLIST_ID, seed=0):
+    """Beantwortet `answers` Karten mit überwiegend richtigen Antworten."""
+    rng = random.Random(seed)
+    for _ in range(answers):
+        card = training_service.choose_next_song(user, playlist_id)
+        score = rng.choice((5, 5, 5, 5, 4, 2, 0))
+        training_service.update_training(
+            playlist_id, card.track_id, score, user.user_id
+        )
+
+
+def test_counters_match_cards_after_training(training_service, user):
+    _train(training_service, user, 300)
+    repository = training_service.training_repository
+
+    stats = repository.get_training_stats(user.user_id, PLAYLIST_ID)
+
+    assert stats == repository._count_stats(user.user_id, PLAYLIST_ID)
+    assert stats["total_revisions"] == 300
+    assert stats["finished_tracks"] > 0
+    assert stats["learning_tracks"] < stats["active_tracks"]
+
+
+def test_stats_are_counted_from_the_cards(training_service, user):
+    _train(training_service, user, 100)
+    repository = training_service.training_repository
+
+    stats = repository.get_training_stats(user.user_id, PLAYLIST_ID)
+
+    cards = TrainingData.query.filter_by(user_id=user.user_id).all()
+    step = db.session.get(TrainingProgress, (user.user_id, PLAYLIST_ID)).step
+    assert stats == {
+        "finished_tracks": sum(card.is_done for card in cards),
+        "active_tracks": len(cards),
+        "due_tracks": sum(card.due_step <= step for card in cards),
+        "learning_tracks": sum(card.correct_in_row < 3 for card in cards),
+        "total_revisions": 100,
+    }
+
+
+def test_stats_with_other_threshold_are_counted_from_cards(training_service, user):
+    _train(training_service, user, 100)
+    repository = training_service.training_repository
+
+    stats = repository.get_training_stats(user.user_id, PLAYLIST_ID, threshold=1)
+
+    cards = TrainingData.query.filter_by(user_id=user.user_id).all()
+    assert stats["learning_tracks"] == sum(card.correct_in_row < 1 for card in cards)
+
+
+def test_stats_by_playlist_match_single_playlist_stats(training_service, user):
+    _train(training_service, user, 50, playlist_id="p1")
+    _train(training_service, user, 30, playlist_id="p2", seed=1)
+    repository = training_service.training_repository
+
+    by_playlist = repository.get_training_stats_by_playlist(user.user_id)
+
+    assert set(by_playlist) == {"p1", "p2"}
+    for playlist_id, stats in by_playlist.items():
+        assert stats == repository.get_training_stats(user.user_id, playlist_id)
+    assert by_playlist["p2"]["total_revisions"] == 30
+
+
+def test_stats_of_unknown_playlist_are_empty(training_service, user):
+    stats = training_service.training_repository.get_training_stats(
+        user.user_id, "unknown"
+    )
+
+    assert set(stats.values()) == {0}
+
+
+def test_stats_route_returns_one_or_all_playlists(client, training_service, user):
+    _train(training_service, user, 10)
+
+    stats = client.post(
+        "/api/stats", json={"user_id": user.user_id, "playlist_id": PLAYLIST_ID}
+    ).get_json()
+    all_stats = client.post("/api/stats", json={"user_id": user.user_id}).get_json()
+
+    assert stats == training_service.training_repository.get_training_stats(
+        user.user_id, PLAYLIST_ID
+    )
+    assert all_stats == {"playlists": {PLAYLIST_ID: stats}}
+
+
+def test_reconcile_repairs_counters(app, training_service, user):
+    _train(training_service, user, 80)
+    repository = training_service.training_repository
+    expected = repository.get_training_stats(user.user_id, PLAYLIST_ID)
+
+    progress = db.session.get(TrainingProgress, (user.user_id, PLAYLIST_ID))
+    progress.card_count = 999
+    progress.finished_count = None
+    progress.revision_count = 0
+    # Karten ohne Trainingsstand, z.B. aus der Zeit vor den Zählern
+    db.session.add(
+        TrainingData(
+            user_id="u2", playlist_id=PLAYLIST_ID, track_id="t1", repeat_in_n=2
+        )
+    )
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["reconcile-training-stats"])
+
+    assert result.exit_code == 0
+    assert "2 User/Playlist-Kombinationen abgeglichen." in result.output
+    db.session.expire_all()
+    assert repository.get_training_stats(user.user_id, PLAYLIST_ID) == expected
+    assert repository.get_training_stats("u2", PLAYLIST_ID) == {
+        "finished_tracks": 0,
+        "active_tracks": 1,
+        "due_tracks": 0,
+        "learning_tracks": 1,
+        "total_revisions": 0,
+    }
+    assert db.session.get(TrainingData, ("u2", PLAYLIST_ID, "t1")).due_step == 2
@@ -12,9 +12,9 @@ CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 REDIRECT_URI = "http://localhost:5000/callback"
 
-# ACHTUNG: Hier musst du einen gültigen Refresh Token eines Users einfügen,
-# den du testen willst. Hol ihn dir z.B. kurz aus der DB oder lass ihn dir printen.
-REFRESH_TOKEN = "AQDErE_miJZti-moEuojAT4Sbdxb1sfJZAjxex3sJvidPaP9tIRwOv_mx2plqQSd3GBc_9p9Z2jpFduJ5tLesLM42EiJ5mRkJDx27WtBlRgIfJs0yOd1fLSL-qeeaDkwDMo"
+# Der Refresh Token des Users, mit dem getestet wird, kommt aus der Umgebung
+# (z.B. .env), damit keine echten Tokens im Repository landen.
+REFRESH_TOKEN = os.getenv("SPOTIFY_TEST_REFRESH_TOKEN")
 
 
 def get_client():
@@ -60,7 +60,7 @@ def test_toggle_logic():
 
 
 if __name__ == "__main__":
-    if REFRESH_TOKEN == "DEIN_REFRESH_TOKEN_HIER_EINFUEGEN":
-        print("BITTE REFRESH_TOKEN IM SKRIPT EINTRAGEN!")
+    if not REFRESH_TOKEN:
+        print("BITTE SPOTIFY_TEST_REFRESH_TOKEN IN DER .env SETZEN!")
     else:
         test_toggle_logic()